@@ -0,0 +1,205 @@
+"""
+Gunicorn runtime configuration for latagan_project.
+
+Picked up automatically by ``gunicorn latagan_project.wsgi`` when started
+from the project root. Every setting can be overridden from the environment
+(``WEB_CONCURRENCY``, ``GUNICORN_THREADS``, ...) without editing this file.
+"""
+
+import multiprocessing
+import os
+import time
+
+# Server socket
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+backlog = int(os.environ.get('GUNICORN_BACKLOG', '2048'))
+
+
+# Worker sizing
+
+# Rough resident size of one Django worker after warm-up, used to keep the
+# worker count inside the container's memory limit.
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', '120'))
+
+
+def _available_memory_mb():
+    """Memory available to this container in MB (cgroup limit, then physical RAM)"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 512
+
+
+def _worker_plan():
+    """Pick (worker_class, workers, threads) from CPU count and memory"""
+    cpus = multiprocessing.cpu_count()
+    wanted = cpus * 2 + 1
+    # Always leave room for the master process
+    affordable = max(1, _available_memory_mb() // WORKER_MEMORY_MB - 1)
+
+    if affordable >= wanted:
+        return 'sync', wanted, 1
+
+    # Not enough memory for one process per slot: run fewer processes and
+    # make up the concurrency with threads, which share the preloaded app.
+    workers = affordable
+    threads = max(2, -(-wanted // workers))
+    return 'gthread', workers, threads
+
+
+_worker_class, _workers, _threads = _worker_plan()
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', _worker_class)
+workers = int(os.environ.get('WEB_CONCURRENCY', _workers))
+threads = int(os.environ.get('GUNICORN_THREADS', _threads))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+
+# Graceful recycling
+
+# Restart each worker after a number of requests (with jitter so they don't
+# all restart at once) to cap slow memory growth, and give in-flight requests
+# time to finish on restart/deploy.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+
+# Preloading
+
+# Import Django once in the master; workers inherit it copy-on-write.
+preload_app = True
+
+
+# Logging
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+# Requests slower than this (in ms) are logged as warnings
+SLOW_REQUEST_MS = float(os.environ.get('GUNICORN_SLOW_REQUEST_MS', '500'))
+
+
+# Warm-up
+
+def _sample_kwargs(pattern):
+    """Placeholder kwargs for a URL pattern's converters"""
+    converters = getattr(pattern.pattern, 'converters', {})
+    return {name: 1 for name in converters}
+
+
+def warm_up(server):
+    """Import views, resolve URLs, compile templates, touch the database and build search indexes"""
+    from django.conf import settings
+    from django.db import connections
+    from django.template.loader import get_template
+    from django.urls import resolve, reverse, NoReverseMatch, Resolver404
+
+    import store.views  # noqa: F401
+    from store import urls as store_urls
+
+    started = time.monotonic()
+
+    # Resolve every store URL so the resolver caches are populated
+    resolved = 0
+    for pattern in store_urls.urlpatterns:
+        try:
+            resolve(reverse(pattern.name, kwargs=_sample_kwargs(pattern)))
+            resolved += 1
+        except (NoReverseMatch, Resolver404) as exc:
+            server.log.warning('Warm-up could not resolve %s: %s', pattern.name, exc)
+
+    # Compile every template so the cached loader holds them before forking
+    compiled = 0
+    for template_dir in settings.TEMPLATES[0]['DIRS']:
+        for root, _dirs, files in os.walk(template_dir):
+            for filename in files:
+                if not filename.endswith('.html'):
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), template_dir)
+                try:
+                    get_template(name)
+                    compiled += 1
+                except Exception as exc:
+                    server.log.warning('Warm-up could not load template %s: %s', name, exc)
+
+    # Open each database once to pull its pages into the OS cache, then close
+    # the connections: sockets and SQLite handles must not be shared by forks.
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+    # Build the autocomplete index once so every worker inherits it
+    from store import autocomplete
+    autocomplete.get_index()
+
+    connections.close_all()
+
+    server.log.info(
+        'Warm-up finished in %.0f ms (%d urls, %d templates)',
+        (time.monotonic() - started) * 1000, resolved, compiled,
+    )
+
+
+# Server hooks
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers fork"""
+    from store import metrics
+    metrics.reset_storage()
+    try:
+        warm_up(server)
+    except Exception:
+        server.log.exception('Warm-up failed; workers will warm up lazily')
+
+
+def post_fork(server, worker):
+    """Make sure no worker reuses a database connection from the master"""
+    from django.db import connections
+    connections.close_all()
+
+
+def pre_request(worker, req):
+    req.start_time = time.monotonic()
+
+
+def post_request(worker, req, environ, resp):
+    """Record how long each request took"""
+    start_time = getattr(req, 'start_time', None)
+    if start_time is None:
+        return
+    duration_ms = (time.monotonic() - start_time) * 1000
+    status = getattr(resp, 'status_code', None) or str(getattr(resp, 'status', '')).split(' ')[0]
+    log = worker.log.warning if duration_ms >= SLOW_REQUEST_MS else worker.log.debug
+    log(
+        'Request timing: %s %s %s %.1fms pid=%s',
+        req.method, req.path, status, duration_ms, worker.pid,
+    )
+
+
+def worker_exit(server, worker):
+    """Write out metrics and engagement counters the worker hasn't flushed yet"""
+    from store import engagement, metrics
+    metrics.flush(force=True)
+    engagement.flush()
+
+
+def child_exit(server, worker):
+    """Fold the exited worker's metrics into the shared totals and free its in-flight slot"""
+    from store import metrics, throttle
+    metrics.mark_process_dead(worker.pid)
+    throttle.release_worker(worker.pid)
+
+
+def worker_abort(worker):
+    worker.log.warning('Worker %s aborted (timeout)', worker.pid)
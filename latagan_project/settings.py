@@ -32,19 +32,24 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'store.middleware.MetricsMiddleware',
+    'store.middleware.PageCacheMiddleware',
+    'store.middleware.LoadSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.middleware.ThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'store.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'latagan_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'store.templating.DjangoTemplates',
         'DIRS': [BASE_DIR / 'store' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -53,6 +58,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.notifications',
             ],
         },
     },
@@ -111,6 +117,37 @@ STATICFILES_DIRS = [BASE_DIR / 'store' / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per distinct content, named by their SHA-256
+# (store/media_storage.py); `python manage.py gc_media` deletes files no row
+# references any more once they are MEDIA_GC_GRACE_HOURS old.
+STORAGES = {
+    'default': {'BACKEND': 'store.media_storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_GC_GRACE_HOURS = 24
+# Let the web server send media files: the URL prefix of an nginx `internal`
+# location aliased to MEDIA_ROOT for X-Accel-Redirect, or MEDIA_SENDFILE=1
+# for X-Sendfile. With neither, files are sent by gunicorn with sendfile().
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '') == '1'
+# Image uploads (store/uploads.py)
+# Uploads stream to temporary files and are dropped past IMAGE_UPLOAD_MAX_BYTES;
+# accepted images are re-encoded without metadata, EXIF-rotated and capped at
+# IMAGE_MAX_SIDE pixels by a pool of IMAGE_PROCESS_WORKERS processes. The
+# uploading request waits for that, for at most IMAGE_PROCESS_TIMEOUT seconds.
+FILE_UPLOAD_HANDLERS = ['store.uploads.ImageUploadHandler']
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+IMAGE_MAX_SIDE = 1600
+IMAGE_JPEG_QUALITY = 85
+IMAGE_PROCESS_WORKERS = 2
+IMAGE_PROCESS_MAX_TASKS = 100
+IMAGE_PROCESS_TIMEOUT = 5
+# Listing photos whose perceptual hashes differ in at most this many of 64
+# bits count as duplicates (store/image_hash.py)
+IMAGE_DUPLICATE_DISTANCE = 6
+
 # Default primary key field type
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -119,3 +156,125 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
+
+# Profiling
+# Staff can profile a single request with ?_profile=1 or an X-Profile header;
+# PROFILING_SAMPLE_RATE additionally profiles a fraction of all requests.
+# Only the newest PROFILING_MAX_PROFILES profiles are kept in PROFILING_DIR.
+
+PROFILING_ENABLED = True
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', '200'))
+
+# Metrics
+# Per-process samples are flushed to METRICS_DIR and summed by /metrics.
+
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 1.0
+# /metrics answers staff users, `Authorization: Bearer <METRICS_TOKEN>` and
+# these client addresses (comma-separated in the environment)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = tuple(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '').split(',')))
+
+# Slow-query log
+# Queries slower than the threshold are appended to SLOW_QUERY_LOG as JSON
+# lines; summarize them with `python manage.py slow_queries`.
+
+SLOW_QUERY_LOG_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100'))
+SLOW_QUERY_STACK_SAMPLE_RATE = 1.0
+SLOW_QUERY_LOG = BASE_DIR / 'logs' / 'slow_queries.jsonl'
+
+# Archival
+# Sold listings untouched for this many days are moved to the archive tables
+# by `python manage.py archive_items`.
+
+ARCHIVE_AFTER_DAYS = 30
+
+# Reservations
+# Adding an item to the cart or opening checkout holds it for this long;
+# `python manage.py expire_reservations` releases lapsed holds.
+
+RESERVATION_MINUTES = 15
+
+# Autocomplete
+# Each worker rebuilds its in-memory prefix index this often, in a background
+# thread, to pick up changes made by other processes.
+
+AUTOCOMPLETE_RECONCILE_SECONDS = 300
+
+# Engagement counters
+# Views, cart adds and chat starts are buffered in each process and written
+# to ItemEngagement by a background thread every this many seconds, or
+# sooner once this many counters are pending. None disables the thread.
+
+ENGAGEMENT_FLUSH_INTERVAL = 10.0
+ENGAGEMENT_FLUSH_THRESHOLD = 500
+
+# Trending
+# Engagement counted towards an item's trending score halves in weight
+# every TRENDING_HALF_LIFE_HOURS; run `python manage.py refresh_trending`
+# periodically to drop sold and faded listings.
+
+TRENDING_HALF_LIFE_HOURS = 24
+
+# Caching
+# One SQLite file shared by every gunicorn worker on the host (see
+# store/cache_backend.py); compare backends with `python manage.py benchmark_cache`.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'store.cache_backend.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache' / 'cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 50000, 'CULL_FREQUENCY': 4},
+    }
+}
+
+# Sessions and messages
+# Sessions are served from the shared cache and written to the database only
+# on login, logout and password changes (store/session_backend.py); expired
+# rows are removed by `python manage.py purge_sessions`. Flash messages travel
+# in a cookie instead of the session. Compare with `python manage.py benchmark_sessions`.
+
+SESSION_ENGINE = 'store.session_backend'
+SESSION_CACHE_ALIAS = 'default'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Full-page cache for anonymous visitors (store/page_cache.py)
+# Pages are fresh for PAGE_CACHE_SECONDS, then served stale for up to
+# PAGE_CACHE_STALE_SECONDS more while one request re-renders them.
+
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_SECONDS = 60
+PAGE_CACHE_STALE_SECONDS = 300
+PAGE_CACHE_VIEWS = ('home', 'item_list', 'item_detail', 'category_items', 'seller_profile')
+PAGE_CACHE_QUERY_PARAMS = ('q', 'category', 'min_price', 'max_price', 'condition', 'sort', 'page')
+
+# Rate limiting and load shedding (store/throttle.py)
+# THROTTLE_RATES maps a URL name ('search' is browse with ?q=) to (requests
+# per minute, burst) per user, or per client IP when logged out. Once
+# THROTTLE_SHED_IN_FLIGHT requests are running on the host, or a request
+# queued in the proxy for THROTTLE_SHED_QUEUE_MS, everything except
+# THROTTLE_CRITICAL_ROUTES gets a 503. The default in-flight limit is about
+# three quarters of gunicorn's 2 * CPUs + 1 request slots.
+
+THROTTLE_ENABLED = True
+THROTTLE_DB = BASE_DIR / 'cache' / 'throttle.sqlite3'
+# Reverse proxies in front of gunicorn that append to X-Forwarded-For (e.g. 1
+# for nginx, 2 for a CDN in front of nginx). 0 trusts REMOTE_ADDR only.
+THROTTLE_TRUSTED_PROXY_HOPS = int(os.environ.get('THROTTLE_TRUSTED_PROXY_HOPS', '0'))
+THROTTLE_RATES = {
+    'search': (30, 10),
+    'messages_inbox': (30, 10),
+    'checkout': (20, 5),
+    'login': (10, 5),
+}
+THROTTLE_SHED_IN_FLIGHT = int(os.environ.get('THROTTLE_SHED_IN_FLIGHT', (os.cpu_count() or 1) * 3 // 2 + 1))
+THROTTLE_SHED_QUEUE_MS = float(os.environ.get('THROTTLE_SHED_QUEUE_MS', '1000'))
+THROTTLE_SHED_RETRY_AFTER = 5
+THROTTLE_CRITICAL_ROUTES = (
+    'checkout', 'buy_item', 'view_cart', 'add_to_cart', 'remove_from_cart', 'update_cart_quantity',
+    'login', 'logout', 'metrics',
+)
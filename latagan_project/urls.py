@@ -6,11 +6,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from store.views import serve_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
     path('', include('store.urls')),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Category, Item, UserProfile, Order, Review
+from .models import Category, Item, UserProfile, Order, Review, ArchivedItem, PurgeTask, SavedSearch
+from .purge import soft_delete_user
 
 # Register your models here.
 
@@ -22,6 +23,13 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'is_seller', 'rating', 'created_at')
     list_filter = ('is_seller', 'created_at')
     search_fields = ('user__username', 'user__email')
+    actions = ['schedule_account_deletion']
+
+    @admin.action(description='Deactivate and schedule account deletion')
+    def schedule_account_deletion(self, request, queryset):
+        for profile in queryset.select_related('user'):
+            soft_delete_user(profile.user)
+        self.message_user(request, f'{queryset.count()} accounts scheduled for deletion.')
 
 
 @admin.register(Order)
@@ -37,3 +45,25 @@ class ReviewAdmin(admin.ModelAdmin):
     list_display = ('id', 'item', 'author', 'rating', 'created_at')
     list_filter = ('rating', 'created_at')
     search_fields = ('item__title', 'author__username')
+
+
+@admin.register(ArchivedItem)
+class ArchivedItemAdmin(admin.ModelAdmin):
+    list_display = ('title', 'seller', 'price', 'status', 'created_at', 'archived_at')
+    list_filter = ('category', 'archived_at')
+    search_fields = ('title', 'seller__username')
+    readonly_fields = ('created_at', 'updated_at', 'archived_at')
+
+
+@admin.register(PurgeTask)
+class PurgeTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'status', 'rows_deleted', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('created_at', 'updated_at', 'finished_at')
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('user', 'query', 'category', 'condition', 'min_price', 'max_price', 'created_at')
+    list_filter = ('category', 'condition')
+    search_fields = ('query', 'user__username')
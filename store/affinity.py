@@ -0,0 +1,158 @@
+"""
+Batch computation of user affinity vectors (run by compute_affinities).
+
+Every interaction a user had with a listing in the lookback window (orders,
+cart adds, chat messages to the seller, swipes) contributes a time-decayed
+weight to that listing's category and price band. The resulting user x
+feature matrix is built with NumPy in one pass, L2-normalised per user, and
+multiplied against the one-hot features of the current pool of available
+items, so each user's top candidates fall out of a chunked matrix product.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CartItem, Category, Item, Message, Order, Swipe, UserAffinity
+from .ranking import NUM_PRICE_BANDS, PRICE_BANDS, UNCATEGORIZED, category_key
+
+# Relative strength of each kind of interaction
+WEIGHTS = {
+    'order': 5.0,
+    'cart': 3.0,
+    'chat': 2.0,
+    'like': 2.0,
+    'nope': -1.0,
+}
+HALF_LIFE_DAYS = 30
+LOOKBACK_DAYS = 180
+POOL_SIZE = 2000
+CANDIDATES_PER_USER = 100
+# Small bonus so that, between equally liked items, newer ones rank first
+RECENCY_WEIGHT = 0.05
+
+
+def collect_events(since):
+    """(user_id, category_id, price, created_at, weight) for every interaction since `since`"""
+    sources = [
+        ('order', Order.objects.filter(created_at__gte=since, item__isnull=False),
+         ('buyer_id', 'item__category_id', 'item__price', 'created_at')),
+        ('cart', CartItem.objects.filter(added_at__gte=since),
+         ('cart__user_id', 'item__category_id', 'item__price', 'added_at')),
+        ('chat', Message.objects.filter(created_at__gte=since, item__isnull=False).exclude(sender=F('item__seller')),
+         ('sender_id', 'item__category_id', 'item__price', 'created_at')),
+    ]
+    events = []
+    for kind, queryset, fields in sources:
+        weight = WEIGHTS[kind]
+        for row in queryset.order_by().values_list(*fields).iterator(chunk_size=5000):
+            events.append((*row, weight))
+
+    swipes = Swipe.objects.filter(created_at__gte=since).order_by().values_list(
+        'user_id', 'item__category_id', 'item__price', 'created_at', 'direction',
+    )
+    for *row, direction in swipes.iterator(chunk_size=5000):
+        events.append((*row, WEIGHTS[direction]))
+    return events
+
+
+def feature_index():
+    """Column of each category key in the feature vector; price bands follow the categories"""
+    keys = [category_key(category_id) for category_id in Category.objects.values_list('id', flat=True)]
+    keys.append(UNCATEGORIZED)
+    return {key: position for position, key in enumerate(keys)}
+
+
+def _band_column(prices, offset):
+    return offset + np.searchsorted(np.asarray(PRICE_BANDS, dtype=float), prices, side='right')
+
+
+def build_user_matrix(events, columns, now):
+    """(user_ids, matrix) with one L2-normalised affinity row per user"""
+    if not events:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(columns) + NUM_PRICE_BANDS))
+    user_col, category_col, price_col, time_col, weight_col = zip(*events)
+
+    user_ids, rows = np.unique(np.asarray(user_col, dtype=np.int64), return_inverse=True)
+    categories = np.asarray([columns.get(category_key(c), columns[UNCATEGORIZED]) for c in category_col])
+    bands = _band_column(np.asarray(price_col, dtype=float), len(columns))
+    age_days = np.asarray([(now - created).total_seconds() for created in time_col]) / 86400
+    weights = np.asarray(weight_col) * np.power(0.5, age_days / HALF_LIFE_DAYS)
+
+    matrix = np.zeros((len(user_ids), len(columns) + NUM_PRICE_BANDS))
+    np.add.at(matrix, (rows, categories), weights)
+    np.add.at(matrix, (rows, bands), weights)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    return user_ids, matrix
+
+
+def load_pool(columns):
+    """(item_ids, seller_ids, one-hot feature matrix, recency) for the newest available items"""
+    rows = list(
+        Item.objects.available().order_by('-id').values_list('id', 'seller_id', 'category_id', 'price')[:POOL_SIZE]
+    )
+    width = len(columns) + NUM_PRICE_BANDS
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, width)), np.empty(0)
+    item_ids, seller_ids, category_ids, prices = zip(*rows)
+
+    features = np.zeros((len(rows), width))
+    positions = np.arange(len(rows))
+    features[positions, [columns.get(category_key(c), columns[UNCATEGORIZED]) for c in category_ids]] = 1
+    features[positions, _band_column(np.asarray(prices, dtype=float), len(columns))] = 1
+    # Pool is newest first: 1.0 for the newest item down to 0.0 for the oldest
+    recency = np.linspace(1, 0, num=len(rows)) if len(rows) > 1 else np.ones(1)
+    return np.asarray(item_ids), np.asarray(seller_ids), features, recency
+
+
+def top_candidates(user_ids, matrix, pool, chunk_size=1000, k=CANDIDATES_PER_USER):
+    """{user_id: [item ids best first]} from the user x pool score matrix, computed in chunks"""
+    item_ids, seller_ids, features, recency = pool
+    k = min(k, len(item_ids))
+    candidates = {}
+    if k == 0:
+        return candidates
+    for start in range(0, len(user_ids), chunk_size):
+        chunk_users = user_ids[start:start + chunk_size]
+        scores = matrix[start:start + chunk_size] @ features.T + RECENCY_WEIGHT * recency
+        # Never recommend a user's own listings
+        scores[chunk_users[:, None] == seller_ids[None, :]] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        for user_id, row, row_scores in zip(chunk_users, np.take_along_axis(top, order, axis=1),
+                                            np.take_along_axis(top_scores, order, axis=1)):
+            candidates[int(user_id)] = [int(item_ids[i]) for i, s in zip(row, row_scores) if np.isfinite(s)]
+    return candidates
+
+
+def run(lookback_days=LOOKBACK_DAYS, chunk_size=1000):
+    """Recompute every active user's affinity row; returns the number of users updated"""
+    now = timezone.now()
+    columns = feature_index()
+    user_ids, matrix = build_user_matrix(collect_events(now - timedelta(days=lookback_days)), columns, now)
+    candidates = top_candidates(user_ids, matrix, load_pool(columns), chunk_size=chunk_size)
+
+    category_keys = list(columns)
+    affinities = [
+        UserAffinity(
+            user_id=int(user_id),
+            category_weights={key: round(float(w), 4) for key, w in zip(category_keys, row) if w},
+            price_band_weights=[round(float(w), 4) for w in row[len(columns):]],
+            candidate_ids=candidates.get(int(user_id), []),
+            computed_at=now,
+        )
+        for user_id, row in zip(user_ids, matrix)
+    ]
+    with transaction.atomic():
+        UserAffinity.objects.bulk_create(
+            affinities, batch_size=500, update_conflicts=True, unique_fields=['user'],
+            update_fields=['category_weights', 'price_band_weights', 'candidate_ids', 'computed_at'],
+        )
+        # Users with no recent activity fall back to the chronological feed
+        UserAffinity.objects.filter(computed_at__lt=now).delete()
+    return len(affinities)
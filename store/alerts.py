@@ -0,0 +1,154 @@
+"""
+Saved-search alerts.
+
+Rather than running every saved search as a query against the Item table,
+new listings are percolated: all saved searches are loaded once into an
+in-memory inverted index keyed on the most selective thing each one asks for
+(a trigram of its text query, else its category, else its condition, else its
+price floor), and each batch of new items only checks the handful of searches
+its own keys point at. Every candidate is then verified against the full
+filter with the same semantics as the browse page (case-insensitive substring
+of title or description, category, condition, inclusive price range).
+"""
+
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Item, Notification, RollupWatermark, SavedSearch
+
+WATERMARK_NAME = 'saved_searches'
+
+Spec = namedtuple('Spec', 'id user_id query category_id min_price max_price condition')
+Listing = namedtuple('Listing', 'id seller_id title description price category_id condition')
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def spec_matches(spec, listing, text):
+    """Whether `listing` (with lower-cased title/description `text`) satisfies `spec`"""
+    if spec.category_id is not None and spec.category_id != listing.category_id:
+        return False
+    if spec.condition and spec.condition != listing.condition:
+        return False
+    if spec.min_price is not None and listing.price < spec.min_price:
+        return False
+    if spec.max_price is not None and listing.price > spec.max_price:
+        return False
+    return not spec.query or spec.query in text
+
+
+class SearchIndex:
+    def __init__(self, specs):
+        self.by_trigram = defaultdict(list)
+        self.by_category = defaultdict(list)
+        self.by_condition = defaultdict(list)
+        self.by_min_price = []      # sorted [(min_price, spec)] for price-only searches
+        self.scan = []              # searches with nothing to key on, checked for every item
+        self.size = 0
+
+        for spec in specs:
+            self.add(spec)
+        self.by_min_price.sort(key=lambda entry: entry[0])
+        self.min_prices = [price for price, _ in self.by_min_price]
+
+    def add(self, spec):
+        self.size += 1
+        if len(spec.query) >= 3:
+            # Key on the trigram with the shortest posting list so far, spreading
+            # popular words ("vintage") across their less common trigrams
+            key = min(trigrams(spec.query), key=lambda gram: len(self.by_trigram.get(gram, ())))
+            self.by_trigram[key].append(spec)
+        elif spec.query:
+            self.scan.append(spec)
+        elif spec.category_id is not None:
+            self.by_category[spec.category_id].append(spec)
+        elif spec.condition:
+            self.by_condition[spec.condition].append(spec)
+        elif spec.min_price is not None:
+            self.by_min_price.append((spec.min_price, spec))
+        else:
+            self.scan.append(spec)
+
+    def candidates(self, listing, text):
+        for gram in trigrams(text):
+            yield from self.by_trigram.get(gram, ())
+        yield from self.by_category.get(listing.category_id, ())
+        yield from self.by_condition.get(listing.condition, ())
+        for _, spec in self.by_min_price[:bisect_right(self.min_prices, listing.price)]:
+            yield spec
+        yield from self.scan
+
+    def match(self, listing):
+        """Saved searches that `listing` satisfies"""
+        text = f'{listing.title}\n{listing.description}'.lower()
+        return [spec for spec in self.candidates(listing, text) if spec_matches(spec, listing, text)]
+
+
+def spec_from_search(search):
+    return Spec(
+        search.id, search.user_id, search.query.lower().strip(), search.category_id,
+        search.min_price, search.max_price, search.condition,
+    )
+
+
+def load_index():
+    """Index every saved search belonging to an active account"""
+    searches = SavedSearch.objects.filter(user__is_active=True).only(
+        'id', 'user_id', 'query', 'category_id', 'min_price', 'max_price', 'condition',
+    ).order_by()
+    return SearchIndex(spec_from_search(search) for search in searches.iterator(chunk_size=5000))
+
+
+def notifications_for(index, listings):
+    """One unsaved Notification per (user, listing) match, never for the seller's own listing"""
+    notifications = []
+    for listing in listings:
+        notified = {listing.seller_id}
+        for spec in index.match(listing):
+            if spec.user_id in notified:
+                continue
+            notified.add(spec.user_id)
+            notifications.append(Notification(
+                user_id=spec.user_id, item_id=listing.id, saved_search_id=spec.id,
+                text=f'New listing matching your saved search: {listing.title}',
+            ))
+    return notifications
+
+
+def run(batch_size=1000, index=None):
+    """Match items listed since the last run; returns (items checked, notifications created)"""
+    watermark, created = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    max_item_id = Item.all_objects.aggregate(m=Max('id'))['m'] or 0
+    if created:
+        # First run: alert on listings from now on, not the whole back catalogue
+        watermark.last_item_id = max_item_id
+        watermark.save()
+        return 0, 0
+
+    if max_item_id <= watermark.last_item_id:
+        return 0, 0
+    if index is None:
+        index = load_index()
+
+    checked = created_count = 0
+    while watermark.last_item_id < max_item_id:
+        upper = min(watermark.last_item_id + batch_size, max_item_id)
+        listings = [
+            Listing(*row) for row in
+            Item.objects.available().filter(id__gt=watermark.last_item_id, id__lte=upper).order_by().values_list(
+                'id', 'seller_id', 'title', 'description', 'price', 'category_id', 'condition',
+            )
+        ]
+        notifications = notifications_for(index, listings) if index.size else []
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications, batch_size=500)
+            watermark.last_item_id = upper
+            watermark.save()
+        checked += len(listings)
+        created_count += len(notifications)
+    return checked, created_count
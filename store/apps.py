@@ -4,3 +4,31 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.contrib.auth.models import User
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from . import autocomplete, page_cache
+        from .models import Category, Item, Review, UserProfile
+        from .querylog import install
+
+        connection_created.connect(install, dispatch_uid='store.querylog.install')
+
+        post_save.connect(autocomplete.item_saved, sender=Item, dispatch_uid='store.autocomplete.item_saved')
+        post_delete.connect(autocomplete.item_deleted, sender=Item, dispatch_uid='store.autocomplete.item_deleted')
+        post_save.connect(autocomplete.category_saved, sender=Category,
+                          dispatch_uid='store.autocomplete.category_saved')
+        post_delete.connect(autocomplete.category_deleted, sender=Category,
+                            dispatch_uid='store.autocomplete.category_deleted')
+
+        pre_save.connect(page_cache.item_pre_save, sender=Item, dispatch_uid='store.page_cache.item_pre_save')
+        for model, receiver in (
+            (Item, page_cache.item_changed),
+            (Category, page_cache.category_changed),
+            (Review, page_cache.review_changed),
+            (UserProfile, page_cache.profile_changed),
+            (User, page_cache.user_changed),
+        ):
+            for signal in (post_save, post_delete):
+                signal.connect(receiver, sender=model, dispatch_uid=f'store.page_cache.{receiver.__name__}')
@@ -0,0 +1,60 @@
+"""
+Hot/cold split for listings.
+
+Sold items that haven't changed for ARCHIVE_AFTER_DAYS are copied into
+ArchivedItem/ArchivedReview (keeping their ids) and removed from the live
+tables, so browse queries only scan listings that can still be bought. Orders
+and chat messages are re-pointed to the archived row; item_detail falls back
+to the archive for old links, and the inbox and item_chat keep showing (read
+only) the conversations about archived items.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArchivedItem, ArchivedReview, CartItem, Item, Message, Order, Review
+
+ITEM_FIELDS = (
+    'id', 'seller_id', 'category_id', 'title', 'description', 'price', 'image',
+    'condition', 'status', 'created_at', 'updated_at',
+)
+REVIEW_FIELDS = ('id', 'item_id', 'author_id', 'rating', 'comment', 'created_at')
+
+
+def archivable_items(days):
+    """Sold listings untouched for at least `days` days"""
+    cutoff = timezone.now() - timedelta(days=days)
+    return Item.objects.filter(status='sold', updated_at__lt=cutoff).order_by()
+
+
+def archive_batch(item_ids):
+    """Move one batch of items (and their reviews) to the archive tables"""
+    with transaction.atomic():
+        # Re-check inside the transaction: an item may have been relisted
+        items = list(
+            Item.objects.filter(id__in=item_ids, status='sold').order_by().values(*ITEM_FIELDS)
+        )
+        ids = [row['id'] for row in items]
+        if not ids:
+            return 0
+
+        ArchivedItem.objects.bulk_create(
+            [ArchivedItem(**row) for row in items], ignore_conflicts=True,
+        )
+        reviews = Review.objects.filter(item_id__in=ids).order_by().values(*REVIEW_FIELDS)
+        ArchivedReview.objects.bulk_create(
+            [ArchivedReview(**row) for row in reviews], ignore_conflicts=True,
+        )
+
+        Order.objects.filter(item_id__in=ids).update(archived_item_id=F('item_id'), item=None)
+        Message.objects.filter(item_id__in=ids).update(archived_item_id=F('item_id'), item=None)
+
+        # Nothing references these rows any more except stale cart entries
+        CartItem.objects.filter(item_id__in=ids).delete()
+        Review.objects.filter(item_id__in=ids).delete()
+        Item.objects.filter(id__in=ids).delete()
+    return len(ids)
+
@@ -0,0 +1,295 @@
+"""
+In-memory prefix index for search-as-you-type.
+
+Completions (listing titles, category names, seller usernames) are stored as
+a sorted list of (key, entry_id) pairs, so a prefix lookup is one bisect
+followed by a short forward scan. Every title is indexed from each word so
+"jac" finds "Vintage denim jacket".
+
+Listings stay suggested while they are held in someone's cart; only sold and
+deleted ones drop out.
+
+Each worker builds the index once (gunicorn's warm-up builds it in the master
+so forks share it) and applies Item/Category signals from its own process
+incrementally, once the transaction that sent them commits. Status changes
+made with ``update()`` (checkout, mark-as-sold, bulk actions, soft deletes)
+send no signals, so those paths call ``items_changed`` instead. Every
+AUTOCOMPLETE_RECONCILE_SECONDS a background thread rebuilds it from the
+database to pick up changes made in other workers; requests keep using the
+old index until the new one is swapped in, and changes applied meanwhile are
+replayed onto it.
+"""
+
+import heapq
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Category, Item
+
+KIND_ITEM = 'item'
+KIND_CATEGORY = 'category'
+KIND_SELLER = 'seller'
+
+# Upper bound on keys inspected per lookup, keeps short prefixes cheap
+MAX_SCAN = 2000
+# Listings offered as suggestions
+LISTED_STATUSES = ('available', 'reserved')
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _item_weight(created_at, popularity, now):
+    age_days = max(0.0, (now - created_at).total_seconds() / 86400)
+    return math.exp(-age_days / 30) * (1 + math.log1p(popularity))
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.keys = []          # sorted [(key, entry_id)]
+        self.entries = {}       # entry_id -> (kind, label, ref_id, weight)
+        self.entry_keys = {}    # entry_id -> keys it was indexed under
+        self.lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def add(self, entry_id, kind, label, ref_id, weight, keys):
+        with self.lock:
+            self._remove(entry_id)
+            self.entries[entry_id] = (kind, label, ref_id, weight)
+            self.entry_keys[entry_id] = keys
+            for key in keys:
+                insort(self.keys, (key, entry_id))
+
+    def remove(self, entry_id):
+        with self.lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        self.entries.pop(entry_id, None)
+        for key in self.entry_keys.pop(entry_id, ()):
+            position = bisect_left(self.keys, (key, entry_id))
+            if position < len(self.keys) and self.keys[position] == (key, entry_id):
+                del self.keys[position]
+
+    def complete(self, prefix, limit=8):
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        keys = self.keys
+        entries = self.entries
+        best = {}
+        start = bisect_left(keys, (prefix, ''))
+        for key, entry_id in keys[start:start + MAX_SCAN]:
+            if not key.startswith(prefix):
+                break
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            kind, label, ref_id, weight = entry
+            # One suggestion per distinct label, keep the heaviest
+            dedupe_key = (kind, label.lower())
+            if dedupe_key not in best or best[dedupe_key][3] < weight:
+                best[dedupe_key] = entry
+        return heapq.nlargest(limit, best.values(), key=lambda entry: entry[3])
+
+
+def _title_keys(title):
+    words = _normalize(title).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def item_entry(item, popularity=0, now=None):
+    now = now or timezone.now()
+    weight = _item_weight(item.created_at, popularity, now)
+    return (f'i{item.id}', KIND_ITEM, item.title, item.id, weight, _title_keys(item.title))
+
+
+def category_entry(category, item_count):
+    return (f'c{category.id}', KIND_CATEGORY, category.name, category.id,
+            1 + math.log1p(item_count), _title_keys(category.name))
+
+
+def seller_entry(seller_id, username, listing_count):
+    return (f's{seller_id}', KIND_SELLER, username, seller_id,
+            1 + math.log1p(listing_count), {username.lower()})
+
+
+def build_index():
+    """Build a fresh index from the database"""
+    index = PrefixIndex()
+    now = timezone.now()
+    items = (
+        Item.objects.filter(status__in=LISTED_STATUSES)
+        .annotate(popularity=Count('cartitem', distinct=True))
+        .only('id', 'title', 'created_at', 'seller__username')
+        .select_related('seller')
+        .order_by()
+    )
+    sellers = {}
+    for item in items.iterator(chunk_size=2000):
+        index.add(*item_entry(item, item.popularity, now))
+        seller = sellers.setdefault(item.seller_id, [item.seller.username, 0])
+        seller[1] += 1
+
+    categories = Category.objects.annotate(
+        item_count=Count('item', filter=Q(item__status__in=LISTED_STATUSES, item__deleted_at__isnull=True))
+    )
+    for category in categories:
+        index.add(*category_entry(category, category.item_count))
+
+    for seller_id, (username, listing_count) in sellers.items():
+        index.add(*seller_entry(seller_id, username, listing_count))
+    return index
+
+
+_index = None
+_build_lock = threading.Lock()
+_apply_lock = threading.Lock()
+# Changes applied while a rebuild runs, replayed onto the new index
+_replay = None
+
+
+def rebuild(if_missing=False):
+    """Build a fresh index and swap it in; returns it"""
+    global _index, _replay
+    with _build_lock:
+        if if_missing and _index is not None:
+            return _index
+        _replay = []
+        try:
+            index = build_index()
+        except BaseException:
+            _replay = None
+            raise
+        with _apply_lock:
+            for change in _replay:
+                change(index)
+            _replay = None
+            _index = index
+    return index
+
+
+def _rebuild_in_background():
+    try:
+        rebuild()
+    finally:
+        # This thread's connection would otherwise stay open until the process exits
+        connection.close()
+
+
+def get_index():
+    """This process's index; a stale one is rebuilt in a background thread while it keeps serving"""
+    index = _index
+    if index is None:
+        # Only when the warm-up didn't build it (e.g. runserver); concurrent callers share one build
+        return rebuild(if_missing=True)
+    interval = getattr(settings, 'AUTOCOMPLETE_RECONCILE_SECONDS', 300)
+    if time.monotonic() - index.built_at >= interval and not _build_lock.locked():
+        # Pushed back so the next requests don't start another thread meanwhile
+        index.built_at = time.monotonic()
+        threading.Thread(target=_rebuild_in_background, name='autocomplete-rebuild', daemon=True).start()
+    return index
+
+
+def complete(prefix, limit=8):
+    return get_index().complete(prefix, limit)
+
+
+# Incremental changes
+
+def _apply(change):
+    with _apply_lock:
+        if _index is not None:
+            change(_index)
+        if _replay is not None:
+            _replay.append(change)
+
+
+def _add(entry, index):
+    index.add(*entry)
+
+
+def _remove(entry_id, index):
+    index.remove(entry_id)
+
+
+def _add_category(entry, index):
+    entry_id, kind, label, ref_id, weight, keys = entry
+    # Keep the item-count weight from the last rebuild
+    existing = index.entries.get(entry_id)
+    if existing is not None:
+        weight = existing[3]
+    index.add(entry_id, kind, label, ref_id, weight, keys)
+
+
+def _add_seller(entry, index):
+    # Sellers are only added here; the listing-count weight and removal of
+    # sellers with nothing left on sale wait for the next rebuild
+    if entry[0] not in index.entries:
+        index.add(*entry)
+
+
+def _on_commit(change, using):
+    """Apply `change` once the current transaction commits, never if it rolls back"""
+    if _index is None and _replay is None:
+        return
+    transaction.on_commit(partial(_apply, change), using=using)
+
+
+def _listed_changes(item):
+    return [partial(_add, item_entry(item)),
+            partial(_add_seller, seller_entry(item.seller_id, item.seller.username, 1))]
+
+
+def _sync_items(item_ids):
+    listed = (
+        Item.objects.filter(id__in=item_ids, status__in=LISTED_STATUSES)
+        .only('id', 'title', 'created_at', 'seller__username')
+        .select_related('seller')
+    )
+    listed_ids = set()
+    for item in listed:
+        listed_ids.add(item.id)
+        for change in _listed_changes(item):
+            _apply(change)
+    for item_id in item_ids:
+        if item_id not in listed_ids:
+            _apply(partial(_remove, f'i{item_id}'))
+
+
+def items_changed(item_ids, using=None):
+    """Re-check `item_ids` once the transaction commits, for ``update()`` calls that send no signals"""
+    if _index is None and _replay is None:
+        return
+    transaction.on_commit(partial(_sync_items, list(item_ids)), using=using)
+
+
+# Signal receivers (connected in StoreConfig.ready)
+
+def item_saved(sender, instance, using=None, **kwargs):
+    if instance.deleted_at is None and instance.status in LISTED_STATUSES:
+        for change in _listed_changes(instance):
+            _on_commit(change, using)
+    else:
+        _on_commit(partial(_remove, f'i{instance.id}'), using)
+
+
+def item_deleted(sender, instance, using=None, **kwargs):
+    _on_commit(partial(_remove, f'i{instance.id}'), using)
+
+
+def category_saved(sender, instance, using=None, **kwargs):
+    _on_commit(partial(_add_category, category_entry(instance, 0)), using)
+
+
+def category_deleted(sender, instance, using=None, **kwargs):
+    _on_commit(partial(_remove, f'c{instance.id}'), using)
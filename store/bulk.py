@@ -0,0 +1,188 @@
+"""
+Bulk seller actions on many listings at once.
+
+Ownership of the whole selection is checked with one query, each operation
+is applied with QuerySet.update() or bulk_update() inside a single
+transaction, and the caller gets a result per requested id. Ids the seller
+does not own (or that are already deleted) are reported rather than raising,
+so one stale id does not sink a 300-item clear-out.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import autocomplete, page_cache, profile_counters
+from .models import CartItem, Category, Item, Order, PurgeTask
+from .purge import hide_items
+
+MAX_ITEMS = 1000
+CENT = Decimal('0.01')
+_price_field = Item._meta.get_field('price')
+# Largest price the column holds (999999.99)
+MAX_PRICE = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places) - CENT
+
+
+class BulkActionError(ValueError):
+    """The request as a whole is invalid (unknown operation, bad parameters)"""
+
+
+def _decimal(value, name):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise BulkActionError(f'{name} must be a number')
+    if not number.is_finite():
+        raise BulkActionError(f'{name} must be a number')
+    return number
+
+
+def parse_ids(values):
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise BulkActionError('Item ids must be integers')
+    if not ids:
+        raise BulkActionError('Select at least one item')
+    if len(ids) > MAX_ITEMS:
+        raise BulkActionError(f'At most {MAX_ITEMS} items per request')
+    return ids
+
+
+def apply(user, item_ids, operation, params):
+    """Run `operation` on the seller's items; returns [{'id', 'ok', ...}] in request order"""
+    if operation not in HANDLERS:
+        raise BulkActionError(f'Unknown operation {operation!r}')
+    item_ids = parse_ids(item_ids)
+
+    with transaction.atomic():
+        owned = {
+            item.id: item for item in
+            Item.objects.select_for_update().filter(id__in=item_ids, seller=user)
+            .only('id', 'seller_id', 'status', 'price', 'category_id')
+        }
+        # Tags are read before the change, so a move also purges the old categories
+        page_cache.purge_items(list(owned))
+        # Re-read after commit, so sold/deleted ones drop out and relisted ones return
+        autocomplete.items_changed(list(owned))
+        results = HANDLERS[operation](user, list(owned.values()), params)
+
+    return [
+        results.get(item_id) or {'id': item_id, 'ok': False, 'error': 'Not found'}
+        for item_id in item_ids
+    ]
+
+
+def _ok(item, **extra):
+    return {'id': item.id, 'ok': True, **extra}
+
+
+def _skip(item, error):
+    return {'id': item.id, 'ok': False, 'error': error}
+
+
+def _reprice(user, items, params):
+    mode = params.get('mode', 'percent')
+    value = _decimal(params.get('value'), 'value')
+    if mode == 'percent':
+        if value <= -100:
+            raise BulkActionError('A percentage change must be above -100')
+        factor = 1 + value / 100
+        new_price = lambda price: price * factor
+    elif mode == 'absolute':
+        if not CENT <= value <= MAX_PRICE:
+            raise BulkActionError(f'The new price must be between $0.01 and ${MAX_PRICE}')
+        new_price = lambda price: value
+    else:
+        raise BulkActionError("mode must be 'percent' or 'absolute'")
+
+    results, changed = {}, []
+    now = timezone.now()
+    for item in items:
+        if item.status == 'sold':
+            results[item.id] = _skip(item, 'Already sold')
+            continue
+        # Checked before rounding: quantize() fails on values the column can't hold
+        price = new_price(item.price)
+        if price > MAX_PRICE:
+            results[item.id] = _skip(item, f'Price would exceed ${MAX_PRICE}')
+            continue
+        price = price.quantize(CENT, rounding=ROUND_HALF_UP)
+        if price < CENT:
+            results[item.id] = _skip(item, 'Price would drop below $0.01')
+            continue
+        item.price = price
+        item.updated_at = now
+        changed.append(item)
+        results[item.id] = _ok(item, price=str(price))
+    Item.objects.bulk_update(changed, ['price', 'updated_at'], batch_size=500)
+    return results
+
+
+def _mark_sold(user, items, params):
+    results = {}
+    to_mark = []
+    for item in items:
+        if item.status == 'sold':
+            results[item.id] = _skip(item, 'Already sold')
+        else:
+            to_mark.append(item.id)
+            results[item.id] = _ok(item, status='sold')
+    marked = Item.objects.filter(id__in=to_mark).exclude(status='sold').update(
+        status='sold', reserved_by=None, reserved_until=None, updated_at=timezone.now(),
+    )
+    profile_counters.adjust(user.id, active_listings=-marked, items_sold=marked)
+    return results
+
+
+def _relist(user, items, params):
+    """Put listings marked sold by the seller back on sale (never ones a buyer paid for)"""
+    ordered = set(
+        Order.objects.filter(item_id__in=[item.id for item in items]).values_list('item_id', flat=True)
+    )
+    results = {}
+    to_relist = []
+    for item in items:
+        if item.status != 'sold':
+            results[item.id] = _skip(item, 'Not sold')
+        elif item.id in ordered:
+            results[item.id] = _skip(item, 'Sold through an order')
+        else:
+            to_relist.append(item.id)
+            results[item.id] = _ok(item, status='available')
+    relisted = Item.objects.filter(id__in=to_relist, status='sold').update(
+        status='available', updated_at=timezone.now(),
+    )
+    profile_counters.adjust(user.id, active_listings=relisted, items_sold=-relisted)
+    return results
+
+
+def _move_category(user, items, params):
+    category_id = params.get('category')
+    category = Category.objects.filter(id=category_id).first() if str(category_id).isdigit() else None
+    if category is None:
+        raise BulkActionError('Choose a category to move the items to')
+    Item.objects.filter(id__in=[item.id for item in items]).update(
+        category=category, updated_at=timezone.now(),
+    )
+    page_cache.purge(f'category:{category.id}')
+    return {item.id: _ok(item, category=category.name) for item in items}
+
+
+def _delete(user, items, params):
+    """Soft-delete in bulk; purge_deleted removes the rows later, as for single deletes"""
+    ids = [item.id for item in items]
+    hide_items(Item.objects.filter(id__in=ids), user.id)
+    CartItem.objects.filter(item_id__in=ids).delete()
+    PurgeTask.objects.bulk_create([PurgeTask(kind='item', object_id=item_id) for item_id in ids])
+    return {item.id: _ok(item, deleted=True) for item in items}
+
+
+HANDLERS = {
+    'reprice': _reprice,
+    'mark_sold': _mark_sold,
+    'relist': _relist,
+    'move_category': _move_category,
+    'delete': _delete,
+}
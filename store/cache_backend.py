@@ -0,0 +1,263 @@
+"""
+Cache backend shared by every worker process on the host, on a SQLite file.
+
+LocMemCache gives each gunicorn worker its own cache, so a page cached or
+purged in one worker is invisible to the others, and Redis is not always
+available. SQLiteCache keeps entries in one SQLite database in WAL mode:
+readers never block each other or the writer, a write is one short
+transaction, and every process sees the same data.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'store.cache_backend.SQLiteCache',
+            'LOCATION': '/path/to/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 50000, 'CULL_FREQUENCY': 4},
+        }
+    }
+
+Values are pickled, except plain ints, which are stored as SQL integers so
+incr()/decr() are a single atomic UPDATE. add() is an atomic upsert that only
+replaces an expired row, which makes it usable as a cross-process lock.
+get_many()/set_many()/delete_many() are one statement or one transaction.
+
+Eviction is TTL first, then approximate LRU: a read only notes the key, and
+the access times are written with the next write instead of turning every
+read into a write. Every CULL_CHECK_INTERVAL writes, a process counts the
+rows; above MAX_ENTRIES it deletes expired rows, then the least recently used
+1/CULL_FREQUENCY of the rest.
+
+Each thread of each process opens its own connection (re-opened after fork).
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+CULL_CHECK_INTERVAL = 100
+# Reads refresh a key's LRU time at most this often
+TOUCH_RESOLUTION = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+
+def connect(path, schema):
+    """Open a WAL-mode connection to the SQLite file at `path`, creating it with `schema`"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # The data can lose its last writes on power loss; it can't be corrupted
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(schema)
+    return conn
+
+
+def _encode(value):
+    if type(value) is int and -(1 << 63) <= value < (1 << 63):
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._local = threading.local()
+        self._touched = {}
+        self._touched_lock = threading.Lock()
+        self._writes = 0
+
+    # Connection handling
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path, SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, statements):
+        """Run [(sql, params or [params, ...], many)] in one IMMEDIATE transaction; returns the cursors"""
+        conn = self._connection()
+        now = time.time()
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        cursors = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params, many in statements:
+                cursors.append(conn.executemany(sql, params) if many else conn.execute(sql, params))
+            if touched:
+                conn.executemany('UPDATE cache SET accessed = ? WHERE key = ?',
+                                 [(at, key) for key, at in touched.items()])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % CULL_CHECK_INTERVAL == 0:
+            self._cull(now)
+        return cursors
+
+    def _expiry(self, timeout):
+        # Absolute expiry time, or None to never expire
+        return self.get_backend_timeout(timeout)
+
+    def _note_reads(self, keys, now):
+        with self._touched_lock:
+            for key in keys:
+                if now - self._touched.get(key, 0) >= TOUCH_RESOLUTION:
+                    self._touched[key] = now
+
+    # Reads
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        self._note_reads([key], now)
+        return _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' for _ in key_map)
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            (*key_map, now),
+        ).fetchall()
+        self._note_reads([key for key, _ in rows], now)
+        return {key_map[key]: _decode(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone() is not None
+
+    # Writes
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        expires, now = self._expiry(timeout), time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), _encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        self._write([(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed',
+            rows, True,
+        )])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        # Only an expired row may be replaced, so exactly one of several racing callers wins
+        cursor, = self._write([(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, _encode(value), self._expiry(timeout), now, now), False,
+        )])
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor, = self._write([(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), now, key, now), False,
+        )])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            updated = conn.execute(
+                "UPDATE cache SET value = value + ?, accessed = ? "
+                "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)",
+                (delta, now, key, now),
+            ).rowcount
+            row = conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone() if updated else None
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if row is None:
+            raise ValueError(f"Key '{key}' not found or not an integer")
+        return row[0]
+
+    def delete(self, key, version=None):
+        return self.delete_many([key], version=version) > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        if not keys:
+            return 0
+        cursor, = self._write([('DELETE FROM cache WHERE key = ?', keys, True)])
+        return cursor.rowcount
+
+    def clear(self):
+        self._write([('DELETE FROM cache', (), False)])
+
+    # Eviction
+
+    def _cull(self, now):
+        conn = self._connection()
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (now,))
+            count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries and self._cull_frequency == 0:
+                conn.execute('DELETE FROM cache')
+            elif count > self._max_entries:
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (max(count // self._cull_frequency, count - self._max_entries),),
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests
+        pass
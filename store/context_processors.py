@@ -0,0 +1,11 @@
+from .models import Notification
+
+
+def notifications(request):
+    """Unread notification count for the navbar badge"""
+    if not request.user.is_authenticated:
+        return {}
+    # A callable, so the COUNT only runs on pages whose template shows the badge
+    return {
+        'unread_notifications': lambda: Notification.objects.filter(user=request.user, is_read=False).count(),
+    }
@@ -0,0 +1,166 @@
+"""
+Home page discovery feed.
+
+Cards are served newest first with keyset pagination on Item.id, so each
+batch is an index range scan no matter how deep the user has swiped. The
+cursor is opaque to the client: "<before id>" optionally followed by
+":<id>,<id>..." for cards already served out of order (the personalized first
+batch) that the chronological scan must not repeat. Items
+the user already swiped are skipped in Python against a per-user bitmap of
+item ids (SeenItems) instead of a ``NOT IN (SELECT item_id FROM swipe ...)``
+that grows with every swipe.
+
+Swipe rows are the source of truth; the bitmap is a cache of them up to
+``last_swipe_id``. Loading it folds in any newer rows, so a bitmap update
+lost to two concurrent writers simply gets replayed next time.
+"""
+
+import zlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from . import ranking
+from .models import CartItem, Item, SeenItems, Swipe
+
+BATCH_SIZE = 10
+PERSONALIZED_LIMIT = 20
+SCAN_CHUNK = 50
+MAX_SCAN_CHUNKS = 10
+
+
+class Bitmap:
+    """Set of non-negative ints stored one bit each, zlib-compressed at rest"""
+
+    def __init__(self, data=b''):
+        self.bits = bytearray(zlib.decompress(data)) if data else bytearray()
+
+    def add(self, value):
+        byte = value >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        self.bits[byte] |= 1 << (value & 7)
+
+    def __contains__(self, value):
+        byte = value >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (value & 7)))
+
+    def to_bytes(self):
+        return zlib.compress(bytes(self.bits))
+
+
+def load_seen(user, save_threshold=50):
+    """The user's seen-item bitmap, brought up to date with their latest swipes"""
+    record = SeenItems.objects.filter(user=user).first() or SeenItems(user=user)
+    seen = Bitmap(record.bitmap)
+    newer = list(
+        Swipe.objects.filter(user=user, id__gt=record.last_swipe_id).order_by('id').values_list('id', 'item_id')
+    )
+    for _, item_id in newer:
+        seen.add(item_id)
+    if len(newer) >= save_threshold:
+        _save(record, seen, newer[-1][0])
+    return seen
+
+
+def _save(record, seen, last_swipe_id):
+    record.bitmap = seen.to_bytes()
+    record.last_swipe_id = last_swipe_id
+    try:
+        record.save()
+    except IntegrityError:
+        # Another request created the row first; ours is only a cache, try next time
+        pass
+
+
+def record_swipes(user, swipes):
+    """Store a batch of (item_id, direction) decisions and fold them into the bitmap
+
+    Returns the number of new swipes; repeats of an earlier decision are ignored.
+    """
+    directions = dict(Swipe.DIRECTION_CHOICES)
+    decisions = {item_id: direction for item_id, direction in swipes if direction in directions}
+    if not decisions:
+        return 0
+    existing = set(Item.objects.filter(id__in=decisions).values_list('id', flat=True))
+    if not existing:
+        return 0
+    swiped = Swipe.objects.filter(user=user, item_id__in=existing)
+    with transaction.atomic():
+        # bulk_create can't report which rows ignore_conflicts skipped
+        before = swiped.count()
+        Swipe.objects.bulk_create(
+            [Swipe(user=user, item_id=item_id, direction=direction)
+             for item_id, direction in decisions.items() if item_id in existing],
+            ignore_conflicts=True,
+        )
+        created = swiped.count() - before
+    load_seen(user, save_threshold=1)
+    return created
+
+
+def parse_cursor(cursor):
+    """(before id, ids to skip) from a cursor; raises ValueError if it is malformed"""
+    if not cursor:
+        return None, frozenset()
+    before, _, skip = str(cursor).partition(':')
+    return int(before), frozenset(int(item_id) for item_id in skip.split(',') if item_id)
+
+
+def format_cursor(before, skip=()):
+    if before is None:
+        return None
+    # Skipped ids at or above the cursor can't come up again
+    skip = sorted(item_id for item_id in skip if item_id < before)
+    return f"{before}:{','.join(map(str, skip))}" if skip else str(before)
+
+
+def next_batch(user, cursor=None, limit=BATCH_SIZE):
+    """Up to `limit` unseen cards after `cursor`; returns (items, next cursor or None)
+
+    The first batch (no cursor) of a user with precomputed affinities is their
+    personalized candidates instead; the chronological feed follows from the
+    top, skipping those cards. Raises ValueError for a malformed cursor.
+    """
+    before, skip = parse_cursor(cursor)
+    seen = None
+    if user.is_authenticated:
+        seen = load_seen(user)
+        for item_id in CartItem.objects.filter(cart__user=user).values_list('item_id', flat=True):
+            seen.add(item_id)
+        if before is None:
+            personalized = ranking.ranked_candidates(user, exclude=seen)[:PERSONALIZED_LIMIT]
+            if personalized:
+                top = Item.all_objects.aggregate(top=Max('id'))['top'] + 1
+                return personalized, format_cursor(top, [item.id for item in personalized])
+
+    queryset = Item.objects.available(user).select_related('seller', 'category').order_by('-id')
+    if user.is_authenticated:
+        queryset = queryset.exclude(seller=user)
+
+    cards = []
+    cursor = before
+    for _ in range(MAX_SCAN_CHUNKS):
+        chunk = list((queryset.filter(id__lt=cursor) if cursor else queryset)[:SCAN_CHUNK])
+        for item in chunk:
+            cursor = item.id
+            if item.id not in skip and (seen is None or item.id not in seen):
+                cards.append(item)
+                if len(cards) == limit:
+                    return cards, format_cursor(cursor, skip)
+        if len(chunk) < SCAN_CHUNK:
+            return cards, None
+    # Scanned a long run of seen items; the client carries on from here next time
+    return cards, format_cursor(cursor, skip)
+
+
+def card_data(item):
+    return {
+        'id': item.id,
+        'title': item.title,
+        'price': str(item.price),
+        'seller': item.seller.username,
+        'category': item.category.name if item.category_id else '',
+        'condition': item.get_condition_display(),
+        'image': item.image.url if item.image else '',
+    }
@@ -0,0 +1,154 @@
+"""
+Write-buffered engagement counters (views, cart adds, chat starts) per listing.
+
+Hot paths such as item_detail (and cached page hits) only bump an in-memory
+counter under a lock; no request ever waits on the database for them. A
+background thread in each process flushes the pending increments to
+ItemEngagement in one transaction of
+``INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n`` statements every
+ENGAGEMENT_FLUSH_INTERVAL seconds, or sooner once ENGAGEMENT_FLUSH_THRESHOLD
+distinct counters are pending, and gunicorn's worker_exit hook flushes once
+more. A hard crash loses at most one interval of increments from that worker.
+With ENGAGEMENT_FLUSH_INTERVAL set to None no thread is started and flush()
+has to be called explicitly.
+
+counts() reads the flushed totals and adds this process's pending increments,
+so a seller sees their own just-recorded activity; pending increments of
+other workers show up after their next flush.
+
+Each flush also feeds the same increments into the trending scores
+(store.trending) inside its transaction.
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from . import trending
+from .models import Item, ItemEngagement
+
+FIELDS = ('views', 'cart_adds', 'chat_starts')
+
+Counts = namedtuple('Counts', FIELDS)
+
+_lock = threading.Lock()
+_pending = {}
+# Set to flush early, before the interval is up
+_wake = threading.Event()
+_flusher = None
+
+
+def _reset_after_fork():
+    global _lock, _pending, _wake, _flusher
+    _lock = threading.Lock()
+    _pending = {}
+    _wake = threading.Event()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def record(item_id, field, amount=1):
+    """Add `amount` to one of an item's FIELDS; the background thread writes it out"""
+    if field not in FIELDS:
+        raise ValueError(f'Unknown engagement counter {field!r}')
+    key = (item_id, field)
+    with _lock:
+        _pending[key] = _pending.get(key, 0) + amount
+        full = len(_pending) >= getattr(settings, 'ENGAGEMENT_FLUSH_THRESHOLD', 500)
+    interval = getattr(settings, 'ENGAGEMENT_FLUSH_INTERVAL', 10.0)
+    if interval is None:
+        return
+    _start_flusher(interval)
+    if full:
+        _wake.set()
+
+
+def _start_flusher(interval):
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        # Also restarts a thread that died on an unexpected error
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(
+                target=_flush_periodically, args=(interval,), name='engagement-flush', daemon=True,
+            )
+            _flusher.start()
+
+
+def _flush_periodically(interval):
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        connection.close_if_unusable_or_obsolete()
+        flush()
+
+
+def _upsert_sql():
+    quote = connection.ops.quote_name
+    table = quote(ItemEngagement._meta.db_table)
+    item_column = quote(ItemEngagement._meta.pk.column)
+    columns = ', '.join(quote(field) for field in FIELDS)
+    placeholders = ', '.join('%s' for _ in FIELDS)
+    increments = ', '.join(f'{quote(field)} = {table}.{quote(field)} + excluded.{quote(field)}' for field in FIELDS)
+    # The EXISTS guard drops increments for listings purged since they were recorded
+    return (
+        f'INSERT INTO {table} ({item_column}, {columns}, {quote("updated_at")}) '
+        f'SELECT %s, {placeholders}, %s WHERE EXISTS '
+        f'(SELECT 1 FROM {quote(Item._meta.db_table)} WHERE {quote(Item._meta.pk.column)} = %s) '
+        f'ON CONFLICT ({item_column}) DO UPDATE SET {increments}, '
+        f'{quote("updated_at")} = excluded.{quote("updated_at")}'
+    )
+
+
+def flush():
+    """Write this process's pending increments; returns how many items had any"""
+    global _pending
+    with _lock:
+        snapshot, _pending = _pending, {}
+    if not snapshot:
+        return 0
+
+    by_item = {}
+    for (item_id, field), amount in snapshot.items():
+        by_item.setdefault(item_id, dict.fromkeys(FIELDS, 0))[field] += amount
+    now = timezone.now()
+    rows = [
+        (item_id, *(amounts[field] for field in FIELDS), now, item_id)
+        for item_id, amounts in by_item.items()
+    ]
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(_upsert_sql(), rows)
+            trending.apply(by_item, now)
+    except DatabaseError:
+        # Database busy: keep the increments for the next attempt
+        with _lock:
+            for key, amount in snapshot.items():
+                _pending[key] = _pending.get(key, 0) + amount
+        return 0
+    return len(rows)
+
+
+def counts(item_ids):
+    """{item_id: Counts} for `item_ids`, flushed totals plus this process's pending increments"""
+    item_ids = list(item_ids)
+    totals = {
+        row[0]: list(row[1:])
+        for row in ItemEngagement.objects.filter(item_id__in=item_ids).values_list('item_id', *FIELDS)
+    }
+    with _lock:
+        pending = dict(_pending)
+    result = {}
+    for item_id in item_ids:
+        values = totals.get(item_id, [0] * len(FIELDS))
+        for position, field in enumerate(FIELDS):
+            values[position] += pending.get((item_id, field), 0)
+        result[item_id] = Counts(*values)
+    return result
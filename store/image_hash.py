@@ -0,0 +1,183 @@
+"""
+Near-duplicate listing photos via perceptual hashing.
+
+Every listing photo gets a 64-bit difference hash (dHash). The image is
+shrunk to 9x8 grey pixels, and each bit says whether a pixel is brighter
+than its right-hand neighbour. Re-encoding, resizing, light crops and
+brightness changes flip only a few bits, so the Hamming distance between
+two hashes measures how alike the photos look. ItemImageHash stores the
+hash as one signed 64-bit integer.
+
+Lookup uses multi-index hashing. The hash is split into four 16-bit bands,
+each an indexed column. If two hashes differ in at most d bits, then by the
+pigeonhole principle at least one band differs in at most d // 4 bits. The
+candidates are therefore the rows that have, in some band, a value within
+d // 4 bits of the query's band. For any d up to 7 that is 4 * 17 index probes,
+whatever the catalogue size. The exact distance of each candidate is then
+checked in Python.
+
+Where hashing happens:
+    - sell_item hashes a new photo and warns the seller about a likely repost.
+    - edit_item re-hashes a replaced photo.
+    - `python manage.py scan_image_hashes` hashes the rest of the catalogue
+      in a process pool and reports groups of duplicates.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from PIL import Image
+
+from .models import Item, ItemImageHash
+
+BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def _max_distance():
+    return getattr(settings, 'IMAGE_DUPLICATE_DISTANCE', 6)
+
+
+def dhash(file):
+    """Unsigned 64-bit difference hash of the image in `file` (a path or file object)"""
+    with Image.open(file) as image:
+        # Lets the JPEG decoder skip most of the full-resolution work
+        image.draft('L', (64, 64))
+        pixels = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+
+def hash_file(path):
+    """dhash() of the file at `path`, or None if it isn't a readable image (safe for process pools)"""
+    try:
+        return dhash(path)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def to_signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def bands(value):
+    return [(value >> (BAND_BITS * position)) & BAND_MASK for position in range(BANDS)]
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(radius):
+    """XOR masks turning a band value into every value at most `radius` bits away"""
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), flips):
+            masks.append(sum(1 << bit for bit in bits))
+    return tuple(masks)
+
+
+def _within(value, radius):
+    """Every band value at most `radius` bits from `value`"""
+    return [value ^ mask for mask in _flip_masks(radius)]
+
+
+def save_hashes(rows):
+    """Store [(item_id, image name, unsigned hash)]"""
+    records = []
+    for item_id, name, value in rows:
+        band_values = bands(value)
+        records.append(ItemImageHash(
+            item_id=item_id, image=name, hash=to_signed(value),
+            **{f'band{position}': band for position, band in enumerate(band_values)},
+        ))
+    ItemImageHash.objects.bulk_create(
+        records, batch_size=500, update_conflicts=True, unique_fields=['item'],
+        update_fields=['image', 'hash', 'band0', 'band1', 'band2', 'band3', 'updated_at'],
+    )
+
+
+def update_item(item):
+    """Hash `item`'s photo unless it is unchanged since the last time; returns the hash or None"""
+    if not item.image:
+        ItemImageHash.objects.filter(item_id=item.id).delete()
+        return None
+    current = ItemImageHash.objects.filter(item_id=item.id).values_list('image', 'hash').first()
+    if current is not None and current[0] == item.image.name:
+        return to_unsigned(current[1])
+    try:
+        with default_storage.open(item.image.name, 'rb') as f:
+            value = dhash(f)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    save_hashes([(item.id, item.image.name, value)])
+    return value
+
+
+def near_duplicates(value, max_distance=None, exclude=()):
+    """[(item_id, distance)] of unsold listings whose photo is within `max_distance` bits, closest first"""
+    if max_distance is None:
+        max_distance = _max_distance()
+    radius = max_distance // BANDS
+    matches = Q()
+    for position, band in enumerate(bands(value)):
+        matches |= Q(**{f'band{position}__in': _within(band, radius)})
+    candidates = (
+        ItemImageHash.objects.filter(matches, item__in=Item.objects.exclude(status='sold'))
+        .exclude(item_id__in=exclude)
+        .values_list('item_id', 'hash')
+    )
+    found = []
+    for item_id, stored in candidates:
+        bits = distance(value, to_unsigned(stored))
+        if bits <= max_distance:
+            found.append((item_id, bits))
+    return sorted(found, key=lambda match: (match[1], match[0]))
+
+
+def duplicate_groups(rows, max_distance=None):
+    """Groups (lists of item ids, 2 or more) of [(item_id, unsigned hash)] linked by near-duplicate photos"""
+    if max_distance is None:
+        max_distance = _max_distance()
+    radius = max_distance // BANDS
+    index = [{} for _ in range(BANDS)]
+    for position, (_, value) in enumerate(rows):
+        for band_position, band in enumerate(bands(value)):
+            index[band_position].setdefault(band, []).append(position)
+
+    parent = list(range(len(rows)))
+
+    def find(position):
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    masks = _flip_masks(radius)
+    for position, (_, value) in enumerate(rows):
+        candidates = set()
+        for band_index, band in zip(index, bands(value)):
+            for mask in masks:
+                bucket = band_index.get(band ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        for other in candidates:
+            if other > position and distance(value, rows[other][1]) <= max_distance:
+                parent[find(other)] = find(position)
+
+    groups = {}
+    for position, (item_id, _) in enumerate(rows):
+        groups.setdefault(find(position), []).append(item_id)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=len, reverse=True)
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.archive import archivable_items, archive_batch
+
+
+class Command(BaseCommand):
+    help = ('Move sold listings older than N days, and their reviews, into the archive tables. '
+            'Meant to be run on a schedule (e.g. nightly from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'ARCHIVE_AFTER_DAYS', 30),
+                            help='Archive items sold at least this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Items moved per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between batches to let other writers in')
+        parser.add_argument('--limit', type=int, default=0,
+                            help='Stop after archiving this many items (0 = no limit)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many items would be archived')
+
+    def handle(self, *args, **options):
+        candidates = archivable_items(options['days'])
+
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} items would be archived')
+            return
+
+        total = 0
+        last_id = 0
+        while True:
+            batch_size = options['batch_size']
+            if options['limit']:
+                batch_size = min(batch_size, options['limit'] - total)
+                if batch_size <= 0:
+                    break
+            # Walk the primary key so each batch is a cheap indexed range scan
+            ids = list(
+                candidates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            moved = archive_batch(ids)
+            total += moved
+            self.stdout.write(f'Archived {moved} items (total {total})')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully archived {total} items'))
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from store.cache_backend import SQLiteCache
+
+
+def _incr_worker(cache, key, count):
+    for _ in range(count):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0)
+            cache.incr(key)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the shared SQLite cache backend against the locmem and file-based caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=2000, help='Operations per measurement')
+        parser.add_argument('--value-size', type=int, default=16384,
+                            help='Bytes per cached value (about a rendered page)')
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Worker processes for the shared-counter check')
+
+    def handle(self, *args, **options):
+        ops = options['ops']
+        value = 'x' * options['value_size']
+        with tempfile.TemporaryDirectory() as directory:
+            backends = [
+                ('locmem', LocMemCache('benchmark', {'OPTIONS': {'MAX_ENTRIES': ops * 2}})),
+                ('filebased', FileBasedCache(os.path.join(directory, 'files'),
+                                             {'OPTIONS': {'MAX_ENTRIES': ops * 2}})),
+                ('sqlite', SQLiteCache(os.path.join(directory, 'cache.sqlite3'),
+                                       {'OPTIONS': {'MAX_ENTRIES': ops * 2}})),
+            ]
+            self.stdout.write(f'{"backend":<10} {"set":>9} {"get hit":>9} {"get miss":>9} '
+                              f'{"get_many":>9} {"incr":>9} {"shared":>8}   (microseconds per op)')
+            for name, cache in backends:
+                self.stdout.write(f'{name:<10} ' + ' '.join(
+                    f'{self.measure(operation, ops):>9.1f}' for operation in self.operations(cache, value, ops)
+                ) + f' {self.shared_counter(cache, options["processes"], ops // 10):>8}')
+        self.stdout.write(self.style.SUCCESS(
+            'Successfully benchmarked cache backends ("shared" is whether every process saw '
+            'every other process\'s increments)'
+        ))
+
+    def operations(self, cache, value, ops):
+        keys = [f'page:{i}' for i in range(ops)]
+        cache.set('counter', 0)
+        return [
+            lambda i: cache.set(keys[i], value, timeout=300),
+            lambda i: cache.get(keys[i]),
+            lambda i: cache.get(f'missing:{i}'),
+            lambda i: cache.get_many(keys[i:i + 10]),
+            lambda i: cache.incr('counter'),
+        ]
+
+    def measure(self, operation, ops):
+        started = time.perf_counter()
+        for i in range(ops):
+            operation(i)
+        return (time.perf_counter() - started) / ops * 1e6
+
+    def shared_counter(self, cache, processes, count):
+        """Whether increments made by `processes` forked workers add up in the parent"""
+        key = f'shared:{time.time_ns()}'
+        cache.set(key, 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_incr_worker, args=(cache, key, count)) for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return 'yes' if cache.get(key) == processes * count else 'no'
@@ -0,0 +1,87 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from store.alerts import Listing, SearchIndex, Spec, spec_matches
+from store.models import Item
+
+# Letter weights roughly as in English text, so synthetic words share trigrams realistically
+LETTERS = 'etaoinshrdlcumwfgypbvkjxqz'
+LETTER_WEIGHTS = [12, 9, 8, 7.5, 7, 6.7, 6.3, 6, 6, 4.3, 4, 2.8, 2.8, 2.4, 2.4, 2.2, 2, 2, 1.7, 1.5, 1, 0.8, 0.2, 0.2, 0.1, 0.1]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark saved-search matching on synthetic data (no database writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--searches', type=int, default=100000)
+        parser.add_argument('--items', type=int, default=2000)
+        parser.add_argument('--naive-sample', type=int, default=50,
+                            help='Items to match by checking every saved search, for comparison')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = sorted({
+            ''.join(rng.choices(LETTERS, LETTER_WEIGHTS, k=rng.randint(4, 9))) for _ in range(20000)
+        })
+        conditions = [value for value, _ in Item.CONDITION_CHOICES]
+
+        def price():
+            return Decimal(rng.randint(1, 500))
+
+        specs = []
+        for spec_id in range(options['searches']):
+            # Mostly text searches; the rest at least narrow to a category
+            query = ' '.join(rng.sample(vocabulary, rng.choice([1, 1, 1, 2]))) if rng.random() < 0.95 else ''
+            category_id = rng.randint(1, 20) if not query or rng.random() < 0.4 else None
+            low = price() if rng.random() < 0.3 else None
+            high = (low or 0) + price() if rng.random() < 0.4 else None
+            specs.append(Spec(
+                spec_id, rng.randint(1, options['searches'] // 3), query, category_id,
+                low, high, rng.choice(conditions) if rng.random() < 0.2 else '',
+            ))
+        listings = [
+            Listing(
+                item_id, rng.randint(1, 5000),
+                ' '.join(rng.choices(vocabulary, k=rng.randint(3, 6))),
+                ' '.join(rng.choices(vocabulary, k=rng.randint(10, 30))),
+                price(), rng.randint(1, 20), rng.choice(conditions),
+            )
+            for item_id in range(options['items'])
+        ]
+
+        started = time.perf_counter()
+        index = SearchIndex(specs)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        indexed_matches = [index.match(listing) for listing in listings]
+        indexed_seconds = time.perf_counter() - started
+
+        sample = listings[:options['naive_sample']]
+        started = time.perf_counter()
+        naive_matches = []
+        for listing in sample:
+            text = f'{listing.title}\n{listing.description}'.lower()
+            naive_matches.append([spec for spec in specs if spec_matches(spec, listing, text)])
+        naive_seconds = time.perf_counter() - started
+
+        for indexed, naive in zip(indexed_matches, naive_matches):
+            if sorted(spec.id for spec in indexed) != sorted(spec.id for spec in naive):
+                self.stderr.write(self.style.ERROR('Indexed and naive matching disagree'))
+                return
+
+        per_item_indexed = indexed_seconds / len(listings) * 1000
+        per_item_naive = naive_seconds / max(len(sample), 1) * 1000
+        total_matches = sum(len(matches) for matches in indexed_matches)
+        self.stdout.write(f'Saved searches:   {len(specs)}')
+        self.stdout.write(f'Index build:      {build_seconds:.2f}s')
+        self.stdout.write(f'Indexed matching: {per_item_indexed:.3f} ms/item '
+                          f'({len(listings) / indexed_seconds:.0f} items/s, {total_matches} matches)')
+        self.stdout.write(f'Naive matching:   {per_item_naive:.3f} ms/item (sample of {len(sample)})')
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed matching is {per_item_naive / per_item_indexed:.0f}x faster, results identical'
+        ))
@@ -0,0 +1,71 @@
+import time
+from importlib import import_module
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+ENGINES = (
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('store', 'store.session_backend'),
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-request session cost of the db, cached_db and store.session_backend engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200, help='Logged-in sessions to spread requests over')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per measurement')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"engine":<10} {"read µs":>9} {"read q":>7} {"rewrite µs":>11} {"rewrite q":>10}'
+                          '   (per request; q = database queries)')
+        for label, engine in ENGINES:
+            store_class = import_module(engine).SessionStore
+            keys = [self.create_session(store_class, user_id) for user_id in range(1, options['sessions'] + 1)]
+            try:
+                read_time, read_queries = self.measure(store_class, keys, options['requests'], rewrite=False)
+                rewrite_time, rewrite_queries = self.measure(store_class, keys, options['requests'], rewrite=True)
+            finally:
+                for key in keys:
+                    store_class(key).delete()
+            self.stdout.write(f'{label:<10} {read_time:>9.1f} {read_queries:>7.2f} '
+                              f'{rewrite_time:>11.1f} {rewrite_queries:>10.2f}')
+        self.stdout.write(self.style.SUCCESS(
+            'Successfully benchmarked session engines ("rewrite" sets a key to the value it already has)'
+        ))
+
+    def create_session(self, store_class, user_id):
+        session = store_class()
+        session[SESSION_KEY] = str(user_id)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = 'x' * 64
+        session.save()
+        return session.session_key
+
+    def measure(self, store_class, keys, requests, rewrite):
+        """Average seconds (as µs) and queries for one request's worth of session work"""
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for i in range(requests):
+                # What SessionMiddleware and AuthenticationMiddleware do for a logged-in request
+                session = store_class(keys[i % len(keys)])
+                user_id = session.get(SESSION_KEY)
+                if rewrite:
+                    session[SESSION_KEY] = user_id
+                if session.modified:
+                    session.save()
+            elapsed = time.perf_counter() - started
+        return elapsed / requests * 1e6, counter.queries / requests
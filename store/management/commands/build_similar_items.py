@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from store.recommendations import build, refresh
+
+
+class Command(BaseCommand):
+    help = 'Compute "similar items" neighbours for available listings (incremental unless --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every listing instead of only new ones')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Listings scored per sparse matrix product')
+
+    def handle(self, *args, **options):
+        if options['full']:
+            count = build(batch_size=options['batch_size'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt neighbours for {count} listings'))
+        else:
+            count = refresh(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Successfully added neighbours for {count} new listings'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.affinity import LOOKBACK_DAYS, run
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-user category/price-band affinities and personalized home candidates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookback-days', type=int, default=LOOKBACK_DAYS,
+                            help='Only interactions from this many days count')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Users scored per matrix multiplication')
+
+    def handle(self, *args, **options):
+        updated = run(lookback_days=options['lookback_days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully computed affinities for {updated} users'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.reservations import expire_lapsed
+
+
+class Command(BaseCommand):
+    help = 'Release cart holds whose reservation window has lapsed'
+
+    def handle(self, *args, **options):
+        released = expire_lapsed()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from store.media_storage import collect_garbage, referenced_names
+
+
+class Command(BaseCommand):
+    help = 'Delete uploaded files no longer referenced by any row (see store/media_storage.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=None,
+                            help='Keep unreferenced files younger than this (default MEDIA_GC_GRACE_HOURS)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        references = referenced_names()
+        shared = sum(1 for count in references.values() if count > 1)
+        self.stdout.write(f'{len(references)} files referenced, {shared} of them by more than one row')
+
+        removed, freed = collect_garbage(options['grace_hours'], dry_run=options['dry_run'], referenced=references)
+        verb = 'Would remove' if options['dry_run'] else 'Successfully removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} orphaned files ({freed / 1024 / 1024:.1f} MB)'))
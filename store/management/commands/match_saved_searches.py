@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.alerts import run
+
+
+class Command(BaseCommand):
+    help = 'Match newly listed items against saved searches and create in-app notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Item id range matched per transaction')
+
+    def handle(self, *args, **options):
+        checked, created = run(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully matched {checked} new items, created {created} notifications'
+        ))
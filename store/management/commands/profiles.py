@@ -0,0 +1,49 @@
+import os
+import pstats
+from io import StringIO
+
+from django.core.management.base import BaseCommand
+
+from store.profiling import get_profiling_dir, load_summaries
+
+
+class Command(BaseCommand):
+    help = 'List the slowest captured request profiles and summarize their hot spots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Number of profiles to list')
+        parser.add_argument('--view', help='Only show profiles for this URL name')
+        parser.add_argument('--top', type=int, default=0,
+                            help='Print the N most expensive functions of each listed profile')
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'calls'],
+                            help='pstats sort key used with --top')
+
+    def handle(self, *args, **options):
+        directory = get_profiling_dir()
+        summaries = load_summaries(directory)
+        if options['view']:
+            summaries = [s for s in summaries if s.get('view') == options['view']]
+
+        if not summaries:
+            self.stdout.write(self.style.WARNING(f'No profiles found in {directory}'))
+            return
+
+        self.stdout.write(
+            f'{"total":>9} {"sql":>9} {"tmpl":>9} {"python":>9} {"queries":>7}  view / path'
+        )
+        for summary in summaries[:options['limit']]:
+            self.stdout.write(
+                f'{summary["total_ms"]:>7.1f}ms {summary["sql_ms"]:>7.1f}ms '
+                f'{summary["template_ms"]:>7.1f}ms {summary["python_ms"]:>7.1f}ms '
+                f'{summary["sql_queries"]:>7}  {summary["view"]} {summary["method"]} {summary["path"]}'
+            )
+            self.stdout.write(f'    {summary["name"]}')
+
+            if options['top']:
+                stats_path = os.path.join(directory, summary['name'] + '.pstats')
+                if not os.path.exists(stats_path):
+                    continue
+                out = StringIO()
+                stats = pstats.Stats(stats_path, stream=out)
+                stats.strip_dirs().sort_stats(options['sort']).print_stats(options['top'])
+                self.stdout.write(out.getvalue())
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from store.models import PurgeTask
+from store.purge import run_task
+
+
+class Command(BaseCommand):
+    help = 'Hard-delete soft-deleted listings and accounts in small throttled batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows removed per DELETE statement')
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help='Seconds to pause after each batch')
+        parser.add_argument('--max-tasks', type=int, default=0,
+                            help='Stop after this many tasks (0 = all pending)')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Also retry tasks that failed previously')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'running']
+        if options['retry_failed']:
+            statuses.append('failed')
+        tasks = PurgeTask.objects.filter(status__in=statuses)
+        if options['max_tasks']:
+            tasks = tasks[:options['max_tasks']]
+
+        done = 0
+        for task in tasks:
+            self.stdout.write(f'Purging {task.kind} #{task.object_id}')
+            try:
+                run_task(task, batch_size=options['batch_size'], sleep=options['sleep'], stdout=self.stdout)
+            except Exception as exc:
+                self.stdout.write(self.style.ERROR(f'Failed to purge {task.kind} #{task.object_id}: {exc}'))
+                continue
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully purged {done} tasks'))
@@ -0,0 +1,30 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Sessions removed per DELETE statement')
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help='Seconds to pause after each batch')
+
+    def handle(self, *args, **options):
+        # Cached copies expire on their own, with the same expiry age
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now).order_by()
+        total = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully purged {total} expired sessions'))
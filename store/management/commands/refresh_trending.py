@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.trending import prune
+
+
+class Command(BaseCommand):
+    help = 'Drop sold or faded listings from the trending scores and rebuild the trending lists'
+
+    def handle(self, *args, **options):
+        removed = prune()
+        self.stdout.write(self.style.SUCCESS(f'Successfully refreshed trending lists ({removed} listings dropped)'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import UserProfile
+from store.profile_counters import COUNTER_FIELDS, compute
+
+
+class Command(BaseCommand):
+    help = 'Verify the UserProfile counter caches against the source tables and fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report profiles whose counters are wrong')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profiles = UserProfile.objects.order_by('id').only('id', 'user_id', *COUNTER_FIELDS)
+        last_id = 0
+        checked = wrong = 0
+
+        while True:
+            batch = list(profiles.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            actual = compute([profile.user_id for profile in batch])
+
+            stale = []
+            for profile in batch:
+                expected = actual[profile.user_id]
+                diff = {
+                    field: (getattr(profile, field), expected[field])
+                    for field in COUNTER_FIELDS if getattr(profile, field) != expected[field]
+                }
+                checked += 1
+                if not diff:
+                    continue
+                wrong += 1
+                self.stdout.write(f'user {profile.user_id}: ' + ', '.join(
+                    f'{field} {old} -> {new}' for field, (old, new) in diff.items()
+                ))
+                for field, (_old, new) in diff.items():
+                    setattr(profile, field, new)
+                stale.append(profile)
+
+            if stale and not options['check']:
+                with transaction.atomic():
+                    UserProfile.objects.bulk_update(stale, COUNTER_FIELDS)
+
+        verb = 'found' if options['check'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} profiles, {verb} {wrong} with drifted counters'))
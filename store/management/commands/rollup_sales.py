@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.rollups import run
+
+
+class Command(BaseCommand):
+    help = 'Fold new orders and listings into the daily seller/category sales rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Ignore the watermark and rebuild every day from scratch')
+
+    def handle(self, *args, **options):
+        days = run(rebuild=options['rebuild'])
+        for day in days:
+            self.stdout.write(f'Rebuilt rollups for {day}')
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated {len(days)} days of rollups'))
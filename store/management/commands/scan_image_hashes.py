@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.image_hash import duplicate_groups, hash_file, save_hashes, to_unsigned
+from store.models import Item, ItemImageHash
+
+
+class Command(BaseCommand):
+    help = 'Hash every listing photo in a process pool and report groups of near-duplicate listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Hashing processes')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Photos hashed and saved per batch')
+        parser.add_argument('--rehash', action='store_true',
+                            help='Hash photos again even if they are unchanged')
+        parser.add_argument('--distance', type=int, default=None,
+                            help='Max differing bits for a duplicate (default IMAGE_DUPLICATE_DISTANCE)')
+        parser.add_argument('--show', type=int, default=20,
+                            help='Duplicate groups to list')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        hashed = dict(ItemImageHash.objects.values_list('item_id', 'image'))
+        pending = [
+            (item_id, name)
+            for item_id, name in Item.objects.exclude(image='').values_list('id', 'image').iterator()
+            if options['rehash'] or hashed.get(item_id) != name
+        ]
+        self.stdout.write(f'Hashing {len(pending)} photos with {options["workers"]} processes')
+
+        # The workers only decode images; they must not share the parent's database connection
+        connections.close_all()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, len(pending), options['batch_size']):
+                batch = pending[start:start + options['batch_size']]
+                values = pool.map(hash_file, [default_storage.path(name) for _, name in batch], chunksize=16)
+                rows = [(item_id, name, value) for (item_id, name), value in zip(batch, values) if value is not None]
+                save_hashes(rows)
+                done += len(rows)
+                failed += len(batch) - len(rows)
+
+        rows = [
+            (item_id, to_unsigned(value))
+            for item_id, value in ItemImageHash.objects.filter(
+                item__in=Item.objects.exclude(status='sold'),
+            ).values_list('item_id', 'hash').iterator()
+        ]
+        groups = duplicate_groups(rows, options['distance'])
+        sellers = dict(Item.objects.filter(id__in=[i for group in groups for i in group]).values_list('id', 'seller_id'))
+        for group in groups[:options['show']]:
+            same_seller = len({sellers.get(item_id) for item_id in group}) == 1
+            self.stdout.write(f'  {len(group)} listings{" (same seller)" if same_seller else ""}: '
+                              + ', '.join(str(item_id) for item_id in group))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully hashed {done} photos ({failed} unreadable) in {time.monotonic() - started:.1f}s; '
+            f'{len(groups)} duplicate groups covering {sum(len(group) for group in groups)} unsold listings'
+        ))
@@ -0,0 +1,59 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from store.querylog import get_log_path, read_log
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow-query log grouped by SQL fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=15, help='Number of fingerprints to show')
+        parser.add_argument('--hours', type=float, help='Only include queries from the last N hours')
+        parser.add_argument('--sort', default='total', choices=['total', 'count', 'p95'],
+                            help='Order fingerprints by total time, count or p95')
+        parser.add_argument('--path', help='Log file to read (defaults to SLOW_QUERY_LOG)')
+
+    def handle(self, *args, **options):
+        since = time.time() - options['hours'] * 3600 if options['hours'] else None
+        groups = defaultdict(lambda: {'durations': [], 'sql': '', 'stacks': defaultdict(int)})
+
+        for entry in read_log(options['path'], since=since):
+            group = groups[entry['fingerprint']]
+            group['durations'].append(entry['duration_ms'])
+            group['sql'] = entry['sql']
+            if entry.get('stack'):
+                group['stacks'][' <- '.join(entry['stack'][:3])] += 1
+
+        if not groups:
+            self.stdout.write(self.style.WARNING(f'No slow queries logged in {options["path"] or get_log_path()}'))
+            return
+
+        rows = []
+        for key, group in groups.items():
+            durations = group['durations']
+            rows.append({
+                'fingerprint': key,
+                'count': len(durations),
+                'total': sum(durations),
+                'p95': percentile(durations, 95),
+                'sql': group['sql'],
+                'stacks': sorted(group['stacks'].items(), key=lambda s: s[1], reverse=True),
+            })
+        rows.sort(key=lambda r: r[options['sort']], reverse=True)
+
+        for row in rows[:options['limit']]:
+            self.stdout.write(self.style.SUCCESS(
+                f'{row["fingerprint"]}  count={row["count"]}  total={row["total"]:.1f}ms  p95={row["p95"]:.1f}ms'
+            ))
+            self.stdout.write(f'    {row["sql"][:300]}')
+            for stack, count in row['stacks'][:3]:
+                self.stdout.write(f'    {count:>5}x {stack}')
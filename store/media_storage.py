@@ -0,0 +1,240 @@
+"""
+Content-addressed storage for uploaded images, garbage collection and serving.
+
+ContentAddressedStorage (the default storage) names every upload after the
+SHA-256 of its bytes, under the field's upload_to directory:
+
+    items/3f/3fa4...c9.jpg
+
+The hash is computed while the upload is copied to a temporary file, which is
+then renamed into place. An identical upload (the same photo re-used on relist
+or edit) finds the file already there and is not stored again.
+
+Nothing deletes a file when a row stops pointing at it, because another row
+may share it. Instead collect_garbage() (`python manage.py gc_media`) marks
+every name referenced by any FileField column, walks the upload directories
+and deletes the unreferenced files. A file is only deleted once it is older
+than MEDIA_GC_GRACE_HOURS, so an upload whose row isn't committed yet
+survives. A dedup hit refreshes the file's mtime for the same reason.
+
+serve() answers /media/ requests without streaming bytes through the worker
+when it can:
+    - with MEDIA_ACCEL_REDIRECT (an nginx `internal` location for
+      MEDIA_ROOT), it returns an X-Accel-Redirect header;
+    - with MEDIA_SENDFILE (Apache/lighttpd), it returns X-Sendfile;
+    - otherwise it returns a FileResponse, which gunicorn sends with
+      sendfile(), and handles single-range requests itself.
+Hashed names never change content, so they are cached as immutable.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+
+CHUNK_SIZE = 64 * 1024
+TEMP_PREFIX = '.upload-'
+HASHED_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]{1,10}$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save; identical content may share it
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        if not re.fullmatch(r'\.[a-z0-9]{1,10}', extension):
+            extension = ''
+        target_dir = self.path(directory)
+        os.makedirs(target_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=target_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp.write(chunk)
+            hexdigest = digest.hexdigest()
+            final_name = '/'.join(part for part in (directory, hexdigest[:2], hexdigest + extension) if part)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                # Already stored; keep it clear of the garbage collector's grace period
+                os.utime(final_path)
+                os.unlink(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                # Atomic; a racing identical upload just replaces it with the same bytes
+                os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return final_name
+
+
+def is_hashed(name):
+    return HASHED_NAME.search(name) is not None
+
+
+# Garbage collection
+
+def file_fields():
+    """(model, field) for every FileField of every installed model"""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, models.FileField)
+    ]
+
+
+def referenced_names():
+    """{name: number of rows referencing it} over every FileField column, soft-deleted rows included"""
+    references = {}
+    for model, field in file_fields():
+        names = model._base_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+        for name in names.values_list(field.name, flat=True).iterator():
+            references[name] = references.get(name, 0) + 1
+    return references
+
+
+def upload_directories():
+    return sorted({
+        field.upload_to.strip('/') for _, field in file_fields() if isinstance(field.upload_to, str)
+    })
+
+
+def collect_garbage(grace_hours=None, dry_run=False, referenced=None):
+    """Delete unreferenced files in the upload directories; returns (files, bytes) removed"""
+    if grace_hours is None:
+        grace_hours = getattr(settings, 'MEDIA_GC_GRACE_HOURS', 24)
+    cutoff = time.time() - grace_hours * 3600
+    if referenced is None:
+        referenced = referenced_names()
+    root = default_storage.location
+    removed = freed = 0
+    for directory in upload_directories():
+        for dirpath, _dirnames, filenames in os.walk(os.path.join(root, directory)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name in referenced:
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff:
+                    continue
+                if not dry_run:
+                    os.unlink(path)
+                removed += 1
+                freed += stat.st_size
+    return removed, freed
+
+
+# Serving
+
+def _etag(name, stat):
+    match = HASHED_NAME.search(name)
+    return f'"{match.group(1)}"' if match else f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _byte_range(header, size):
+    """(start, end) inclusive for a single-range header, None to send everything, or False if unsatisfiable"""
+    match = RANGE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request, name):
+    """Response for the uploaded file `name` (relative to MEDIA_ROOT)"""
+    try:
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+    if os.path.basename(path).startswith(TEMP_PREFIX) or not os.path.isfile(path):
+        raise Http404('Media file not found')
+    stat = os.stat(path)
+    etag = _etag(name, stat)
+    if is_hashed(name):
+        cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache_control = 'public, max-age=3600'
+
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        accel = getattr(settings, 'MEDIA_ACCEL_REDIRECT', '')
+        if accel:
+            # The web server handles ranges and conditional requests itself
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = accel.rstrip('/') + '/' + quote(name)
+        elif getattr(settings, 'MEDIA_SENDFILE', False):
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            response = _file_response(request, path, stat.st_size, etag, content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _file_response(request, path, size, etag, content_type):
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    # A Range with a stale If-Range validator gets the whole (changed) file
+    if header and request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = _byte_range(header, size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206,
+                                         content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
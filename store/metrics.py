@@ -0,0 +1,324 @@
+"""
+Lightweight Prometheus-compatible metrics.
+
+Every process keeps its own samples in memory and periodically writes them to
+``METRICS_DIR/metrics-<pid>.json``. All samples are additive (counters and
+histogram buckets/sums/counts), so the ``/metrics`` view aggregates across
+gunicorn workers by summing the files. When a worker exits, gunicorn's
+``child_exit`` hook folds its file into ``metrics-dead.json`` so recycled
+workers don't lose their totals or leave files behind.
+
+The endpoint only answers staff users, scrapers sending
+``Authorization: Bearer <METRICS_TOKEN>``, and addresses in
+METRICS_ALLOWED_IPS.
+"""
+
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+DEAD_FILENAME = 'metrics-dead.json'
+
+_lock = threading.Lock()
+_samples = {}
+_families = {}
+_dirty = False
+_last_flush = 0.0
+_local = threading.local()
+
+
+def _reset_after_fork():
+    global _samples, _dirty, _last_flush, _lock
+    _lock = threading.Lock()
+    _samples = {}
+    _dirty = False
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_metrics_dir():
+    return str(getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, 'metrics')))
+
+
+def _inc(name, labels, amount=1.0):
+    global _dirty
+    key = (name, labels)
+    with _lock:
+        _samples[key] = _samples.get(key, 0.0) + amount
+        _dirty = True
+
+
+def _label_key(labelnames, labels):
+    return tuple((name, str(labels.get(name, ''))) for name in labelnames)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.labelnames = tuple(labelnames)
+        _families[name] = ('counter', documentation)
+
+    def inc(self, amount=1, **labels):
+        _inc(self.name, _label_key(self.labelnames, labels), amount)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        _families[name] = ('histogram', documentation)
+
+    def observe(self, value, **labels):
+        global _dirty
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            # Buckets are stored cumulatively, as Prometheus expects
+            for bound in self.buckets:
+                bucket = (self.name + '_bucket', key + (('le', _format_value(bound)),))
+                _samples[bucket] = _samples.get(bucket, 0.0) + (1 if value <= bound else 0)
+            inf = (self.name + '_bucket', key + (('le', '+Inf'),))
+            _samples[inf] = _samples.get(inf, 0.0) + 1
+            _samples[(self.name + '_sum', key)] = _samples.get((self.name + '_sum', key), 0.0) + value
+            _samples[(self.name + '_count', key)] = _samples.get((self.name + '_count', key), 0.0) + 1
+            _dirty = True
+
+
+# Request metrics
+
+REQUEST_LATENCY = Histogram(
+    'latagan_http_request_duration_seconds', 'Request latency by URL name',
+    ('view', 'method', 'status'),
+)
+RESPONSE_SIZE = Histogram(
+    'latagan_http_response_size_bytes', 'Response body size by URL name',
+    ('view',), buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'latagan_db_queries_per_request', 'Number of SQL queries per request',
+    ('view',), buckets=COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'latagan_db_query_duration_seconds', 'Total SQL time per request',
+    ('view',),
+)
+TEMPLATE_RENDER = Histogram(
+    'latagan_template_render_duration_seconds', 'Template render time per request',
+    ('view',),
+)
+CACHE_REQUESTS = Counter(
+    'latagan_cache_requests_total', 'Cache lookups by cache and result (hit/miss)',
+    ('cache', 'result'),
+)
+REQUESTS_REJECTED = Counter(
+    'latagan_requests_rejected_total', 'Requests refused by rate limiting or load shedding',
+    ('view', 'reason'),
+)
+
+# Business throughput
+
+LISTINGS_CREATED = Counter('latagan_listings_created_total', 'Items listed through sell_item')
+ORDERS_CREATED = Counter('latagan_orders_created_total', 'Orders created', ('source',))
+MESSAGES_SENT = Counter('latagan_messages_sent_total', 'Chat messages sent through item_chat')
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+# Per-request accumulators (filled by the query wrapper and template backend)
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - start
+
+
+@contextmanager
+def track_request():
+    stats = RequestStats()
+    previous = getattr(_local, 'stats', None)
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+def current_request_stats():
+    return getattr(_local, 'stats', None)
+
+
+# Storage
+
+def _process_path(directory, pid=None):
+    return os.path.join(directory, f'metrics-{pid or os.getpid()}.json')
+
+
+def _read_samples(path):
+    try:
+        with open(path) as f:
+            rows = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in rows}
+
+
+def _write_samples(path, samples):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump([[name, labels, value] for (name, labels), value in samples.items()], f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _dir_lock(directory):
+    with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _merge_into(target, samples):
+    for key, value in samples.items():
+        target[key] = target.get(key, 0.0) + value
+
+
+def flush(force=False):
+    """Write this process's samples to its file (at most once per interval)"""
+    global _dirty, _last_flush
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+    now = time.monotonic()
+    if not _dirty or (not force and now - _last_flush < interval):
+        return
+    with _lock:
+        snapshot = dict(_samples)
+        _dirty = False
+        _last_flush = now
+    directory = get_metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    _write_samples(_process_path(directory), snapshot)
+
+
+def mark_process_dead(pid):
+    """Fold an exited worker's samples into the shared dead-process file"""
+    directory = get_metrics_dir()
+    path = _process_path(directory, pid)
+    if not os.path.exists(path):
+        return
+    with _dir_lock(directory):
+        dead_path = os.path.join(directory, DEAD_FILENAME)
+        dead = _read_samples(dead_path)
+        _merge_into(dead, _read_samples(path))
+        _write_samples(dead_path, dead)
+        os.remove(path)
+
+
+def reset_storage():
+    """Remove samples left over from a previous server run"""
+    directory = get_metrics_dir()
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.startswith('metrics-') and filename.endswith('.json'):
+            os.remove(os.path.join(directory, filename))
+
+
+def collect():
+    """Samples summed across every process file"""
+    flush(force=True)
+    directory = get_metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    totals = {}
+    # mark_process_dead moves a worker's samples between files under this lock
+    with _dir_lock(directory):
+        for filename in os.listdir(directory):
+            if filename.startswith('metrics-') and filename.endswith('.json'):
+                _merge_into(totals, _read_samples(os.path.join(directory, filename)))
+    return totals
+
+
+# Access
+
+def can_scrape(request):
+    """Whether `request` may read /metrics: staff, the bearer token, or an allowlisted address"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].strip(), token):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+
+# Exposition
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _family_of(sample_name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if sample_name.endswith(suffix) and sample_name[:-len(suffix)] in _families:
+            return sample_name[:-len(suffix)]
+    return sample_name
+
+
+def _sort_key(item):
+    (name, labels), _value = item
+    le = dict(labels).get('le')
+    bound = float('inf') if le == '+Inf' else float(le) if le is not None else 0.0
+    other = tuple(pair for pair in labels if pair[0] != 'le')
+    return (_family_of(name), other, name, bound)
+
+
+def render_text():
+    """Render all metrics in the Prometheus text exposition format (0.0.4)"""
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(collect().items(), key=_sort_key):
+        family = _family_of(name)
+        if family not in seen:
+            seen.add(family)
+            kind, documentation = _families.get(family, ('untyped', ''))
+            lines.append(f'# HELP {family} {documentation}')
+            lines.append(f'# TYPE {family} {kind}')
+        label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+        lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text
+                     else f'{name} {_format_value(value)}')
+    # Declared families with no samples yet still get HELP/TYPE lines
+    for family, (kind, documentation) in sorted(_families.items()):
+        if family not in seen:
+            lines.append(f'# HELP {family} {documentation}')
+            lines.append(f'# TYPE {family} {kind}')
+    return '\n'.join(lines) + '\n'
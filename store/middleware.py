@@ -0,0 +1,180 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import engagement, metrics, page_cache, throttle
+from .profiling import RequestProfile
+
+
+class MetricsMiddleware:
+    """
+    Record latency, response size, SQL and template time per URL name.
+    Place near the top of MIDDLEWARE so the timing covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with metrics.track_request() as stats, connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name if match else None) or 'unmatched'
+        metrics.REQUEST_LATENCY.observe(
+            duration, view=view, method=request.method, status=response.status_code,
+        )
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=view)
+        metrics.DB_QUERIES.observe(stats.queries, view=view)
+        metrics.DB_DURATION.observe(stats.query_time, view=view)
+        if stats.template_time:
+            metrics.TEMPLATE_RENDER.observe(stats.template_time, view=view)
+        metrics.flush()
+        return response
+
+
+class PageCacheMiddleware:
+    """
+    Serve and store full pages for anonymous visitors (see store/page_cache.py).
+    Place after MetricsMiddleware and before SessionMiddleware, so a hit skips
+    the session, CSRF and auth layers entirely.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PAGE_CACHE_ENABLED', True)
+
+    def __call__(self, request):
+        match = page_cache.cacheable_match(request) if self.enabled else None
+        if match is None:
+            return self.get_response(request)
+        # A hit returns before Django resolves the URL; MetricsMiddleware labels requests by it
+        request.resolver_match = match
+
+        cache = page_cache.get_cache()
+        key = page_cache.page_key(request)
+        lock_key = page_cache.LOCK_PREFIX + key
+        entry = cache.get(key)
+        if entry is not None:
+            if time.time() < entry['fresh_until'] and page_cache.is_current(cache, entry):
+                metrics.record_cache('page', True)
+                self.count_hit(match)
+                return page_cache.replay(entry, 'hit')
+            # Stale: one request re-renders it, the rest get the old copy meanwhile
+            if not cache.add(lock_key, 1, timeout=page_cache.LOCK_SECONDS):
+                metrics.record_cache('page', True)
+                self.count_hit(match)
+                return page_cache.replay(entry, 'stale')
+
+        metrics.record_cache('page', False)
+        started_ns = time.time_ns()
+        try:
+            response = self.get_response(request)
+            if page_cache.storable(request, response) and page_cache.store(
+                cache, key, request, response, started_ns,
+            ):
+                response['X-Page-Cache'] = 'miss'
+        finally:
+            if entry is not None:
+                cache.delete(lock_key)
+        return response
+
+    def count_hit(self, match):
+        """Record what the view would have recorded for a page served from the cache"""
+        # item_detail counts anonymous views
+        if match.url_name == 'item_detail':
+            engagement.record(match.kwargs['item_id'], 'views')
+
+
+class LoadSheddingMiddleware:
+    """
+    Refuse all but THROTTLE_CRITICAL_ROUTES with a fast 503 while the host is
+    overloaded, and count in-flight requests (see store/throttle.py). Place
+    right after PageCacheMiddleware: cached pages are still served, and a
+    refused request never reaches the session or the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'THROTTLE_ENABLED', True)
+        self.critical = set(getattr(settings, 'THROTTLE_CRITICAL_ROUTES', ()))
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        reason = throttle.overload(request)
+        if reason is not None:
+            view = throttle.url_name(request)
+            if view not in self.critical:
+                metrics.REQUESTS_REJECTED.inc(view=view or 'unmatched', reason=reason)
+                return throttle.refused(
+                    503, throttle.shed_retry_after(), 'The site is busy right now. Please try again shortly.',
+                )
+        with throttle.in_flight():
+            return self.get_response(request)
+
+
+class ThrottleMiddleware:
+    """
+    Per-user or per-IP token-bucket limits for the routes in THROTTLE_RATES
+    (see store/throttle.py). Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'THROTTLE_ENABLED', True)
+        self.rates = getattr(settings, 'THROTTLE_RATES', {})
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled:
+            return None
+        name = throttle.route(request, request.resolver_match.url_name)
+        if name not in self.rates:
+            return None
+        per_minute, burst = self.rates[name]
+        wait = throttle.get_buckets().take(
+            f'{name}:{throttle.client(request)}', per_minute, burst, cost=2 if throttle.busy() else 1,
+        )
+        if not wait:
+            return None
+        metrics.REQUESTS_REJECTED.inc(view=request.resolver_match.url_name, reason='rate_limit')
+        return throttle.refused(429, wait, 'Too many requests. Please slow down and try again.')
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when a staff user asks for it (``?_profile=1`` or an
+    ``X-Profile: 1`` header) or when it falls in the PROFILING_SAMPLE_RATE
+    sample. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.query_param = getattr(settings, 'PROFILING_QUERY_PARAM', '_profile')
+        self.header = getattr(settings, 'PROFILING_HEADER', 'HTTP_X_PROFILE')
+
+    def __call__(self, request):
+        if not self.enabled or not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = RequestProfile(request)
+        response = profile.run(self.get_response)
+        response['X-Profile-Id'] = profile.save(response)
+        return response
+
+    def should_profile(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            if request.GET.get(self.query_param) or request.META.get(self.header):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:39
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    UserProfile = apps.get_model('store', 'UserProfile')
+    Item = apps.get_model('store', 'Item')
+    ArchivedItem = apps.get_model('store', 'ArchivedItem')
+    Order = apps.get_model('store', 'Order')
+    Review = apps.get_model('store', 'Review')
+    ArchivedReview = apps.get_model('store', 'ArchivedReview')
+
+    sources = [
+        (Item.objects.filter(deleted_at__isnull=True, status__in=['available', 'reserved']),
+         'seller_id', 'active_listings', Count('id')),
+        (Item.objects.filter(deleted_at__isnull=True, status='sold'), 'seller_id', 'items_sold', Count('id')),
+        (ArchivedItem.objects.all(), 'seller_id', 'items_sold', Count('id')),
+        (Order.objects.all(), 'buyer_id', 'purchases', Count('id')),
+        (Review.objects.all(), 'author_id', 'reviews_written', Count('id')),
+        (ArchivedReview.objects.all(), 'author_id', 'reviews_written', Count('id')),
+        (Review.objects.all(), 'author_id', 'review_rating_total', Sum('rating')),
+        (ArchivedReview.objects.all(), 'author_id', 'review_rating_total', Sum('rating')),
+    ]
+    for queryset, group_field, target, aggregate in sources:
+        for row in queryset.order_by().values(group_field).annotate(n=aggregate):
+            UserProfile.objects.filter(user_id=row[group_field]).update(**{target: F(target) + (row['n'] or 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='active_listings',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='items_sold',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='purchases',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='review_rating_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='reviews_written',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('store', '0012_swipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAffinity',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='affinity', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('category_weights', models.JSONField(default=dict)),
+                ('price_band_weights', models.JSONField(default=list)),
+                ('candidate_ids', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
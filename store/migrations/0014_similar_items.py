@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_user_affinity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='store.item')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='store.item')),
+            ],
+            options={
+                'ordering': ['item', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similaritem',
+            constraint=models.UniqueConstraint(fields=('item', 'rank'), name='unique_similar_item_rank'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinValueValidator
+from django.urls import reverse
+from django.utils.http import urlencode
 
 # Create your models here.
 
@@ -18,6 +22,22 @@ class Category(models.Model):
         return self.name
 
 
+class ItemQuerySet(models.QuerySet):
+    def available(self, user=None):
+        """Items that can be bought: available, or held by `user`, or whose hold has lapsed"""
+        purchasable = Q(status='available') | Q(status='reserved', reserved_until__lt=timezone.now())
+        if user is not None and user.is_authenticated:
+            purchasable |= Q(status='reserved', reserved_by=user)
+        return self.filter(purchasable)
+
+
+class ItemManager(models.Manager.from_queryset(ItemQuerySet)):
+    """Default Item manager: hides listings that are waiting to be purged"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Item(models.Model):
     """Thrift item listing model"""
     STATUS_CHOICES = (
@@ -25,6 +45,13 @@ class Item(models.Model):
         ('sold', 'Sold'),
         ('reserved', 'Reserved'),
     )
+    CONDITION_CHOICES = (
+        ('new', 'New'),
+        ('like_new', 'Like New'),
+        ('good', 'Good'),
+        ('fair', 'Fair'),
+        ('poor', 'Poor'),
+    )
 
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='items_for_sale')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
@@ -32,27 +59,42 @@ class Item(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2, validators=[MinValueValidator(0.01)])
     image = models.ImageField(upload_to='items/')
-    condition = models.CharField(
-        max_length=20,
-        choices=[
-            ('new', 'New'),
-            ('like_new', 'Like New'),
-            ('good', 'Good'),
-            ('fair', 'Fair'),
-            ('poor', 'Poor'),
-        ],
-        default='good'
-    )
+    condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='good')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    reserved_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations'
+    )
+    reserved_until = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ItemManager()
+    all_objects = models.Manager()
+
+    is_archived = False
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+            models.Index(fields=['status', 'reserved_until']),
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def is_available_to(self, user):
+        """Whether `user` may buy this item right now (no hold by someone else)"""
+        if self.status == 'available':
+            return True
+        if self.status != 'reserved':
+            return False
+        if user.is_authenticated and self.reserved_by_id == user.id:
+            return True
+        return self.reserved_until is not None and self.reserved_until < timezone.now()
+
 
 class UserProfile(models.Model):
     """Extended user profile for sellers"""
@@ -72,9 +114,24 @@ class UserProfile(models.Model):
     credits = models.PositiveIntegerField(default=20)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Counter caches, kept in step by store.profile_counters at each write
+    # site; `python manage.py repair_profile_counters` recomputes them.
+    active_listings = models.IntegerField(default=0)
+    items_sold = models.IntegerField(default=0)
+    purchases = models.IntegerField(default=0)
+    reviews_written = models.IntegerField(default=0)
+    review_rating_total = models.IntegerField(default=0)
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    @property
+    def average_review_rating(self):
+        """Average rating of the reviews this user has written"""
+        if not self.reviews_written:
+            return None
+        return self.review_rating_total / self.reviews_written
+
 
 class Order(models.Model):
     """Purchase order model"""
@@ -86,7 +143,10 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     )
 
-    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, null=True, blank=True)
+    archived_item = models.ForeignKey(
+        'ArchivedItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders'
+    )
     buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='purchases')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_price = models.DecimalField(max_digits=8, decimal_places=2)
@@ -95,9 +155,17 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
-        return f"Order #{self.id} - {self.item.title}"
+        return f"Order #{self.id} - {self.listing.title}"
+
+    @property
+    def listing(self):
+        """The ordered item, whether it is still live or has been archived"""
+        return self.item or self.archived_item
 
 
 class Review(models.Model):
@@ -153,7 +221,10 @@ class CartItem(models.Model):
 
 class Message(models.Model):
     """Messages between users about items"""
-    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='messages')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
+    archived_item = models.ForeignKey(
+        'ArchivedItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='messages'
+    )
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     content = models.TextField()
@@ -164,4 +235,321 @@ class Message(models.Model):
         ordering = ['created_at']
 
     def __str__(self):
-        return f"Message from {self.sender.username} to {self.recipient.username} about {self.item.title}"
+        return f"Message from {self.sender.username} to {self.recipient.username} about {self.listing.title}"
+
+    @property
+    def listing(self):
+        """The item discussed, whether it is still live or has been archived"""
+        return self.item or self.archived_item
+
+
+class ArchivedItem(models.Model):
+    """Sold listing moved out of the live Item table (keeps its original id)"""
+    id = models.BigIntegerField(primary_key=True)
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_items')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    image = models.ImageField(upload_to='items/')
+    condition = models.CharField(max_length=20, choices=Item.CONDITION_CHOICES)
+    status = models.CharField(max_length=20, choices=Item.STATUS_CHOICES, default='sold')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    is_archived = True
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.title} (archived)"
+
+
+class ArchivedReview(models.Model):
+    """Review of an archived listing (keeps its original id)"""
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(ArchivedItem, on_delete=models.CASCADE, related_name='reviews')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_reviews')
+    rating = models.IntegerField(choices=[(1, '1'), (2, '2'), (3, '3'), (4, '4'), (5, '5')])
+    comment = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Review by {self.author.username} - {self.item.title} (archived)"
+
+
+class PurgeTask(models.Model):
+    """Deferred hard-delete of a soft-deleted listing or account"""
+    KIND_CHOICES = (
+        ('item', 'Item'),
+        ('user', 'User'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    rows_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Purge {self.kind} #{self.object_id} ({self.status})"
+
+
+class SellerDailyRollup(models.Model):
+    """Per-seller, per-category daily sales aggregates (filled by rollup_sales)"""
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    listings_created = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    days_to_sell_total = models.FloatField(default=0)
+    median_days_to_sell = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['seller', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.seller.username} {self.day} ({self.category_id})"
+
+
+class CategoryDailyRollup(models.Model):
+    """Site-wide per-category daily sales aggregates (filled by rollup_sales)"""
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    day = models.DateField(db_index=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    listings_created = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    days_to_sell_total = models.FloatField(default=0)
+    median_days_to_sell = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.category_id} {self.day}"
+
+
+class RollupWatermark(models.Model):
+    """Highest source ids a batch job (sales rollups, saved-search matching) has processed"""
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.BigIntegerField(default=0)
+    last_item_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: order {self.last_order_id}, item {self.last_item_id}"
+
+
+class SavedSearch(models.Model):
+    """A browse filter a buyer wants to be alerted about (matched by match_saved_searches)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches')
+    query = models.CharField(max_length=200, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    min_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    condition = models.CharField(max_length=20, choices=Item.CONDITION_CHOICES, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user.username}: {self.describe()}"
+
+    def describe(self):
+        parts = []
+        if self.query:
+            parts.append(f'"{self.query}"')
+        if self.category_id:
+            parts.append(self.category.name)
+        if self.condition:
+            parts.append(self.get_condition_display())
+        if self.min_price is not None and self.max_price is not None:
+            parts.append(f'${self.min_price}–${self.max_price}')
+        elif self.min_price is not None:
+            parts.append(f'from ${self.min_price}')
+        elif self.max_price is not None:
+            parts.append(f'up to ${self.max_price}')
+        return ', '.join(parts) or 'All items'
+
+    def get_absolute_url(self):
+        params = {
+            'q': self.query,
+            'category': self.category_id or '',
+            'condition': self.condition,
+            'min_price': self.min_price if self.min_price is not None else '',
+            'max_price': self.max_price if self.max_price is not None else '',
+        }
+        return reverse('item_list') + '?' + urlencode({key: value for key, value in params.items() if value != ''})
+
+
+class Notification(models.Model):
+    """In-app notification for a user"""
+    KIND_CHOICES = (
+        ('saved_search', 'Saved search match'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='saved_search')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.SET_NULL, null=True, blank=True)
+    text = models.CharField(max_length=255)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.text}"
+
+
+class Swipe(models.Model):
+    """A swipe decision on the home discovery deck"""
+    DIRECTION_CHOICES = (
+        ('like', 'Like'),
+        ('nope', 'Nope'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='swipes')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='swipes')
+    direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'item'], name='unique_swipe_per_item'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.direction} {self.item_id}"
+
+
+class SeenItems(models.Model):
+    """Compressed bitmap of item ids a user has swiped, folded from Swipe rows up to last_swipe_id"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='seen_items')
+    bitmap = models.BinaryField(default=b'')
+    last_swipe_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Seen items for {self.user.username}"
+
+
+class UserAffinity(models.Model):
+    """Per-user category/price-band preference vectors and ranked candidates (filled by compute_affinities)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='affinity')
+    category_weights = models.JSONField(default=dict)
+    price_band_weights = models.JSONField(default=list)
+    candidate_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Affinity for {self.user.username}"
+
+
+class SimilarItem(models.Model):
+    """Precomputed nearest neighbour of a listing (filled by build_similar_items)"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['item', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'rank'], name='unique_similar_item_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} ~ {self.neighbour_id} ({self.score:.2f})"
+
+
+class ItemEngagement(models.Model):
+    """Flushed view, cart-add and chat-start totals of a listing (written in batches by store.engagement)"""
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='engagement')
+    views = models.PositiveIntegerField(default=0)
+    cart_adds = models.PositiveIntegerField(default=0)
+    chat_starts = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Engagement for item {self.item_id}"
+
+
+class ItemTrend(models.Model):
+    """Time-decayed engagement score of a listing, kept up to date by store.trending"""
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # log2 of the score decayed to trending.EPOCH; see store/trending.py
+    log_score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', '-log_score']),
+            models.Index(fields=['-log_score']),
+        ]
+
+    def __str__(self):
+        return f"Trend for item {self.item_id}"
+
+
+class TrendingList(models.Model):
+    """Materialized top trending item ids, overall ('all') or per category key"""
+    key = models.CharField(max_length=20, primary_key=True)
+    item_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trending ({self.key})"
+
+
+class ItemImageHash(models.Model):
+    """64-bit perceptual hash (dHash) of a listing's photo, kept by store.image_hash"""
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='image_hash')
+    # Storage name the hash was computed from, so an unchanged photo isn't hashed again
+    image = models.CharField(max_length=100)
+    # Unsigned 64-bit hash stored as a signed integer
+    hash = models.BigIntegerField()
+    # The hash's four 16-bit bands, indexed for the multi-index Hamming lookup
+    band0 = models.PositiveIntegerField(db_index=True)
+    band1 = models.PositiveIntegerField(db_index=True)
+    band2 = models.PositiveIntegerField(db_index=True)
+    band3 = models.PositiveIntegerField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Image hash for item {self.item_id}"
@@ -0,0 +1,233 @@
+"""
+Full-page cache for anonymous visitors.
+
+Logged-out visitors all get the same HTML for the browse pages, so
+store.middleware.PageCacheMiddleware stores the rendered response of the views listed in
+PAGE_CACHE_VIEWS and replays it without touching the session, the ORM or the
+template engine. The key is the path plus the whitelisted query parameters
+(PAGE_CACHE_QUERY_PARAMS) in a fixed order, so tracking parameters and
+parameter order don't fragment the cache.
+
+Only requests without a session or messages cookie are looked up, and a
+response is only stored if the view tagged it, the visitor is anonymous, and
+nothing per-visitor ended up in it (no cookies set, no CSRF token used).
+
+Invalidation is by dependency tags. A view declares what its page shows with
+tag(request, 'item:42', 'category:3', ...); each tag has a version stamp in
+the cache, and an entry remembers the stamps it was rendered with. purge()
+gives the tags a new stamp after the current transaction commits, which
+makes every page that depends on them stale in O(1) without knowing their
+keys. A tag whose stamp was evicted also counts as changed.
+
+Tags in use:
+    item:<id>           a listing's own page (its fields and reviews)
+    category:<id>       listings in a category
+    seller:<id>         a seller's profile (user, UserProfile and its counters)
+    seller-items:<id>   a seller's listings
+    items               any listing anywhere (home, unfiltered browse)
+    categories          category names and descriptions
+    trending            the materialized trending order
+
+Stale entries (expired or purged) are kept for PAGE_CACHE_STALE_SECONDS more.
+The first request to find one takes a short lock and re-renders the page;
+until it has stored the new version, everyone else is served the stale copy
+instead of all rendering it at once.
+
+Logged-in visitors can't share whole pages, but they can share the parts that
+don't depend on who is looking: get_fragment()/set_fragment() cache such a
+fragment under the same tags. item_detail caches the public rendering of a
+listing this way and leaves the viewer's own state (seller, in cart, bought)
+to the batched store.views.item_state endpoint.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.http import urlencode
+
+from . import metrics
+from .models import Item
+
+KEY_PREFIX = 'page:'
+TAG_PREFIX = 'page-tag:'
+LOCK_PREFIX = 'page-lock:'
+FRAGMENT_PREFIX = 'fragment:'
+LOCK_SECONDS = 30
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def tag(request, *tags):
+    """Declare that the page being rendered depends on `tags`"""
+    if not hasattr(request, '_page_cache_tags'):
+        request._page_cache_tags = set()
+    request._page_cache_tags.update(tags)
+
+
+def purge(*tags):
+    """Make every cached page depending on any of `tags` stale once the transaction commits"""
+    if not tags:
+        return
+    stamp = time.time_ns()
+    keys = {TAG_PREFIX + t: stamp for t in tags}
+    transaction.on_commit(lambda: get_cache().set_many(keys, timeout=None))
+
+
+def item_tags(item_id, seller_id, category_id):
+    tags = [f'item:{item_id}', f'seller-items:{seller_id}', 'items']
+    if category_id is not None:
+        tags.append(f'category:{category_id}')
+    return tags
+
+
+def purge_items(item_ids):
+    """Purge the pages showing any of `item_ids` (a list or an id queryset)"""
+    tags = set()
+    for row in Item.all_objects.filter(id__in=item_ids).values_list('id', 'seller_id', 'category_id'):
+        tags.update(item_tags(*row))
+    purge(*tags)
+
+
+def cacheable_match(request):
+    """The URL match of a request the cache may answer, or None"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or 'messages' in request.COOKIES:
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    return match if match.url_name in getattr(settings, 'PAGE_CACHE_VIEWS', ()) else None
+
+
+def page_key(request):
+    """Cache key for the path and the whitelisted query parameters in a fixed order"""
+    params = [
+        (name, request.GET.get(name, '').strip())
+        for name in getattr(settings, 'PAGE_CACHE_QUERY_PARAMS', ())
+    ]
+    normalized = request.path_info + '?' + urlencode([(name, value) for name, value in params if value])
+    return KEY_PREFIX + hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def is_current(cache, entry):
+    if not entry['tags']:
+        return True
+    stamps = cache.get_many(list(entry['tags']))
+    return all(stamps.get(key) == stamp for key, stamp in entry['tags'].items())
+
+
+def replay(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = state
+    return response
+
+
+def storable(request, response):
+    return (
+        getattr(request, '_page_cache_tags', None)
+        and hasattr(request, 'user') and not request.user.is_authenticated
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+        and 'private' not in response.get('Cache-Control', '')
+        and 'no-store' not in response.get('Cache-Control', '')
+    )
+
+
+def _stamps(cache, tags, started_ns):
+    """{tag key: stamp} for `tags`, or None if one was purged after rendering began at `started_ns`"""
+    tag_keys = [TAG_PREFIX + t for t in sorted(tags)]
+    stamps = cache.get_many(tag_keys)
+    if any(stamp > started_ns for stamp in stamps.values()):
+        return None
+    # Give never-purged tags a stamp so that a later eviction reads as a change
+    missing = {k: time.time_ns() for k in tag_keys if k not in stamps}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        stamps.update(missing)
+    return {k: stamps[k] for k in tag_keys}
+
+
+def store(cache, key, request, response, started_ns):
+    """Cache `response` unless one of its tags was purged after rendering began at `started_ns`"""
+    stamps = _stamps(cache, request._page_cache_tags, started_ns)
+    if stamps is None:
+        return False
+    fresh = getattr(settings, 'PAGE_CACHE_SECONDS', 60)
+    stale = getattr(settings, 'PAGE_CACHE_STALE_SECONDS', 300)
+    cache.set(key, {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': [(h, v) for h, v in response.items() if h.lower() != 'x-page-cache'],
+        'tags': stamps,
+        'fresh_until': time.time() + fresh,
+    }, timeout=fresh + stale)
+    return True
+
+
+# Fragments: viewer-independent parts of a page, shared by every visitor,
+# logged in or not, and invalidated by the same tags as whole pages.
+
+def get_fragment(key):
+    """The value stored under `key` by set_fragment, or None if it is missing or one of its tags was purged"""
+    cache = get_cache()
+    entry = cache.get(FRAGMENT_PREFIX + key)
+    if entry is None or not is_current(cache, entry):
+        metrics.record_cache('fragment', False)
+        return None
+    metrics.record_cache('fragment', True)
+    return entry['value']
+
+
+def set_fragment(key, value, tags, started_ns, timeout):
+    """Store `value` for `timeout` seconds, depending on `tags`; skipped if one was purged since `started_ns`"""
+    cache = get_cache()
+    stamps = _stamps(cache, tags, started_ns)
+    if stamps is None or timeout <= 0:
+        return False
+    cache.set(FRAGMENT_PREFIX + key, {'value': value, 'tags': stamps}, timeout=timeout)
+    return True
+
+
+# Signal receivers (connected in StoreConfig.ready)
+
+def item_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Purge the category a listing is being moved out of"""
+    if instance.pk is not None and (update_fields is None or 'category' in update_fields):
+        old_category = Item.all_objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        if old_category is not None and old_category != instance.category_id:
+            purge(f'category:{old_category}')
+
+
+def item_changed(sender, instance, **kwargs):
+    purge(*item_tags(instance.pk, instance.seller_id, instance.category_id))
+
+
+def category_changed(sender, instance, **kwargs):
+    purge('categories', f'category:{instance.pk}')
+
+
+def review_changed(sender, instance, **kwargs):
+    purge_items([instance.item_id])
+
+
+def profile_changed(sender, instance, **kwargs):
+    purge(f'seller:{instance.user_id}')
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no page shows
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        purge(f'seller:{instance.pk}')
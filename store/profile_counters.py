@@ -0,0 +1,78 @@
+"""
+Counter caches on UserProfile.
+
+Write sites call adjust() inside the same transaction as the change they
+count, so the profile pages can read every number from the profile row.
+compute() recomputes the true values in a handful of grouped queries for the
+repair command.
+
+Soft-deleted listings don't count: soft-deleting one takes it out of its
+seller's active_listings or items_sold straight away. Orders and reviews
+count until they are purged; the purge calls uncount() for the rows it is
+about to delete.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum
+
+from . import page_cache
+from .models import ArchivedItem, ArchivedReview, Item, Order, Review, UserProfile
+
+COUNTER_FIELDS = ('active_listings', 'items_sold', 'purchases', 'reviews_written', 'review_rating_total')
+ACTIVE_STATUSES = ('available', 'reserved')
+
+
+def adjust(user_id, **deltas):
+    """Atomically add `deltas` (field=amount) to a user's counters"""
+    deltas = {field: amount for field, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    UserProfile.objects.filter(user_id=user_id).update(
+        **{field: F(field) + amount for field, amount in deltas.items()}
+    )
+    page_cache.purge(f'seller:{user_id}')
+
+
+def _sources():
+    """(queryset, owner field, counter, aggregate) for every kind of row the counters count"""
+    return (
+        # Item.objects leaves out soft-deleted listings: deleting one takes it out of the counts
+        (Item.objects.filter(status__in=ACTIVE_STATUSES), 'seller_id', 'active_listings', Count('id')),
+        (Item.objects.filter(status='sold'), 'seller_id', 'items_sold', Count('id')),
+        (ArchivedItem.objects.all(), 'seller_id', 'items_sold', Count('id')),
+        (Order.objects.all(), 'buyer_id', 'purchases', Count('id')),
+        (Review.objects.all(), 'author_id', 'reviews_written', Count('id')),
+        (ArchivedReview.objects.all(), 'author_id', 'reviews_written', Count('id')),
+        (Review.objects.all(), 'author_id', 'review_rating_total', Sum('rating')),
+        (ArchivedReview.objects.all(), 'author_id', 'review_rating_total', Sum('rating')),
+    )
+
+
+def _count(sources):
+    values = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for queryset, owner, target, aggregate in sources:
+        for row in queryset.order_by().values(owner).annotate(n=aggregate):
+            values[row[owner]][target] += row['n'] or 0
+    return values
+
+
+def compute(user_ids=None):
+    """True counter values as {user_id: {field: value}}"""
+    sources = _sources()
+    if user_ids is not None:
+        sources = [
+            (queryset.filter(**{f'{owner}__in': user_ids}), owner, target, aggregate)
+            for queryset, owner, target, aggregate in sources
+        ]
+    return _count(sources)
+
+
+def uncount(model, pks):
+    """Take rows of `model` that are about to be hard-deleted out of their owners' counters"""
+    counted = _count([
+        (queryset.filter(pk__in=pks), owner, target, aggregate)
+        for queryset, owner, target, aggregate in _sources() if queryset.model is model
+    ])
+    for user_id, values in counted.items():
+        adjust(user_id, **{field: -amount for field, amount in values.items()})
@@ -0,0 +1,204 @@
+"""
+On-demand request profiling.
+
+A captured request produces three files in ``settings.PROFILING_DIR`` sharing
+one basename:
+
+- ``<name>.pstats``  cProfile data, open with ``pstats`` or snakeviz
+- ``<name>.folded``  collapsed stacks from a wall-clock sampler, feed to
+  flamegraph.pl / speedscope
+- ``<name>.json``    summary (view, total, SQL, template and Python time)
+
+Only the newest ``PROFILING_MAX_PROFILES`` profiles are kept; saving a new one
+deletes the oldest, so sampling in production can't fill the disk.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Template
+
+
+PROFILE_SUFFIXES = ('.pstats', '.folded', '.json')
+
+
+def get_profiling_dir():
+    return str(getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval into collapsed stacks"""
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+class QueryTimer:
+    """execute_wrapper that splits SQL time into in-template and outside-template"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.in_template = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.total += elapsed
+            if self._inside_template():
+                self.in_template += elapsed
+
+    @staticmethod
+    def _inside_template():
+        frame = sys._getframe(2)
+        render_code = Template.render.__code__
+        while frame is not None:
+            if frame.f_code is render_code:
+                return True
+            frame = frame.f_back
+        return False
+
+
+class RequestProfile:
+    """Profiles one request: cProfile + stack sampler + SQL timing"""
+
+    def __init__(self, request):
+        self.request = request
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.queries = QueryTimer()
+        self.started = None
+        self.duration = None
+
+    def run(self, get_response):
+        self.started = time.time()
+        self.sampler.start()
+        start = time.perf_counter()
+        with connection.execute_wrapper(self.queries):
+            self.profiler.enable()
+            try:
+                response = get_response(self.request)
+            finally:
+                self.profiler.disable()
+                self.duration = time.perf_counter() - start
+                self.sampler.stop()
+        return response
+
+    def template_time(self):
+        """Cumulative time spent in Template.render, excluding SQL it triggered"""
+        self.profiler.create_stats()
+        render_code = Template.render.__code__
+        key = (render_code.co_filename, render_code.co_firstlineno, render_code.co_name)
+        stats = self.profiler.stats.get(key)
+        cumulative = stats[3] if stats else 0.0
+        return max(0.0, cumulative - self.queries.in_template)
+
+    def save(self, response):
+        """Write .pstats, .folded and .json files; returns the basename"""
+        directory = get_profiling_dir()
+        os.makedirs(directory, exist_ok=True)
+
+        match = getattr(self.request, 'resolver_match', None)
+        view_name = (match.url_name if match else None) or 'unknown'
+        total_ms = self.duration * 1000
+        basename = f'{time.strftime("%Y%m%d-%H%M%S", time.gmtime(self.started))}-{view_name}-{int(total_ms)}ms-{os.getpid()}'
+        path = os.path.join(directory, basename)
+
+        template_ms = self.template_time() * 1000
+        sql_ms = self.queries.total * 1000
+        self.profiler.dump_stats(path + '.pstats')
+        with open(path + '.folded', 'w') as f:
+            f.write(self.sampler.folded())
+
+        summary = {
+            'view': view_name,
+            'path': self.request.get_full_path(),
+            'method': self.request.method,
+            'status': response.status_code,
+            'user': self.request.user.username if self.request.user.is_authenticated else None,
+            'started': self.started,
+            'total_ms': round(total_ms, 2),
+            'sql_ms': round(sql_ms, 2),
+            'sql_queries': self.queries.count,
+            'template_ms': round(template_ms, 2),
+            'python_ms': round(max(0.0, total_ms - sql_ms - template_ms), 2),
+        }
+        with open(path + '.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+        prune(directory, getattr(settings, 'PROFILING_MAX_PROFILES', 200))
+        return basename
+
+
+def prune(directory, keep):
+    """Delete all but the `keep` newest profiles (all three files of each); returns how many went"""
+    profiles = defaultdict(list)
+    for filename in os.listdir(directory):
+        basename, suffix = os.path.splitext(filename)
+        if suffix in PROFILE_SUFFIXES:
+            profiles[basename].append(os.path.join(directory, filename))
+    if len(profiles) <= keep:
+        return 0
+    # Basenames start with the UTC capture time, so they sort oldest first
+    expired = sorted(profiles)[:len(profiles) - keep]
+    for basename in expired:
+        for path in profiles[basename]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker pruned it first
+                pass
+    return len(expired)
+
+
+def load_summaries(directory=None):
+    """All saved profile summaries, slowest first"""
+    directory = directory or get_profiling_dir()
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            try:
+                summary = json.load(f)
+            except ValueError:
+                continue
+        summary['name'] = filename[:-len('.json')]
+        summaries.append(summary)
+    summaries.sort(key=lambda s: s.get('total_ms', 0), reverse=True)
+    return summaries
@@ -0,0 +1,142 @@
+"""
+Soft delete now, hard delete later.
+
+Deleting a listing or an account only flags it (Item.deleted_at /
+User.is_active) and queues a PurgeTask. The `purge_deleted` command then
+removes the rows and everything that depends on them in small batches of raw
+``DELETE ... WHERE id IN (...)`` statements, each in its own short
+transaction, so a popular item with a long chat history never holds the
+SQLite write lock for long. Each batch also takes the rows it deletes out
+of the UserProfile counter caches (see store/profile_counters.py).
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from . import autocomplete, page_cache, profile_counters
+from .models import CartItem, Item, PurgeTask
+from .profile_counters import ACTIVE_STATUSES
+
+
+def hide_items(queryset, seller_id):
+    """Flag the live listings in `queryset` deleted and take them out of the seller's counters"""
+    now = timezone.now()
+    active = queryset.filter(status__in=ACTIVE_STATUSES).update(deleted_at=now)
+    sold = queryset.filter(status='sold').update(deleted_at=now)
+    profile_counters.adjust(seller_id, active_listings=-active, items_sold=-sold)
+    return active + sold
+
+
+def soft_delete_item(item):
+    """Hide a listing immediately and queue its hard delete"""
+    with transaction.atomic():
+        hide_items(Item.objects.filter(id=item.id), item.seller_id)
+        # Nobody should be able to check out a deleted listing
+        CartItem.objects.filter(item_id=item.id).delete()
+        PurgeTask.objects.create(kind='item', object_id=item.id)
+        page_cache.purge_items([item.id])
+        autocomplete.items_changed([item.id])
+
+
+def soft_delete_user(user):
+    """Deactivate an account, hide its listings and queue its hard delete"""
+    with transaction.atomic():
+        User.objects.filter(id=user.id).update(is_active=False)
+        item_ids = Item.objects.filter(seller_id=user.id).values_list('id', flat=True)
+        CartItem.objects.filter(item_id__in=item_ids).delete()
+        page_cache.purge_items(item_ids)
+        autocomplete.items_changed(item_ids)
+        hide_items(Item.objects.filter(seller_id=user.id), user.id)
+        PurgeTask.objects.create(kind='user', object_id=user.id)
+
+
+class Purger:
+    """Deletes rows and their dependents bottom-up in bounded batches"""
+
+    def __init__(self, task, batch_size=500, sleep=0.0, stdout=None):
+        self.task = task
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.stdout = stdout
+
+    def run(self):
+        model = User if self.task.kind == 'user' else Item
+        self.purge(model, [self.task.object_id])
+
+    def purge(self, model, pks):
+        """Delete `pks` of `model` after everything that cascades from them"""
+        for relation in self._reverse_relations(model):
+            field = relation.field
+            related_model = relation.related_model
+            on_delete = field.remote_field.on_delete
+            lookup = {f'{field.name}__in': pks}
+
+            if on_delete is models.CASCADE:
+                queryset = related_model._base_manager.filter(**lookup).order_by()
+                while True:
+                    child_pks = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+                    if not child_pks:
+                        break
+                    self.purge(related_model, child_pks)
+            elif on_delete is models.SET_NULL:
+                queryset = related_model._base_manager.filter(**lookup).order_by()
+                while True:
+                    child_pks = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+                    if not child_pks:
+                        break
+                    related_model._base_manager.filter(pk__in=child_pks).update(**{field.name: None})
+                    self._throttle()
+            elif on_delete is models.PROTECT:
+                if related_model._base_manager.filter(**lookup).exists():
+                    raise RuntimeError(f'{related_model.__name__} rows protect {model.__name__} {pks[:5]}')
+
+        self._raw_delete(model, pks)
+
+    @staticmethod
+    def _reverse_relations(model):
+        # include_hidden picks up auto-created M2M through tables (user groups etc.)
+        return [
+            field for field in model._meta.get_fields(include_hidden=True)
+            if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+        ]
+
+    def _raw_delete(self, model, pks):
+        meta = model._meta
+        quote = connection.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(pks))
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Orders and reviews count towards their owners' profiles until now
+            profile_counters.uncount(model, pks)
+            cursor.execute(
+                f'DELETE FROM {quote(meta.db_table)} WHERE {quote(meta.pk.column)} IN ({placeholders})',
+                pks,
+            )
+            deleted = cursor.rowcount
+        PurgeTask.objects.filter(id=self.task.id).update(
+            rows_deleted=models.F('rows_deleted') + deleted, updated_at=timezone.now(),
+        )
+        if self.stdout and deleted:
+            self.stdout.write(f'  {meta.label}: deleted {deleted}')
+        self._throttle()
+
+    def _throttle(self):
+        if self.sleep:
+            time.sleep(self.sleep)
+
+
+def run_task(task, **options):
+    """Run one purge task, recording its outcome"""
+    PurgeTask.objects.filter(id=task.id).update(status='running', updated_at=timezone.now())
+    try:
+        Purger(task, **options).run()
+    except Exception as exc:
+        PurgeTask.objects.filter(id=task.id).update(
+            status='failed', error=str(exc), updated_at=timezone.now(),
+        )
+        raise
+    PurgeTask.objects.filter(id=task.id).update(
+        status='done', finished_at=timezone.now(), updated_at=timezone.now(),
+    )
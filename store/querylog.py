@@ -0,0 +1,140 @@
+"""
+Slow-query log.
+
+An execute_wrapper is attached to every database connection as it is created
+(see StoreConfig.ready). It times each query and, when one runs longer than
+SLOW_QUERY_THRESHOLD_MS, appends a JSON line to SLOW_QUERY_LOG with the
+normalized SQL fingerprint, the duration and the project frames (views,
+template nodes) that issued it.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.template.base import Node
+
+_write_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_VALUES_RE = re.compile(r'\bVALUES\s*(?:\([^)]*\)\s*,?\s*)+', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Reduce SQL to a shape that is the same for every set of parameters"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _VALUES_RE.sub('VALUES (...) ', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()[:12]
+
+
+def get_log_path():
+    default = os.path.join(settings.BASE_DIR, 'logs', 'slow_queries.jsonl')
+    return str(getattr(settings, 'SLOW_QUERY_LOG', default))
+
+
+def _project_root():
+    return str(settings.BASE_DIR) + os.sep
+
+
+def caller_stack(limit=8):
+    """Project frames and template nodes on the current stack, innermost first"""
+    root = _project_root()
+    render_code = Node.render_annotated.__code__
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        filename = code.co_filename
+        if code is render_code:
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                frames.append(
+                    f'{origin.template_name}:{token.lineno} {{% {token.contents[:60]} %}}'
+                )
+        elif filename.startswith(root) and 'site-packages' not in filename and filename != __file__:
+            frames.append(f'{os.path.relpath(filename, root)}:{frame.f_lineno} {code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+class SlowQueryLogger:
+    """execute_wrapper that logs queries above the configured threshold"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100) / 1000
+        self.stack_sample_rate = getattr(settings, 'SLOW_QUERY_STACK_SAMPLE_RATE', 1.0)
+        self.path = get_log_path()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.log(sql, duration, many)
+
+    def log(self, sql, duration, many):
+        normalized = normalize_sql(sql)
+        entry = {
+            'ts': time.time(),
+            'db': self.alias,
+            'fingerprint': fingerprint(normalized),
+            'duration_ms': round(duration * 1000, 3),
+            'many': many,
+            'sql': normalized[:2000],
+        }
+        if self.stack_sample_rate >= 1 or random.random() < self.stack_sample_rate:
+            entry['stack'] = caller_stack()
+        line = json.dumps(entry) + '\n'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with _write_lock, open(self.path, 'a') as f:
+                f.write(line)
+        except OSError:
+            # Never fail a request because the log couldn't be written
+            pass
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: attach the slow-query wrapper once"""
+    if not getattr(settings, 'SLOW_QUERY_LOG_ENABLED', True):
+        return
+    if any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        return
+    connection.execute_wrappers.append(SlowQueryLogger(connection.alias))
+
+
+def read_log(path=None, since=None):
+    """Yield parsed entries from the slow-query log"""
+    path = path or get_log_path()
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since is not None and entry.get('ts', 0) < since:
+                continue
+            yield entry
@@ -0,0 +1,51 @@
+"""
+Request-time personalized ranking.
+
+compute_affinities (store/affinity.py) stores, per user, a weight for every
+category and price band plus a short list of candidate item ids already
+ranked against them. Here we only re-score those few candidates with a dot
+product over the same features, since prices and availability may have
+changed since the batch run.
+"""
+
+from bisect import bisect_right
+
+from .models import Item, UserAffinity
+
+# Upper bounds of the price bands; the last band is everything above
+PRICE_BANDS = (5, 10, 25, 50, 100, 250)
+NUM_PRICE_BANDS = len(PRICE_BANDS) + 1
+UNCATEGORIZED = 'none'
+
+
+def price_band(price):
+    return bisect_right(PRICE_BANDS, float(price))
+
+
+def category_key(category_id):
+    return str(category_id) if category_id is not None else UNCATEGORIZED
+
+
+def score(item, category_weights, price_band_weights):
+    """Dot product of the item's one-hot features with the user's affinity vector"""
+    band = price_band(item.price)
+    band_weight = price_band_weights[band] if band < len(price_band_weights) else 0.0
+    return category_weights.get(category_key(item.category_id), 0.0) + band_weight
+
+
+def ranked_candidates(user, exclude=()):
+    """The user's precomputed candidates that are still available, best first"""
+    affinity = UserAffinity.objects.filter(user=user).first()
+    if affinity is None or not affinity.candidate_ids:
+        return []
+    items = [
+        item for item in
+        Item.objects.available(user).filter(id__in=affinity.candidate_ids)
+        .exclude(seller=user).select_related('seller', 'category')
+        if item.id not in exclude
+    ]
+    items.sort(
+        key=lambda item: (score(item, affinity.category_weights, affinity.price_band_weights), item.id),
+        reverse=True,
+    )
+    return items
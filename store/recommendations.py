@@ -0,0 +1,217 @@
+"""
+"Similar items" neighbours (run by build_similar_items).
+
+Every available listing becomes a sparse TF-IDF vector over the words of its
+title (counted twice) and description, plus one-hot category and price band
+features. Rows are L2-normalised, so cosine similarity is a sparse matrix
+product over the words, computed a block of rows at a time against the whole
+corpus, with the category/band matches added onto its non-zero entries; the
+top-k of each row are written to SimilarItem. Listings that share no
+(reasonably rare) word are never neighbours, which keeps the products sparse.
+
+A full build replaces every list. An incremental run only vectorises the
+listings created since the last run and scores them, a block at a time,
+against the corpus in both directions: the new listings get their own lists, and an existing
+listing's list is rewritten only if a new listing beats its current k-th
+neighbour.
+"""
+
+import re
+from collections import Counter
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Max
+from scipy import sparse
+
+from .models import Item, RollupWatermark, SimilarItem
+from .ranking import price_band
+
+WATERMARK_NAME = 'similar_items'
+NEIGHBOURS = 8
+MIN_SCORE = 0.05
+MAX_DOCUMENT_FREQUENCY = 0.2
+STRUCTURED_WEIGHT = 1.5
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or so that the this to was with'.split()
+)
+
+
+def tokenize(item):
+    return Counter(
+        word for word in TOKEN_RE.findall(f'{item.title} {item.title} {item.description}'.lower())
+        if len(word) > 1 and word not in STOP_WORDS
+    )
+
+
+def vectorize(items):
+    """(word TF-IDF CSR matrix, (category codes, band codes, feature weights)), rows L2-normalised
+
+    Category and price band are one-hot features of weight STRUCTURED_WEIGHT that
+    count towards each row's norm but are kept out of the sparse matrix.
+    """
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    for row, item in enumerate(items):
+        for term, count in tokenize(item).items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+            counts.append(count)
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(counts, dtype=np.float64), (rows, cols)), shape=(len(items), len(vocabulary)),
+    )
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(items)) / (1 + document_frequency)) + 1
+    # Words in most listings say little and would make every product dense
+    idf[document_frequency > MAX_DOCUMENT_FREQUENCY * len(items)] = 0
+    # Sublinear term frequency, so a word repeated in a long description doesn't dominate
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    matrix.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel() + 2 * STRUCTURED_WEIGHT ** 2)
+    matrix = (sparse.diags(1 / norms) @ matrix).tocsr()
+    categories = np.asarray([item.category_id or 0 for item in items], dtype=np.int64)
+    bands = np.asarray([price_band(item.price) for item in items], dtype=np.int64)
+    return matrix, (categories, bands, STRUCTURED_WEIGHT / norms)
+
+
+def similarity(matrix, transposed, features, rows):
+    """Cosine similarity of `rows` against every row, for pairs sharing at least one word
+
+    `transposed` is matrix.T already in CSR form, so each block is a CSR x CSR product.
+    """
+    scores = matrix[rows] @ transposed
+    categories, bands, weights = features
+    left = rows[np.repeat(np.arange(len(rows)), np.diff(scores.indptr))]
+    right = scores.indices
+    matches = (categories[left] == categories[right]).astype(float) + (bands[left] == bands[right])
+    scores.data += weights[left] * weights[right] * matches
+    return scores
+
+
+def top_k(scores, exclude_columns=None, k=NEIGHBOURS):
+    """Per row of a CSR score matrix, [(column, score)] of its k best entries above MIN_SCORE"""
+    results = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        columns, values = scores.indices[start:end], scores.data[start:end]
+        keep = values >= MIN_SCORE
+        if exclude_columns is not None:
+            keep &= columns != exclude_columns[row]
+        columns, values = columns[keep], values[keep]
+        if len(values) > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            columns, values = columns[best], values[best]
+        order = np.argsort(-values, kind='stable')
+        results.append(list(zip(columns[order].tolist(), values[order].tolist())))
+    return results
+
+
+def _write(neighbour_lists):
+    """Replace the stored lists for {item_id: [(neighbour_id, score)]}"""
+    # Raw executemany: hundreds of thousands of tiny rows are mostly ORM overhead otherwise
+    meta = SimilarItem._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(meta.get_field(name).column) for name in ('item', 'neighbour', 'rank', 'score'))
+    insert = f'INSERT INTO {quote(meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s)'
+    item_ids = list(neighbour_lists)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(item_ids), 500):
+            SimilarItem.objects.filter(item_id__in=item_ids[start:start + 500]).delete()
+        cursor.executemany(insert, [
+            (item_id, neighbour_id, rank, round(score, 4))
+            for item_id, neighbours in neighbour_lists.items()
+            for rank, (neighbour_id, score) in enumerate(neighbours)
+        ])
+
+
+def _corpus():
+    return list(Item.objects.available().order_by('id').only('id', 'title', 'description', 'category_id', 'price'))
+
+
+def build(batch_size=500, stdout=None):
+    """Recompute every available listing's neighbours; returns how many listings were processed"""
+    items = _corpus()
+    max_item_id = Item.all_objects.aggregate(m=Max('id'))['m'] or 0
+    ids = np.asarray([item.id for item in items], dtype=np.int64)
+
+    SimilarItem.objects.exclude(item_id__in=Item.objects.available().values('id')).delete()
+    if items:
+        matrix, features = vectorize(items)
+        transposed = matrix.T.tocsr()
+        for start in range(0, len(items), batch_size):
+            rows = np.arange(start, min(start + batch_size, len(items)))
+            lists = top_k(similarity(matrix, transposed, features, rows), exclude_columns=rows)
+            _write({
+                int(ids[row]): [(int(ids[column]), score) for column, score in neighbours]
+                for row, neighbours in zip(rows, lists)
+            })
+            if stdout:
+                stdout.write(f'  {min(start + batch_size, len(items))}/{len(items)} listings')
+
+    RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'last_item_id': max_item_id})
+    return len(items)
+
+
+def refresh(batch_size=500):
+    """Add neighbours for listings created since the last run; returns how many were new"""
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    if watermark is None:
+        return build(batch_size)
+
+    items = _corpus()
+    max_item_id = Item.all_objects.aggregate(m=Max('id'))['m'] or 0
+    ids = np.asarray([item.id for item in items], dtype=np.int64)
+    new_rows = np.flatnonzero(ids > watermark.last_item_id)
+    if len(new_rows):
+        matrix, features = vectorize(items)
+        transposed = matrix.T.tocsr()
+        kth_scores = dict(
+            SimilarItem.objects.filter(rank=NEIGHBOURS - 1).values_list('item_id', 'score')
+        )
+        stored = {}
+        for start in range(0, len(new_rows), batch_size):
+            rows = new_rows[start:start + batch_size]
+            scores = similarity(matrix, transposed, features, rows)
+
+            # Lists for the new listings themselves
+            _write({
+                int(ids[row]): [(int(ids[column]), score) for column, score in neighbours]
+                for row, neighbours in zip(rows, top_k(scores, exclude_columns=rows))
+            })
+
+            # Existing listings whose list a new one breaks into
+            reverse = scores.T.tocsr()
+            touched = np.flatnonzero(np.diff(reverse.indptr))
+            for column in np.setdiff1d(touched, new_rows):
+                begin, end = reverse.indptr[column], reverse.indptr[column + 1]
+                item_id = int(ids[column])
+                threshold = kth_scores.get(item_id, MIN_SCORE)
+                stored.setdefault(item_id, []).extend(
+                    (int(ids[rows[row]]), float(value))
+                    for row, value in zip(reverse.indices[begin:end], reverse.data[begin:end])
+                    if value > threshold
+                )
+
+        lists = {}
+        stored = {item_id: challengers for item_id, challengers in stored.items() if challengers}
+        if stored:
+            current = {}
+            stored_ids = list(stored)
+            for start in range(0, len(stored_ids), 500):
+                rows = SimilarItem.objects.filter(item_id__in=stored_ids[start:start + 500]).values_list(
+                    'item_id', 'neighbour_id', 'score',
+                )
+                for item_id, neighbour_id, score in rows:
+                    current.setdefault(item_id, []).append((neighbour_id, score))
+            for item_id, challengers in stored.items():
+                merged = dict(current.get(item_id, []))
+                merged.update(challengers)
+                lists[item_id] = sorted(merged.items(), key=lambda pair: -pair[1])[:NEIGHBOURS]
+        _write(lists)
+
+    watermark.last_item_id = max(watermark.last_item_id, max_item_id)
+    watermark.save()
+    return len(new_rows)
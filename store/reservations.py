@@ -0,0 +1,87 @@
+"""
+Time-boxed holds on listings.
+
+Adding an item to the cart (or opening checkout) puts a hold on it for
+RESERVATION_MINUTES using the existing 'reserved' status. Every operation is a
+single conditional UPDATE, so two buyers racing for the same item can never
+both get the hold, and nothing has to lock rows or read them first.
+
+Holds hide a listing from other visitors, so every change purges the cached
+pages showing it. Lapsed holds need no purge: they are already treated as
+available, and cached pages catch up within PAGE_CACHE_SECONDS.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import autocomplete, page_cache
+from .models import Item
+
+
+class HoldLost(Exception):
+    """A hold disappeared between checking it and converting it into a sale"""
+
+
+def hold_duration():
+    return timedelta(minutes=getattr(settings, 'RESERVATION_MINUTES', 15))
+
+
+def _holdable_by(user, now):
+    return (
+        Q(status='available')
+        | Q(status='reserved', reserved_until__lt=now)
+        | Q(status='reserved', reserved_by=user)
+    )
+
+
+def reserve(item_ids, user):
+    """Place or extend `user`'s hold on the given items; returns how many are now held"""
+    now = timezone.now()
+    held = (
+        Item.objects.filter(_holdable_by(user, now), id__in=item_ids)
+        .exclude(seller=user)
+        .update(status='reserved', reserved_by=user, reserved_until=now + hold_duration())
+    )
+    if held:
+        page_cache.purge_items(item_ids)
+    return held
+
+
+def release(item_ids, user):
+    """Drop `user`'s hold on the given items"""
+    released = Item.objects.filter(id__in=item_ids, status='reserved', reserved_by=user).update(
+        status='available', reserved_by=None, reserved_until=None,
+    )
+    if released:
+        page_cache.purge_items(item_ids)
+    return released
+
+
+def held_by(item_ids, user):
+    """Ids among `item_ids` that `user` currently holds"""
+    return set(
+        Item.objects.filter(
+            id__in=item_ids, status='reserved', reserved_by=user, reserved_until__gte=timezone.now(),
+        ).values_list('id', flat=True)
+    )
+
+
+def mark_sold(item_ids, user):
+    """Convert `user`'s holds into sales"""
+    sold = Item.objects.filter(id__in=item_ids, status='reserved', reserved_by=user).update(
+        status='sold', reserved_by=None, reserved_until=None, updated_at=timezone.now(),
+    )
+    if sold:
+        page_cache.purge_items(item_ids)
+        autocomplete.items_changed(item_ids)
+    return sold
+
+
+def expire_lapsed():
+    """Return every lapsed hold to 'available' in one statement"""
+    return Item.objects.filter(status='reserved', reserved_until__lt=timezone.now()).update(
+        status='available', reserved_by=None, reserved_until=None,
+    )
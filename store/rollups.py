@@ -0,0 +1,138 @@
+"""
+Daily sales rollups.
+
+Orders and listings are folded into SellerDailyRollup / CategoryDailyRollup
+one calendar day at a time. A RollupWatermark remembers the highest Order and
+Item ids already seen, so each run only looks at new rows, works out which
+days they touched, and rebuilds just those days (medians can't be updated
+incrementally, but a single day is cheap to recompute).
+"""
+
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from statistics import median
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ArchivedItem, CategoryDailyRollup, Item, Order, RollupWatermark, SellerDailyRollup,
+)
+
+WATERMARK_NAME = 'sales'
+
+
+def _day_bounds(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, dt_time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def _empty_bucket():
+    return {
+        'orders': 0,
+        'revenue': Decimal('0'),
+        'listings_created': 0,
+        'item_ids': set(),
+        'days_to_sell': [],
+    }
+
+
+def _touched_days(queryset):
+    """Distinct local dates on which rows of `queryset` were created"""
+    return set(
+        queryset.annotate(day=TruncDate('created_at')).order_by().values_list('day', flat=True).distinct()
+    )
+
+
+def rebuild_day(day):
+    """Recompute every rollup row for one day from the source tables"""
+    start, end = _day_bounds(day)
+    per_seller = defaultdict(_empty_bucket)
+    per_category = defaultdict(_empty_bucket)
+
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end).order_by().values(
+        'total_price', 'created_at', 'item_id', 'archived_item_id',
+        'item__seller_id', 'item__category_id', 'item__created_at',
+        'archived_item__seller_id', 'archived_item__category_id', 'archived_item__created_at',
+    )
+    for order in orders:
+        prefix = 'item__' if order['item_id'] else 'archived_item__'
+        seller_id = order[prefix + 'seller_id']
+        if seller_id is None:
+            continue
+        category_id = order[prefix + 'category_id']
+        item_id = order['item_id'] or order['archived_item_id']
+        days_to_sell = (order['created_at'] - order[prefix + 'created_at']).total_seconds() / 86400
+
+        for bucket in (per_seller[(seller_id, category_id)], per_category[category_id]):
+            bucket['orders'] += 1
+            bucket['revenue'] += order['total_price']
+            if item_id not in bucket['item_ids']:
+                bucket['item_ids'].add(item_id)
+                bucket['days_to_sell'].append(days_to_sell)
+
+    for model in (Item.all_objects, ArchivedItem.objects):
+        listings = model.filter(created_at__gte=start, created_at__lt=end).order_by() \
+            .values('seller_id', 'category_id').annotate(n=Count('id'))
+        for row in listings:
+            per_seller[(row['seller_id'], row['category_id'])]['listings_created'] += row['n']
+            per_category[row['category_id']]['listings_created'] += row['n']
+
+    def fields(bucket):
+        days = bucket['days_to_sell']
+        return {
+            'orders': bucket['orders'],
+            'revenue': bucket['revenue'],
+            'listings_created': bucket['listings_created'],
+            'items_sold': len(bucket['item_ids']),
+            'days_to_sell_total': sum(days),
+            'median_days_to_sell': median(days) if days else None,
+        }
+
+    with transaction.atomic():
+        SellerDailyRollup.objects.filter(day=day).delete()
+        CategoryDailyRollup.objects.filter(day=day).delete()
+        SellerDailyRollup.objects.bulk_create([
+            SellerDailyRollup(seller_id=seller_id, category_id=category_id, day=day, **fields(bucket))
+            for (seller_id, category_id), bucket in per_seller.items()
+        ])
+        CategoryDailyRollup.objects.bulk_create([
+            CategoryDailyRollup(category_id=category_id, day=day, **fields(bucket))
+            for category_id, bucket in per_category.items()
+        ])
+
+
+def run(rebuild=False):
+    """Fold everything newer than the watermark into the rollups; returns the days rebuilt"""
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    if rebuild:
+        watermark.last_order_id = 0
+        watermark.last_item_id = 0
+
+    # Pin the upper bound first so rows created while we work wait for the next run
+    max_order_id = Order.objects.aggregate(m=Max('id'))['m'] or 0
+    max_item_id = Item.all_objects.aggregate(m=Max('id'))['m'] or 0
+
+    days = set()
+    if max_order_id > watermark.last_order_id:
+        days |= _touched_days(Order.objects.filter(id__gt=watermark.last_order_id, id__lte=max_order_id))
+    if max_item_id > watermark.last_item_id:
+        days |= _touched_days(Item.all_objects.filter(id__gt=watermark.last_item_id, id__lte=max_item_id))
+    if rebuild:
+        # Archived listings no longer have an Item row to be picked up above
+        days |= _touched_days(ArchivedItem.objects.all())
+        SellerDailyRollup.objects.all().delete()
+        CategoryDailyRollup.objects.all().delete()
+    days.discard(None)
+
+    for day in sorted(days):
+        rebuild_day(day)
+
+    watermark.last_order_id = max(watermark.last_order_id, max_order_id)
+    watermark.last_item_id = max(watermark.last_item_id, max_item_id)
+    watermark.save()
+    return sorted(days)
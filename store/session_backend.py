@@ -0,0 +1,56 @@
+"""
+Sessions kept in the shared cache, written to the database only on login and logout.
+
+With the default database sessions every logged-in request reads
+django_session, and every session change is a write to the same SQLite file
+as the orders. This store (SESSION_ENGINE = 'store.session_backend') serves
+sessions from the shared cache (SESSION_CACHE_ALIAS) instead:
+
+    - Reads come from the cache. A miss (eviction, cache wiped) falls back
+      to django_session and refills the cache, like Django's cached_db.
+    - A save writes the cache. It also writes django_session when a new
+      session is created, or when the login keys (user id, backend,
+      password hash) change. That covers login, logout and password
+      changes, so the database always knows who is logged in, and an
+      evicted session only loses its other, re-creatable data.
+    - A save whose data is identical to what was loaded is skipped
+      entirely, even if the session was marked modified.
+
+Logout flushes the session, which deletes it from both places. Expired rows
+are removed by `python manage.py purge_sessions`.
+"""
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends import cached_db
+
+LOGIN_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+class SessionStore(cached_db.SessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # Serialized data and login keys as of the last load or save
+        self._saved = None
+        self._saved_login = {}
+
+    def _remember(self, data):
+        self._saved = self.serializer().dumps(data)
+        self._saved_login = {key: data.get(key) for key in LOGIN_KEYS}
+
+    def load(self):
+        data = super().load()
+        self._remember(data)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if not must_create and self._saved is not None and self.serializer().dumps(data) == self._saved:
+            return
+        if must_create or any(data.get(key) != self._saved_login.get(key) for key in LOGIN_KEYS):
+            # Database and cache
+            super().save(must_create=must_create)
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        self._remember(data)
@@ -10,6 +10,11 @@ class SwipeCard {
         this.isDragging = false;
         this.isAnimating = false;
         this.threshold = window.innerWidth * 0.08; // Very sensitive threshold - only 8% of viewport
+        this.prefetchAt = 3; // Fetch the next batch when this many cards are left
+        this.flushAt = 5; // Send swipe decisions in batches of this size
+        this.pendingSwipes = [];
+        this.shownIds = new Set(); // Every card dealt this visit, so later batches never repeat one
+        this.loading = false;
         this.init();
     }
 
@@ -17,12 +22,19 @@ class SwipeCard {
         const cardContainer = document.getElementById('swipe-card-stack');
         if (!cardContainer) return;
 
+        this.container = cardContainer;
+        this.feedUrl = cardContainer.dataset.feedUrl;
+        this.swipesUrl = cardContainer.dataset.swipesUrl;
+        this.nextBefore = cardContainer.dataset.nextBefore || '';
+
         this.cards = Array.from(document.querySelectorAll('.swipe-card'));
         if (this.cards.length === 0) return;
+        this.cards.forEach(card => this.shownIds.add(card.dataset.itemId));
 
         this.setupEventListeners();
         this.updateCardPositions();
         this.setupButtonControls();
+        this.prefetch();
         
         // Expose globally for button controls
         window.swiper = this;
@@ -38,6 +50,12 @@ class SwipeCard {
         document.addEventListener('mousedown', (e) => this.handleStart(e), false);
         document.addEventListener('mousemove', (e) => this.handleMove(e), false);
         document.addEventListener('mouseup', (e) => this.handleEnd(e), false);
+
+        // Send any unsent swipes when the user leaves the page
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') this.flushSwipes();
+        });
+        window.addEventListener('pagehide', () => this.flushSwipes());
     }
 
     setupButtonControls() {
@@ -145,6 +163,7 @@ class SwipeCard {
         card.style.transition = 'all 0.6s cubic-bezier(0.25, 0.46, 0.45, 0.94)';
         card.style.transform = `translateX(${window.innerWidth * 2}px) rotate(30deg) translateY(100px)`;
         card.style.opacity = '0';
+        this.recordSwipe(itemId, 'like');
 
         // Add to cart via AJAX
         setTimeout(() => {
@@ -182,13 +201,13 @@ class SwipeCard {
                 });
             }
             
-            this.currentIndex++;
             this.moveToNextCard();
         }, 600);
     }
 
     swipeLeft(card) {
         this.isAnimating = true;
+        this.recordSwipe(card.dataset.itemId, 'nope');
         
         // Falling animation to the left
         card.style.transition = 'all 0.6s cubic-bezier(0.25, 0.46, 0.45, 0.94)';
@@ -207,13 +226,130 @@ class SwipeCard {
         }
         
         this.cards = this.cards.filter((_, i) => i !== this.currentIndex);
+        this.isAnimating = false;
+        this.prefetch();
         
         if (this.cards.length > 0) {
-            this.isAnimating = false;
             this.updateCardPositions();
-        } else {
+        } else if (!this.hasMore()) {
             this.showEndMessage();
         }
+        // Otherwise the batch being fetched fills the deck when it arrives
+    }
+
+    hasMore() {
+        return this.nextBefore !== '';
+    }
+
+    prefetch() {
+        if (this.loading || !this.hasMore() || this.cards.length > this.prefetchAt) return;
+        this.loading = true;
+
+        fetch(`${this.feedUrl}?before=${encodeURIComponent(this.nextBefore)}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                this.loading = false;
+                this.nextBefore = data.next_before === null ? '' : String(data.next_before);
+                data.cards
+                    .filter(cardData => !this.shownIds.has(String(cardData.id)))
+                    .forEach(cardData => {
+                        this.shownIds.add(String(cardData.id));
+                        const card = this.createCard(cardData);
+                        this.container.appendChild(card);
+                        this.cards.push(card);
+                    });
+
+                if (this.cards.length > 0) {
+                    this.updateCardPositions();
+                    this.prefetch();
+                } else if (this.hasMore()) {
+                    this.prefetch();
+                } else {
+                    this.showEndMessage();
+                }
+            })
+            .catch(error => {
+                console.error('Error loading more items:', error);
+                this.loading = false;
+                if (this.cards.length === 0) this.showEndMessage();
+            });
+    }
+
+    createCard(data) {
+        const card = document.createElement('div');
+        card.className = 'swipe-card';
+        card.dataset.itemId = data.id;
+
+        let image;
+        if (data.image) {
+            image = document.createElement('img');
+            image.src = data.image;
+            image.alt = data.title;
+            image.className = 'swipe-card-image';
+        } else {
+            image = document.createElement('div');
+            image.className = 'swipe-card-image';
+            image.style.cssText = 'background-color: #ddd; display: flex; align-items: center; justify-content: center;';
+            image.innerHTML = '<span style="color: #999; font-size: 1.2rem;">No image</span>';
+        }
+        card.appendChild(image);
+
+        const gradient = document.createElement('div');
+        gradient.className = 'swipe-card-gradient';
+        card.appendChild(gradient);
+
+        const content = document.createElement('div');
+        content.className = 'swipe-card-content';
+        content.innerHTML = `
+            <div class="swipe-card-info">
+                <h3 class="swipe-card-title"></h3>
+                <p class="swipe-card-seller"></p>
+            </div>
+            <div class="swipe-card-details">
+                <p class="swipe-card-price"></p>
+                <div class="swipe-card-meta">
+                    <span class="swipe-badge"></span>
+                    <span class="swipe-badge condition"></span>
+                </div>
+            </div>
+        `;
+        // Text from the server goes in via textContent, never as markup
+        content.querySelector('.swipe-card-title').textContent = data.title;
+        content.querySelector('.swipe-card-seller').textContent = data.seller;
+        content.querySelector('.swipe-card-price').textContent = `$${data.price}`;
+        content.querySelector('.swipe-badge').textContent = data.category;
+        content.querySelector('.swipe-badge.condition').textContent = data.condition;
+        card.appendChild(content);
+        return card;
+    }
+
+    recordSwipe(itemId, direction) {
+        if (!this.swipesUrl || !itemId) return;
+        this.pendingSwipes.push({ item_id: Number(itemId), direction: direction });
+        if (this.pendingSwipes.length >= this.flushAt) this.flushSwipes();
+    }
+
+    flushSwipes() {
+        if (!this.swipesUrl || this.pendingSwipes.length === 0) return;
+        const swipes = this.pendingSwipes;
+        this.pendingSwipes = [];
+        const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]')?.value;
+
+        // keepalive lets the request finish even if the page is being unloaded
+        fetch(this.swipesUrl, {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken,
+            },
+            body: JSON.stringify({ swipes: swipes }),
+        }).catch(error => console.error('Error saving swipes:', error));
     }
 
     updateCardPositions() {
@@ -244,6 +380,7 @@ class SwipeCard {
 
     showEndMessage() {
         this.isAnimating = false;
+        this.flushSwipes();
         const container = document.getElementById('swipe-card-stack');
         container.innerHTML = `
             <div style="
@@ -0,0 +1,57 @@
+// Per-viewer buttons on cached pages.
+//
+// Pages such as the item detail and browse pages are rendered the same for
+// everyone (as for a logged-out visitor) so they can be cached. Each element
+// marked data-viewer-state data-item-id="..." contains variants tagged with
+// data-when="<state> ..."; this script asks the item_state endpoint about all
+// of the page's items in one request and shows the variants that match.
+
+(function () {
+    const marker = document.getElementById('viewer-state');
+    if (!marker) return;
+
+    const containers = Array.from(document.querySelectorAll('[data-viewer-state]'));
+    const ids = Array.from(new Set(containers.map(function (el) { return el.dataset.itemId; })));
+    if (!ids.length) return;
+
+    function statesFor(state) {
+        if (!state) return ['sold_out'];
+        const states = [];
+        if (state.is_seller) {
+            states.push('seller', state.can_buy ? 'in_stock' : 'sold_out');
+        } else if (state.can_buy) {
+            states.push('in_stock', 'buyer', state.in_cart ? 'in_cart' : 'can_add');
+        } else {
+            states.push('sold_out');
+        }
+        if (state.purchased) states.push('purchased');
+        return states;
+    }
+
+    function apply(container, states) {
+        container.querySelectorAll('[data-when]').forEach(function (el) {
+            el.hidden = !el.dataset.when.split(' ').some(function (when) {
+                return states.indexOf(when) !== -1;
+            });
+        });
+    }
+
+    function showReviewForm() {
+        const slot = document.getElementById('review-form-slot');
+        const template = document.getElementById('review-form-template');
+        if (slot && template && !slot.children.length) {
+            slot.appendChild(template.content.cloneNode(true));
+        }
+    }
+
+    fetch(marker.dataset.url + '?ids=' + ids.join(','), {credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+            if (!data.authenticated) return;
+            containers.forEach(function (container) {
+                const states = statesFor(data.items[container.dataset.itemId]);
+                apply(container, states);
+                if (states.indexOf('purchased') !== -1) showReviewForm();
+            });
+        });
+})();
@@ -0,0 +1,34 @@
+"""
+Django template backend that records render time for the metrics middleware.
+
+Only top-level renders go through the backend Template wrapper, so included
+and extended templates are counted once as part of their parent.
+"""
+
+import time
+
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.django import Template as BaseTemplate
+
+from .metrics import current_request_stats
+
+
+class Template(BaseTemplate):
+    def render(self, context=None, request=None):
+        stats = current_request_stats()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
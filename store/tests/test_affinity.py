@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from store import affinity, discovery, ranking
+from store.models import UserAffinity
+
+from .utils import StoreTestCase, make_category, make_item, make_user
+
+
+class AffinityTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.user = make_user('shopper')
+        self.shoes = make_category('Shoes')
+        self.books = make_category('Books')
+        self.liked = make_item(self.seller, title='Trainers', price='40.00', category=self.shoes)
+        self.boots = make_item(self.seller, title='Boots', price='45.00', category=self.shoes)
+        self.novel = make_item(self.seller, title='Novel', price='4.00', category=self.books)
+        self.own = make_item(self.user, title='My loafers', price='40.00', category=self.shoes)
+        discovery.record_swipes(self.user, [(self.liked.id, 'like'), (self.novel.id, 'nope')])
+
+    def test_liked_category_and_price_band_rank_first(self):
+        self.assertEqual(affinity.run(), 1)
+        row = UserAffinity.objects.get(user=self.user)
+        self.assertGreater(row.category_weights[str(self.shoes.id)], 0)
+        self.assertLess(row.category_weights[str(self.books.id)], 0)
+        self.assertEqual(row.candidate_ids[0], self.boots.id)
+        # Never the user's own listings
+        self.assertNotIn(self.own.id, row.candidate_ids)
+
+    def test_chunking_does_not_change_the_result(self):
+        other = make_user('other')
+        discovery.record_swipes(other, [(self.novel.id, 'like')])
+        affinity.run(chunk_size=1)
+        chunked = dict(UserAffinity.objects.values_list('user_id', 'candidate_ids'))
+        affinity.run()
+        self.assertEqual(dict(UserAffinity.objects.values_list('user_id', 'candidate_ids')), chunked)
+        self.assertEqual(chunked[other.id][0], self.novel.id)
+
+    def test_inactive_users_drop_back_to_the_chronological_feed(self):
+        affinity.run()
+        call_command('compute_affinities', '--lookback-days', '0', stdout=StringIO())
+        self.assertFalse(UserAffinity.objects.exists())
+
+    def test_request_time_ranking_skips_unavailable_and_seen_items(self):
+        affinity.run()
+        self.boots.status = 'sold'
+        self.boots.save()
+        ranked = ranking.ranked_candidates(self.user, exclude={self.liked.id})
+        self.assertNotIn(self.boots.id, [item.id for item in ranked])
+        self.assertNotIn(self.liked.id, [item.id for item in ranked])
+        items, _ = discovery.next_batch(self.user)
+        self.assertEqual([item.id for item in items], [item.id for item in ranking.ranked_candidates(
+            self.user, exclude=discovery.load_seen(self.user))])
+
+    def test_price_bands(self):
+        self.assertEqual([ranking.price_band(price) for price in ('4.99', '5', '250', '9999')], [0, 1, 6, 6])
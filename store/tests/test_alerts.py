@@ -0,0 +1,60 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from store import alerts
+from store.models import Notification, SavedSearch
+
+from .utils import StoreTestCase, make_category, make_item, make_user
+
+
+class SavedSearchAlertTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.shoes = make_category('Shoes')
+        # The first run only sets the watermark
+        alerts.run()
+
+    def search(self, **filters):
+        return SavedSearch.objects.create(user=self.buyer, **filters)
+
+    def test_new_listings_alert_matching_searches_once(self):
+        self.search(query='Boots', category=self.shoes)
+        self.search(query='leather', max_price=Decimal('50'))
+        self.search(query='boots', condition='new')
+        match = make_item(self.seller, title='Leather boots', price='40.00', category=self.shoes)
+        make_item(self.seller, title='Leather sofa', price='400.00')
+
+        self.assertEqual(alerts.run(), (2, 1))
+        notification = Notification.objects.get()
+        self.assertEqual((notification.user, notification.item), (self.buyer, match))
+
+    def test_sellers_are_not_alerted_about_their_own_listings(self):
+        SavedSearch.objects.create(user=self.seller, query='boots')
+        make_item(self.seller, title='Boots')
+        self.assertEqual(alerts.run(), (1, 0))
+
+    def test_listings_are_only_matched_once(self):
+        self.search(query='boots')
+        make_item(self.seller, title='Boots')
+        call_command('match_saved_searches', stdout=StringIO())
+        call_command('match_saved_searches', stdout=StringIO())
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_price_only_searches(self):
+        self.search(min_price=Decimal('20'), max_price=Decimal('30'))
+        make_item(self.seller, title='Cheap', price='10.00')
+        inside = make_item(self.seller, title='Inside', price='30.00')
+        make_item(self.seller, title='Dear', price='31.00')
+        alerts.run()
+        self.assertEqual(list(Notification.objects.values_list('item_id', flat=True)), [inside.id])
+
+    def test_saving_a_search_from_the_browse_filters(self):
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('save_search'), {'q': ' Boots ', 'category': self.shoes.id, 'max_price': 'abc'})
+        search = SavedSearch.objects.get()
+        self.assertEqual((search.query, search.category, search.max_price), ('Boots', self.shoes, None))
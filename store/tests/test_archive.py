@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from store.models import ArchivedItem, ArchivedReview, Item, Message, Order, Review
+
+from .utils import StoreTestCase, make_user, make_item
+
+
+class ArchiveTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.old = make_item(self.seller, title='Old coat', status='sold')
+        self.recent = make_item(self.seller, title='Recent coat', status='sold')
+        self.available = make_item(self.seller, title='Open coat')
+        Item.objects.filter(id__in=[self.old.id, self.available.id]).update(
+            updated_at=timezone.now() - timedelta(days=60),
+        )
+        self.order = Order.objects.create(item=self.old, buyer=self.buyer, total_price=self.old.price)
+        Review.objects.create(item=self.old, author=self.buyer, rating=4, comment='Warm')
+
+    def test_only_old_sold_items_move_to_the_archive(self):
+        call_command('archive_items', '--days', '30', stdout=StringIO())
+
+        self.assertEqual(list(ArchivedItem.objects.values_list('id', flat=True)), [self.old.id])
+        self.assertFalse(Item.objects.filter(id=self.old.id).exists())
+        self.assertTrue(Item.objects.filter(id=self.recent.id).exists())
+        self.assertTrue(Item.objects.filter(id=self.available.id).exists())
+        self.assertEqual(ArchivedReview.objects.get().item_id, self.old.id)
+
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.item_id)
+        self.assertEqual(self.order.listing.title, 'Old coat')
+
+    def test_old_links_still_show_the_archived_item(self):
+        call_command('archive_items', '--days', '30', stdout=StringIO())
+        response = self.client.get(reverse('item_detail', args=[self.old.id]))
+        self.assertContains(response, 'Old coat')
+
+
+class ArchivedConversationTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.item = make_item(self.seller, title='Old coat', status='sold')
+        self.live = make_item(self.seller, title='Open coat')
+        Item.objects.filter(id=self.item.id).update(updated_at=timezone.now() - timedelta(days=60))
+        Message.objects.create(item=self.item, sender=self.buyer, recipient=self.seller, content='Still warm?')
+        Message.objects.create(item=self.live, sender=self.buyer, recipient=self.seller, content='Any stains?')
+        call_command('archive_items', '--days', '30', stdout=StringIO())
+        self.client.force_login(self.seller)
+
+    def test_archived_conversations_stay_in_the_inbox(self):
+        response = self.client.get(reverse('messages_inbox'))
+        titles = [conversation['item'].title for conversation in response.context['items_with_messages']]
+        self.assertEqual(sorted(titles), ['Old coat', 'Open coat'])
+        self.assertEqual(response.context['unread_count'], 2)
+
+    def test_reading_an_archived_conversation_clears_its_unread_count(self):
+        response = self.client.get(reverse('item_chat', args=[self.item.id]))
+        self.assertContains(response, 'Still warm?')
+        self.assertContains(response, 'the conversation is closed')
+        self.assertEqual(self.client.get(reverse('messages_inbox')).context['unread_count'], 1)
+
+        # Can't be continued
+        self.client.post(reverse('item_chat', args=[self.item.id]), {'content': 'Yes'})
+        self.assertEqual(Message.objects.filter(archived_item_id=self.item.id).count(), 1)
+
+    def test_only_participants_can_read_it(self):
+        self.client.force_login(make_user('stranger'))
+        self.assertEqual(self.client.get(reverse('item_chat', args=[self.item.id])).status_code, 404)
+
+    def test_orphaned_unread_messages_are_not_counted(self):
+        ArchivedItem.objects.filter(id=self.item.id).delete()
+        self.assertEqual(self.client.get(reverse('messages_inbox')).context['unread_count'], 1)
@@ -0,0 +1,137 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+
+from store import autocomplete, bulk, reservations
+from store.models import Item
+from store.purge import soft_delete_item, soft_delete_user
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class AutocompleteTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('thriftqueen')
+        self.buyer = make_user('buyer')
+        self.item = make_item(self.seller, title='Vintage denim jacket')
+        autocomplete.rebuild()
+        self.addCleanup(setattr, autocomplete, '_index', None)
+
+    def labels(self, prefix):
+        return [label for kind, label, ref_id, weight in autocomplete.complete(prefix)]
+
+    def test_titles_match_from_any_word(self):
+        self.assertEqual(self.labels('jac'), ['Vintage denim jacket'])
+        self.assertEqual(self.labels('thrift'), ['thriftqueen'])
+        response = self.client.get(reverse('autocomplete'), {'q': 'denim'})
+        self.assertEqual(response.json()['results'][0]['url'], reverse('item_detail', args=[self.item.id]))
+
+    def test_changes_apply_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_item(self.seller, title='Wool scarf')
+            self.assertEqual(self.labels('wool'), [])
+        self.assertEqual(self.labels('wool'), ['Wool scarf'])
+
+    def test_rolled_back_listing_is_never_suggested(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                make_item(self.seller, title='Phantom boots')
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.labels('phantom'), [])
+
+    def test_held_items_stay_suggested_and_sold_items_drop_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.reserve([self.item.id], self.buyer)
+            self.item.refresh_from_db()
+            self.item.save()
+        self.assertEqual(self.labels('denim'), ['Vintage denim jacket'])
+        self.assertEqual(autocomplete.build_index().complete('denim')[0][1], 'Vintage denim jacket')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.status = 'sold'
+            self.item.save()
+        self.assertEqual(self.labels('denim'), [])
+
+    @override_settings(AUTOCOMPLETE_RECONCILE_SECONDS=0)
+    def test_stale_index_is_rebuilt_off_the_request(self):
+        stale = autocomplete._index
+        with mock.patch.object(autocomplete.threading, 'Thread') as thread:
+            self.assertIs(autocomplete.get_index(), stale)
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_changes_made_during_a_rebuild_are_replayed(self):
+        def build_index():
+            # A listing is created while the rebuild reads the catalogue
+            with self.captureOnCommitCallbacks(execute=True):
+                make_item(self.seller, title='Linen shirt')
+            return autocomplete.PrefixIndex()
+
+        with mock.patch.object(autocomplete, 'build_index', side_effect=build_index):
+            autocomplete.rebuild()
+        self.assertEqual(self.labels('linen'), ['Linen shirt'])
+
+    def test_new_sellers_are_suggested_without_a_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_item(make_user('denimdealer'), title='Raw selvedge jeans')
+        self.assertEqual(self.labels('denimd'), ['denimdealer'])
+
+
+class AutocompleteStatusUpdateTests(StoreTestCase):
+    """Status changes made with update() send no signals"""
+
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('thriftqueen')
+        self.buyer = make_user('buyer')
+        self.item = make_item(self.seller, title='Vintage denim jacket')
+        autocomplete.rebuild()
+        self.addCleanup(setattr, autocomplete, '_index', None)
+
+    def labels(self, prefix):
+        return [label for kind, label, ref_id, weight in autocomplete.complete(prefix)]
+
+    def test_checkout_drops_the_listing(self):
+        reservations.reserve([self.item.id], self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reservations.mark_sold([self.item.id], self.buyer)
+            self.assertEqual(self.labels('denim'), ['Vintage denim jacket'])
+        self.assertEqual(self.labels('denim'), [])
+
+    def test_mark_as_sold_view_drops_the_listing(self):
+        self.client.force_login(self.seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('mark_item_sold', args=[self.item.id]))
+        self.assertEqual(self.labels('denim'), [])
+
+    def test_bulk_mark_sold_and_relist(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.apply(self.seller, [self.item.id], 'mark_sold', {})
+        self.assertEqual(self.labels('denim'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.apply(self.seller, [self.item.id], 'relist', {})
+        self.assertEqual(self.labels('denim'), ['Vintage denim jacket'])
+
+    def test_bulk_delete_drops_the_listing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.apply(self.seller, [self.item.id], 'delete', {})
+        self.assertEqual(self.labels('denim'), [])
+
+    def test_soft_deletes_drop_the_listings(self):
+        other = make_item(self.seller, title='Wool scarf')
+        autocomplete.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete_item(self.item)
+        self.assertEqual(self.labels('denim'), [])
+        self.assertEqual(self.labels('wool'), ['Wool scarf'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete_user(self.seller)
+        self.assertEqual(self.labels('wool'), [])
+        self.assertTrue(Item.all_objects.filter(id=other.id, deleted_at__isnull=False).exists())
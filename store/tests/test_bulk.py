@@ -0,0 +1,74 @@
+import json
+from decimal import Decimal
+
+from django.urls import reverse
+
+from store import bulk
+from store.models import Item
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class BulkRepriceTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.cheap = make_item(self.seller, title='Cheap', price='10.00')
+        self.dear = make_item(self.seller, title='Dear', price='900000.00')
+        self.ids = [self.cheap.id, self.dear.id]
+
+    def prices(self):
+        return [Item.objects.get(id=item_id).price for item_id in self.ids]
+
+    def test_percent_change_is_rounded_to_the_cent(self):
+        results = bulk.apply(self.seller, self.ids, 'reprice', {'mode': 'percent', 'value': '-12.345'})
+        self.assertEqual([result['price'] for result in results], ['8.77', '788895.00'])
+        self.assertEqual(self.prices(), [Decimal('8.77'), Decimal('788895.00')])
+
+    def test_prices_past_the_column_limit_are_skipped(self):
+        results = bulk.apply(self.seller, self.ids, 'reprice', {'mode': 'percent', 'value': '50'})
+        self.assertEqual(results[0], {'id': self.cheap.id, 'ok': True, 'price': '15.00'})
+        self.assertEqual(results[1], {'id': self.dear.id, 'ok': False, 'error': 'Price would exceed $999999.99'})
+        self.assertEqual(self.prices(), [Decimal('15.00'), Decimal('900000.00')])
+
+    def test_absurd_percentages_are_skipped_not_raised(self):
+        results = bulk.apply(self.seller, self.ids, 'reprice', {'mode': 'percent', 'value': '1e400'})
+        self.assertFalse(any(result['ok'] for result in results))
+        results = bulk.apply(self.seller, self.ids, 'reprice', {'mode': 'percent', 'value': '1000000'})
+        self.assertEqual([result['ok'] for result in results], [True, False])
+        self.assertEqual(self.prices(), [Decimal('100010.00'), Decimal('900000.00')])
+
+    def test_absolute_price_out_of_range(self):
+        for value in ('99999999', '1e400', '0', '0.001'):
+            with self.assertRaises(bulk.BulkActionError, msg=value):
+                bulk.apply(self.seller, self.ids, 'reprice', {'mode': 'absolute', 'value': value})
+        bulk.apply(self.seller, self.ids, 'reprice', {'mode': 'absolute', 'value': '999999.99'})
+        self.assertEqual(self.prices(), [Decimal('999999.99')] * 2)
+
+    def test_json_requests_get_a_client_error(self):
+        self.client.force_login(self.seller)
+        for value in ('99999999', 'inf', 'NaN'):
+            response = self.client.post(
+                reverse('bulk_items'), json.dumps({'item_ids': self.ids, 'operation': 'reprice',
+                                                   'mode': 'absolute', 'value': value}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400, value)
+        response = self.client.post(
+            reverse('bulk_items'), json.dumps({'item_ids': self.ids, 'operation': 'reprice', 'value': 1e300}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['succeeded'], 0)
+
+
+class BulkOwnershipTests(StoreTestCase):
+    def test_other_sellers_items_are_reported_not_changed(self):
+        seller, other = make_user('seller'), make_user('other')
+        mine, theirs = make_item(seller, title='Mine'), make_item(other, title='Theirs')
+        results = bulk.apply(seller, [theirs.id, mine.id], 'mark_sold', {})
+        self.assertEqual(results, [
+            {'id': theirs.id, 'ok': False, 'error': 'Not found'},
+            {'id': mine.id, 'ok': True, 'status': 'sold'},
+        ])
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.status, 'available')
@@ -0,0 +1,76 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from store import cache_backend
+from store.cache_backend import SQLiteCache
+
+
+def _bump(path, count):
+    cache = SQLiteCache(path, {})
+    for _ in range(count):
+        cache.incr('hits')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='latagan-cache-')
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.path = f'{self.temp_dir}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_values_round_trip_and_are_shared(self):
+        self.cache.set('page', {'content': b'<html>', 'status': 200})
+        self.cache.set_many({'a': 1, 'b': [2]})
+        other = self.make_cache()
+        self.assertEqual(other.get('page'), {'content': b'<html>', 'status': 200})
+        self.assertEqual(other.get_many(['a', 'b', 'missing']), {'a': 1, 'b': [2]})
+        self.assertEqual(other.delete_many(['a', 'b']), 2)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_expired_entries_are_invisible(self):
+        self.cache.set('short', 'value', timeout=60)
+        with mock.patch.object(cache_backend.time, 'time', return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertFalse(self.cache.has_key('short'))
+            # add() may take over an expired key
+            self.assertTrue(self.cache.add('short', 'new'))
+        self.assertEqual(self.cache.get('short'), 'new')
+
+    def test_add_only_succeeds_once(self):
+        self.assertTrue(self.cache.add('lock', 1, timeout=30))
+        self.assertFalse(self.make_cache().add('lock', 1, timeout=30))
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_bump, args=(self.path, 50)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('hits'), 150)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_culls_least_recently_used_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        for n in range(10):
+            cache.set(f'key{n}', n)
+        with mock.patch.object(cache_backend, 'CULL_CHECK_INTERVAL', 1), \
+                mock.patch.object(cache_backend.time, 'time', return_value=time.time() + 60):
+            # Reads only note the key; the access time is written with the next write
+            cache.get('key0')
+            cache.set('key10', 10)
+        remaining = cache.get_many([f'key{n}' for n in range(11)])
+        self.assertLessEqual(len(remaining), 10)
+        self.assertIn('key0', remaining)
+        self.assertIn('key10', remaining)
+        self.assertNotIn('key1', remaining)
@@ -0,0 +1,76 @@
+import json
+
+from django.urls import reverse
+
+from store import discovery
+from store.models import Swipe, UserAffinity
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class DiscoveryFeedTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.user = make_user('swiper')
+        self.items = [make_item(self.seller, title=f'Item {n}') for n in range(25)]
+
+    def ids(self, items):
+        return [item.id for item in items]
+
+    def walk(self, limit=10):
+        """Every card the feed serves, following cursors to the end"""
+        served, cursor = [], None
+        while True:
+            items, cursor = discovery.next_batch(self.user, cursor, limit=limit)
+            served += self.ids(items)
+            if cursor is None:
+                return served
+
+    def test_feed_is_newest_first_and_skips_swiped_items(self):
+        newest = self.ids(reversed(self.items))
+        discovery.record_swipes(self.user, [(newest[0], 'like'), (newest[3], 'nope')])
+        items, cursor = discovery.next_batch(self.user, limit=3)
+        self.assertEqual(self.ids(items), [newest[1], newest[2], newest[4]])
+        self.assertEqual(cursor, str(newest[4]))
+        self.assertEqual(self.walk(), [i for i in newest if i not in (newest[0], newest[3])])
+
+    def test_record_swipes_counts_only_new_swipes(self):
+        first, second = self.items[0].id, self.items[1].id
+        self.assertEqual(discovery.record_swipes(self.user, [(first, 'like'), (999999, 'like')]), 1)
+        self.assertEqual(discovery.record_swipes(self.user, [(first, 'nope'), (second, 'nope')]), 1)
+        self.assertEqual(discovery.record_swipes(self.user, [(second, 'sideways')]), 0)
+        self.assertEqual(Swipe.objects.get(user=self.user, item_id=first).direction, 'like')
+
+    def test_personalized_first_batch_is_not_repeated(self):
+        picks = self.ids(self.items[5:8])
+        UserAffinity.objects.create(user=self.user, candidate_ids=picks, price_band_weights=[0.0] * 7)
+        items, cursor = discovery.next_batch(self.user)
+        self.assertCountEqual(self.ids(items), picks)
+
+        served = self.ids(items)
+        while cursor is not None:
+            items, cursor = discovery.next_batch(self.user, cursor)
+            served += self.ids(items)
+        self.assertCountEqual(served, self.ids(self.items))
+
+    def test_feed_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('discover_feed'), {'before': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('discover_feed'))
+        self.assertEqual(len(response.json()['cards']), discovery.BATCH_SIZE)
+
+        swipes = [{'item_id': card['id'], 'direction': 'like'} for card in response.json()['cards']]
+        response = self.client.post(reverse('record_swipes'), json.dumps({'swipes': swipes * 2}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['recorded'], discovery.BATCH_SIZE)
+
+
+class BitmapTests(StoreTestCase):
+    def test_round_trip(self):
+        bitmap = discovery.Bitmap()
+        for value in (0, 7, 8, 1000):
+            bitmap.add(value)
+        restored = discovery.Bitmap(bitmap.to_bytes())
+        self.assertEqual([value for value in range(1001) if value in restored], [0, 7, 8, 1000])
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from store import engagement
+from store.models import ItemEngagement, ItemTrend
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class EngagementTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.item = make_item(self.seller)
+
+    def test_flush_adds_to_the_stored_totals(self):
+        engagement.record(self.item.id, 'views', 3)
+        engagement.record(self.item.id, 'cart_adds')
+        self.assertEqual(engagement.flush(), 1)
+        engagement.record(self.item.id, 'views')
+        self.assertEqual(engagement.counts([self.item.id])[self.item.id], (4, 1, 0))
+        engagement.flush()
+        self.assertEqual(ItemEngagement.objects.get(item=self.item).views, 4)
+        self.assertTrue(ItemTrend.objects.filter(item=self.item).exists())
+
+    def test_increments_for_purged_items_are_dropped(self):
+        engagement.record(999999, 'views')
+        self.assertEqual(engagement.flush(), 1)
+        self.assertFalse(ItemEngagement.objects.exists())
+
+    def test_unknown_counter(self):
+        with self.assertRaises(ValueError):
+            engagement.record(self.item.id, 'likes')
+
+    @override_settings(ENGAGEMENT_FLUSH_INTERVAL=10.0, ENGAGEMENT_FLUSH_THRESHOLD=2)
+    def test_recording_never_writes_on_the_request(self):
+        self.addCleanup(setattr, engagement, '_flusher', None)
+        self.addCleanup(engagement._wake.clear)
+        with mock.patch.object(engagement.threading, 'Thread') as thread, self.assertNumQueries(0):
+            engagement.record(self.item.id, 'views')
+            self.assertFalse(engagement._wake.is_set())
+            engagement.record(self.item.id, 'chat_starts')
+        # Past the threshold the background thread is woken up instead
+        self.assertTrue(engagement._wake.is_set())
+        thread.assert_called_once_with(
+            target=engagement._flush_periodically, args=(10.0,), name='engagement-flush', daemon=True,
+        )
+
+    def test_background_thread_flushes_each_interval(self):
+        class Stop(Exception):
+            pass
+
+        with mock.patch.object(engagement, 'flush', side_effect=[1, 0, Stop]) as flush:
+            with self.assertRaises(Stop):
+                engagement._flush_periodically(0)
+        self.assertEqual(flush.call_count, 3)
+
+    def test_cached_page_hits_count_as_views(self):
+        url = reverse('item_detail', args=[self.item.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.assertEqual(engagement.counts([self.item.id])[self.item.id].views, 2)
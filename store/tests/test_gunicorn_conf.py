@@ -0,0 +1,38 @@
+import importlib.util
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+def load_config():
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', settings.BASE_DIR / 'gunicorn.conf.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class WorkerPlanTests(SimpleTestCase):
+    def setUp(self):
+        self.config = load_config()
+
+    def test_one_sync_worker_per_slot_when_memory_allows(self):
+        with mock.patch.object(self.config.multiprocessing, 'cpu_count', return_value=2), \
+                mock.patch.object(self.config, '_available_memory_mb', return_value=4096):
+            self.assertEqual(self.config._worker_plan(), ('sync', 5, 1))
+
+    def test_threads_make_up_for_missing_memory(self):
+        with mock.patch.object(self.config.multiprocessing, 'cpu_count', return_value=4), \
+                mock.patch.object(self.config, '_available_memory_mb', return_value=self.config.WORKER_MEMORY_MB * 3):
+            worker_class, workers, threads = self.config._worker_plan()
+        # 9 slots wanted, room for 2 workers next to the master
+        self.assertEqual((worker_class, workers), ('gthread', 2))
+        self.assertGreaterEqual(workers * threads, 9)
+
+    def test_post_request_logs_slow_requests_as_warnings(self):
+        worker = mock.Mock(pid=123)
+        request = mock.Mock(method='GET', path='/items/', start_time=0.0)
+        with mock.patch.object(self.config.time, 'monotonic', return_value=self.config.SLOW_REQUEST_MS / 1000 + 1):
+            self.config.post_request(worker, request, {}, mock.Mock(status_code=200))
+        worker.log.warning.assert_called_once()
+        worker.log.debug.assert_not_called()
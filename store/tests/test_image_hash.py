@@ -0,0 +1,97 @@
+import io
+import random
+from io import StringIO
+
+from django.contrib.messages import get_messages
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+
+from store import image_hash
+from store.models import Item, ItemImageHash, UserProfile
+
+from .utils import StoreTestCase, make_category, make_item, make_user
+
+
+def pattern(seed, size=(360, 320), image_format='JPEG', **save_options):
+    """A blocky random picture; resizing and re-encoding keep its dHash close"""
+    rng = random.Random(seed)
+    image = Image.new('L', (9, 8))
+    image.putdata([rng.randrange(256) for _ in range(72)])
+    buffer = io.BytesIO()
+    image.resize(size, Image.Resampling.NEAREST).convert('RGB').save(buffer, image_format, **save_options)
+    return buffer.getvalue()
+
+
+class PerceptualHashTests(StoreTestCase):
+    def test_resized_and_recompressed_copies_stay_close(self):
+        original = image_hash.dhash(io.BytesIO(pattern(1)))
+        copy = image_hash.dhash(io.BytesIO(pattern(1, size=(180, 160), quality=40)))
+        other = image_hash.dhash(io.BytesIO(pattern(2)))
+        self.assertLessEqual(image_hash.distance(original, copy), 6)
+        self.assertGreater(image_hash.distance(original, other), 12)
+
+    def test_signed_storage_round_trips(self):
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            self.assertEqual(image_hash.to_unsigned(image_hash.to_signed(value)), value)
+
+    def test_band_lookup_finds_every_hash_within_the_distance(self):
+        seller = make_user('seller')
+        base = 0x0123456789ABCDEF
+        # Flipped bits spread over all four bands, as few as possible per band
+        variants = {2: base ^ 0x1 ^ (1 << 20), 6: base ^ 0x3 ^ (0x3 << 16) ^ (1 << 40) ^ (1 << 60), 9: base ^ 0x1FF}
+        rows = []
+        for bits, value in variants.items():
+            rows.append((make_item(seller, title=f'{bits} bits').id, f'items/{bits}.jpg', value))
+        image_hash.save_hashes(rows)
+        found = image_hash.near_duplicates(base)
+        self.assertEqual([bits for _, bits in found], [2, 6])
+        Item.objects.filter(id=rows[0][0]).update(status='sold')
+        self.assertEqual([bits for _, bits in image_hash.near_duplicates(base)], [6])
+
+    def test_duplicate_groups_link_chains(self):
+        rows = [(1, 0), (2, 0b111), (3, 0b111111), (4, (1 << 64) - 1)]
+        self.assertEqual(image_hash.duplicate_groups(rows, max_distance=3), [[1, 2, 3]])
+
+
+class SellItemDuplicateTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        UserProfile.objects.filter(user=self.seller).update(credits=100)
+        self.category = make_category()
+        self.client.force_login(self.seller)
+
+    def sell(self, data, title='Leather boots'):
+        response = self.client.post(reverse('sell_item'), {
+            'title': title, 'description': 'Worn twice', 'price': '30.00', 'category': self.category.id,
+            'condition': 'good', 'image': SimpleUploadedFile('boots.jpg', data, content_type='image/jpeg'),
+        })
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_reposting_your_own_photo_warns(self):
+        self.assertFalse([m for m in self.sell(pattern(1)) if 'looks like' in m])
+        warnings = self.sell(pattern(1, size=(200, 178), quality=60), title='Boots again')
+        self.assertIn('This photo looks like your listing "Leather boots". '
+                      'If it is the same item, please remove the repost.', warnings)
+        self.assertEqual(ItemImageHash.objects.count(), 2)
+
+    def test_someone_elses_photo_warns(self):
+        other = make_user('other')
+        name = default_storage.save('items/original.jpg', ContentFile(pattern(3)))
+        image_hash.update_item(make_item(other, title='Vintage camera', image=name))
+        warnings = self.sell(pattern(3), title='Camera')
+        self.assertIn('This photo looks like an existing listing, "Vintage camera". '
+                      'Please use photos of your own item.', warnings)
+
+    def test_scan_command_reports_groups(self):
+        for n, seed in enumerate((4, 4, 5)):
+            name = default_storage.save(f'items/scan{n}.jpg', ContentFile(pattern(seed, quality=90 - n)))
+            make_item(self.seller, title=f'Scan {n}', image=name)
+        out = StringIO()
+        call_command('scan_image_hashes', '--workers', '1', stdout=out)
+        self.assertIn('1 duplicate groups covering 2 unsold listings', out.getvalue())
+        self.assertIn('(same seller)', out.getvalue())
@@ -0,0 +1,54 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store import reservations
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class ItemPageTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.item = make_item(self.seller, title='Denim jacket')
+        self.sold = make_item(self.seller, title='Wool scarf')
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('buy_item', args=[self.sold.id]))
+        self.client.post(reverse('add_to_cart', args=[self.item.id]))
+
+    def state(self, *ids):
+        return self.client.get(reverse('item_state'), {'ids': ','.join(map(str, ids))})
+
+    def test_state_is_the_viewers_own(self):
+        items = self.state(self.item.id, self.sold.id, self.item.id).json()['items']
+        self.assertEqual(items[str(self.item.id)], {
+            'is_seller': False, 'can_buy': True, 'in_cart': True, 'purchased': False,
+        })
+        self.assertEqual(items[str(self.sold.id)], {
+            'is_seller': False, 'can_buy': False, 'in_cart': False, 'purchased': True,
+        })
+        self.client.force_login(self.seller)
+        self.assertTrue(self.state(self.item.id).json()['items'][str(self.item.id)]['is_seller'])
+
+    def test_items_held_by_someone_else(self):
+        reservations.reserve([self.item.id], self.buyer)
+        self.client.force_login(make_user('other'))
+        self.assertFalse(self.state(self.item.id).json()['items'][str(self.item.id)]['can_buy'])
+
+    def test_anonymous_and_invalid_requests(self):
+        self.client.logout()
+        self.assertEqual(self.state(self.item.id).json(), {'authenticated': False, 'items': {}})
+        self.assertEqual(self.client.get(reverse('item_state'), {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.state(*range(1, 102)).status_code, 400)
+
+    def test_public_page_is_shared_between_viewers(self):
+        url = reverse('item_detail', args=[self.item.id])
+        self.assertContains(self.client.get(url), 'Denim jacket')
+        self.client.force_login(self.seller)
+        # The rendered listing comes from the shared fragment
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Denim jacket')
+        self.assertFalse([query for query in queries if 'store_item' in query['sql']])
@@ -0,0 +1,87 @@
+import os
+import time
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+
+from store import media_storage
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class ContentAddressedStorageTests(StoreTestCase):
+    def save(self, data, name='items/photo.JPG'):
+        return default_storage.save(name, ContentFile(data))
+
+    def age(self, name, hours):
+        then = time.time() - hours * 3600
+        os.utime(default_storage.path(name), (then, then))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.save(b'same bytes')
+        second = self.save(b'same bytes', 'items/other-name.jpg')
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^items/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertNotEqual(self.save(b'other bytes'), first)
+        directory = os.path.dirname(default_storage.path(first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_gc_keeps_referenced_and_recent_files(self):
+        seller = make_user('seller')
+        kept = self.save(b'listed photo')
+        make_item(seller, image=kept)
+        orphan = self.save(b'replaced photo')
+        recent = self.save(b'upload in progress')
+        for name in (kept, orphan):
+            self.age(name, 48)
+
+        out = StringIO()
+        call_command('gc_media', '--dry-run', stdout=out)
+        self.assertIn('Would remove 1 orphaned files', out.getvalue())
+        self.assertTrue(default_storage.exists(orphan))
+
+        self.assertEqual(media_storage.collect_garbage()[0], 1)
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(kept))
+        self.assertTrue(default_storage.exists(recent))
+
+    def test_dedup_hit_restarts_the_grace_period(self):
+        name = self.save(b'relisted photo')
+        self.age(name, 48)
+        self.save(b'relisted photo')
+        self.assertEqual(media_storage.collect_garbage()[0], 0)
+
+
+class ServeMediaTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.name = default_storage.save('items/photo.jpg', ContentFile(b'0123456789'))
+        self.url = f'/media/{self.name}'
+
+    def test_hashed_files_are_immutable_and_revalidate(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(b''.join(self.client.get(self.url, HTTP_RANGE='bytes=-3').streaming_content), b'789')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-').status_code, 416)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_offload_to_the_web_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_escaping_paths(self):
+        self.assertEqual(self.client.get('/media/items/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
@@ -0,0 +1,51 @@
+import os
+
+from django.test import override_settings
+from django.urls import reverse
+
+from store import metrics
+
+from .utils import StoreTestCase, make_user
+
+
+class MetricsEndpointTests(StoreTestCase):
+    def test_anonymous_requests_are_refused(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(b'latagan_', response.content)
+
+    def test_staff_can_read_metrics(self):
+        self.client.force_login(make_user('staff', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE latagan_http_request_duration_seconds histogram', response.content)
+
+    def test_other_users_are_refused(self):
+        self.client.force_login(make_user('buyer'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_bearer_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=('10.0.0.5',))
+    def test_allowlisted_address(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.6').status_code, 403)
+
+
+class CollectTests(StoreTestCase):
+    def test_dead_worker_samples_are_counted_once(self):
+        directory = metrics.get_metrics_dir()
+        os.makedirs(directory)
+        key = ('latagan_orders_created_total', (('source', 'checkout'),))
+        metrics._write_samples(metrics._process_path(directory, 999999), {key: 3.0})
+        before = metrics.collect()[key]
+
+        metrics.mark_process_dead(999999)
+
+        self.assertFalse(os.path.exists(metrics._process_path(directory, 999999)))
+        self.assertEqual(metrics.collect()[key], before)
@@ -0,0 +1,75 @@
+import time
+
+from django.test import RequestFactory
+from django.urls import reverse
+
+from store import metrics, page_cache
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class PageCacheTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.item = make_item(self.seller, title='Denim jacket')
+        self.url = reverse('item_list')
+
+    def get(self, url=None, **params):
+        return self.client.get(url or self.url, params).get('X-Page-Cache')
+
+    def purge(self, *tags):
+        with self.captureOnCommitCallbacks(execute=True):
+            page_cache.purge(*tags)
+
+    def test_second_anonymous_request_is_a_hit(self):
+        self.assertEqual(self.get(), 'miss')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(), 'hit')
+
+    def test_hits_are_recorded_under_their_view(self):
+        labels = (('view', 'item_list'), ('method', 'GET'), ('status', '200'))
+        key = ('latagan_http_request_duration_seconds_count', labels)
+        self.get()
+        before = metrics._samples.get(key, 0)
+        self.assertEqual(self.get(), 'hit')
+        self.assertEqual(metrics._samples.get(key, 0), before + 1)
+
+    def test_key_ignores_tracking_parameters_and_order(self):
+        self.assertEqual(self.get(q='denim', sort='trending'), 'miss')
+        self.assertEqual(self.get(sort='trending', utm_source='mail', q='denim'), 'hit')
+        self.assertEqual(self.get(q='boots'), 'miss')
+
+    def test_changes_purge_dependent_pages_after_commit(self):
+        detail = reverse('item_detail', args=[self.item.id])
+        self.get()
+        self.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.title = 'Cropped denim jacket'
+            self.item.save()
+            # Nothing changes until the transaction commits
+            self.assertEqual(self.get(), 'hit')
+        self.assertEqual(self.get(detail), 'miss')
+        self.assertContains(self.client.get(self.url), 'Cropped denim jacket')
+
+    def test_stale_copy_is_served_while_another_request_re_renders(self):
+        self.get()
+        self.purge('items')
+        # Another worker already holds the re-render lock
+        key = page_cache.page_key(RequestFactory().get(self.url))
+        page_cache.get_cache().add(page_cache.LOCK_PREFIX + key, 1)
+        self.assertEqual(self.get(), 'stale')
+
+    def test_logged_in_visitors_bypass_the_cache(self):
+        self.get()
+        self.client.force_login(self.seller)
+        self.assertIsNone(self.get())
+
+    def test_fragments_are_invalidated_by_their_tags(self):
+        started_ns = time.time_ns()
+        self.assertTrue(page_cache.set_fragment('card', '<li>', ['item:1'], started_ns, 60))
+        self.assertEqual(page_cache.get_fragment('card'), '<li>')
+        self.purge('item:1')
+        self.assertIsNone(page_cache.get_fragment('card'))
+        # Rendered before the purge: not stored
+        self.assertFalse(page_cache.set_fragment('card', '<li>', ['item:1'], started_ns, 60))
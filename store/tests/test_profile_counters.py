@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from store import bulk, profile_counters
+from store.models import UserProfile
+from store.purge import soft_delete_user
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class ProfileCounterTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.listed = self.list_item('Listed')
+        self.sold = self.list_item('Sold')
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('buy_item', args=[self.sold.id]))
+        self.client.post(reverse('add_review', args=[self.sold.id]), {'rating': 4, 'comment': 'Good'})
+        self.client.force_login(self.seller)
+
+    def list_item(self, title):
+        item = make_item(self.seller, title=title)
+        profile_counters.adjust(self.seller.id, active_listings=1)
+        return item
+
+    def stored(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return {field: getattr(profile, field) for field in profile_counters.COUNTER_FIELDS}
+
+    def assertCountersMatchRecount(self, users=None):
+        users = users or (self.seller, self.buyer)
+        actual = profile_counters.compute([user.id for user in users])
+        for user in users:
+            self.assertEqual(self.stored(user), actual[user.id], user.username)
+
+    def test_write_sites_keep_counters_in_step(self):
+        self.assertEqual(self.stored(self.seller)['items_sold'], 1)
+        self.assertEqual(self.stored(self.buyer)['purchases'], 1)
+        self.assertEqual(self.stored(self.buyer)['review_rating_total'], 4)
+        self.assertCountersMatchRecount()
+
+    def test_deleting_a_sold_item_then_purging_it(self):
+        self.client.get(reverse('delete_item', args=[self.sold.id]))
+        self.assertEqual(self.stored(self.seller)['items_sold'], 0)
+        self.assertCountersMatchRecount()
+
+        call_command('purge_deleted', '--sleep', '0', stdout=StringIO())
+        # The order and the review went with the item
+        self.assertEqual(self.stored(self.buyer)['purchases'], 0)
+        self.assertEqual(self.stored(self.buyer)['reviews_written'], 0)
+        self.assertCountersMatchRecount()
+
+    def test_bulk_delete(self):
+        bulk.apply(self.seller, [self.listed.id, self.sold.id], 'delete', {})
+        self.assertEqual(self.stored(self.seller)['active_listings'], 0)
+        self.assertCountersMatchRecount()
+
+    def test_deleting_an_account_then_purging_it(self):
+        soft_delete_user(self.seller)
+        self.assertCountersMatchRecount()
+
+        call_command('purge_deleted', '--sleep', '0', stdout=StringIO())
+        self.assertEqual(self.stored(self.buyer), dict.fromkeys(profile_counters.COUNTER_FIELDS, 0))
+        self.assertCountersMatchRecount([self.buyer])
+
+    def test_repair_command_fixes_drift(self):
+        UserProfile.objects.filter(user=self.seller).update(active_listings=50)
+        out = StringIO()
+        call_command('repair_profile_counters', stdout=out)
+        self.assertIn('active_listings 50 -> 1', out.getvalue())
+        self.assertCountersMatchRecount()
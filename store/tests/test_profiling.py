@@ -0,0 +1,53 @@
+import os
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+from store.profiling import load_summaries, prune
+
+from .utils import StoreTestCase, make_user
+
+
+class ProfilingTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = make_user('staff', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_staff_can_profile_a_request(self):
+        response = self.client.get(reverse('dashboard'), {'_profile': 1})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        for suffix in ('.pstats', '.folded', '.json'):
+            self.assertTrue(os.path.exists(os.path.join(settings.PROFILING_DIR, profile_id + suffix)))
+        summary, = load_summaries()
+        self.assertEqual(summary['view'], 'dashboard')
+        self.assertGreater(summary['sql_queries'], 0)
+
+    def test_other_users_are_not_profiled(self):
+        self.client.force_login(make_user('buyer'))
+        response = self.client.get(reverse('dashboard'), {'_profile': 1})
+        self.assertNotIn('X-Profile-Id', response)
+
+    @override_settings(PROFILING_MAX_PROFILES=2)
+    def test_saving_deletes_the_oldest_profiles(self):
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory)
+        for basename in ('20200101-000000-home-5ms-1', '20200102-000000-home-5ms-1'):
+            for suffix in ('.pstats', '.folded', '.json'):
+                open(os.path.join(directory, basename + suffix), 'w').close()
+
+        response = self.client.get(reverse('dashboard'), {'_profile': 1})
+
+        kept = {os.path.splitext(filename)[0] for filename in os.listdir(directory)}
+        self.assertEqual(kept, {'20200102-000000-home-5ms-1', response['X-Profile-Id']})
+        self.assertEqual(len(os.listdir(directory)), 6)
+
+    def test_prune_leaves_other_files_alone(self):
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory)
+        for filename in ('20200101-000000-a-1ms-1.json', '20200102-000000-b-1ms-1.json', 'notes.txt'):
+            open(os.path.join(directory, filename), 'w').close()
+        self.assertEqual(prune(directory, 1), 1)
+        self.assertEqual(sorted(os.listdir(directory)), ['20200102-000000-b-1ms-1.json', 'notes.txt'])
@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+
+from store.models import Cart, CartItem, Item, Message, PurgeTask, Review
+from store.purge import soft_delete_user
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class SoftDeleteTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.item = make_item(self.seller)
+        cart = Cart.objects.create(user=self.buyer)
+        CartItem.objects.create(cart=cart, item=self.item)
+        for n in range(3):
+            Message.objects.create(item=self.item, sender=self.buyer, recipient=self.seller, content=f'Hi {n}')
+
+    def test_deleting_hides_the_item_and_queues_a_purge(self):
+        self.client.force_login(self.seller)
+        self.client.get(reverse('delete_item', args=[self.item.id]))
+
+        self.assertFalse(Item.objects.filter(id=self.item.id).exists())
+        self.assertTrue(Item.all_objects.filter(id=self.item.id).exists())
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(PurgeTask.objects.get().object_id, self.item.id)
+        self.assertEqual(self.client.get(reverse('item_detail', args=[self.item.id])).status_code, 404)
+
+    def test_purge_removes_the_item_and_its_dependents_in_batches(self):
+        self.client.force_login(self.seller)
+        self.client.get(reverse('delete_item', args=[self.item.id]))
+
+        call_command('purge_deleted', '--batch-size', '2', '--sleep', '0', stdout=StringIO())
+
+        task = PurgeTask.objects.get()
+        self.assertEqual(task.status, 'done')
+        self.assertEqual(task.rows_deleted, 4)
+        self.assertFalse(Item.all_objects.filter(id=self.item.id).exists())
+        self.assertFalse(Message.objects.exists())
+
+    def test_purging_an_account_removes_everything_it_owns(self):
+        Review.objects.create(item=make_item(self.buyer, title='Hat'), author=self.seller, rating=5, comment='Nice')
+        soft_delete_user(self.seller)
+
+        call_command('purge_deleted', '--sleep', '0', stdout=StringIO())
+
+        self.assertFalse(User.objects.filter(id=self.seller.id).exists())
+        self.assertFalse(Item.all_objects.filter(seller_id=self.seller.id).exists())
+        self.assertFalse(Review.objects.exists())
+        self.assertTrue(Item.objects.filter(seller=self.buyer).exists())
@@ -0,0 +1,34 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase
+
+from store.querylog import SlowQueryLogger, fingerprint, normalize_sql, read_log
+
+from .utils import StoreTestCase, make_user
+
+
+class NormalizeSqlTests(SimpleTestCase):
+    def test_literals_and_in_lists_share_a_fingerprint(self):
+        first = normalize_sql("SELECT * FROM store_item WHERE id IN (%s, %s) AND title = 'a' LIMIT 21")
+        second = normalize_sql("SELECT * FROM store_item WHERE id IN (%s, %s, %s)  AND title = 'b''c' LIMIT 5")
+        self.assertEqual(first, 'SELECT * FROM store_item WHERE id IN (...) AND title = ? LIMIT ?')
+        self.assertEqual(fingerprint(first), fingerprint(second))
+
+
+class SlowQueryLogTests(StoreTestCase):
+    def test_slow_queries_are_logged_with_their_caller(self):
+        make_user('seller')
+        logger = SlowQueryLogger('default')
+        logger.threshold = 0
+        with connection.execute_wrapper(logger):
+            list(connection.cursor().execute('SELECT username FROM auth_user WHERE id = 1'))
+
+        entry, = read_log()
+        self.assertEqual(entry['sql'], 'SELECT username FROM auth_user WHERE id = ?')
+        self.assertTrue(any('test_querylog.py' in frame for frame in entry['stack']))
+
+        out = StringIO()
+        call_command('slow_queries', stdout=out)
+        self.assertIn(entry['fingerprint'], out.getvalue())
@@ -0,0 +1,67 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from store import recommendations
+from store.models import RollupWatermark, SimilarItem
+
+from .utils import StoreTestCase, make_item, make_user
+
+TITLES = [
+    'Red leather boots', 'Blue denim jacket', 'Wool winter scarf', 'Oak coffee table', 'Vintage film camera',
+    'Ceramic tea set', 'Mountain bike helmet', 'Paperback crime novel', 'Silver hoop earrings', 'Yoga mat',
+    'Cast iron skillet', 'Acoustic guitar strings',
+]
+
+
+class SimilarItemsTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.items = [make_item(self.seller, title=title, description=title) for title in TITLES]
+
+    def neighbours(self):
+        lists = {}
+        for item_id, neighbour_id, score in SimilarItem.objects.order_by('rank').values_list(
+                'item_id', 'neighbour_id', 'score'):
+            lists.setdefault(item_id, []).append((neighbour_id, score))
+        return lists
+
+    def test_build_links_listings_that_share_words(self):
+        boots = make_item(self.seller, title='Brown leather boots', description='Hardly worn boots')
+        call_command('build_similar_items', '--full', stdout=StringIO())
+        self.assertEqual(self.neighbours()[boots.id][0][0], self.items[0].id)
+        self.assertNotIn(self.items[3].id, [n for n, _ in self.neighbours()[boots.id]])
+
+    def test_refresh_scores_new_listings_in_batches(self):
+        recommendations.build()
+        saved = list(SimilarItem.objects.values_list('item_id', 'neighbour_id', 'rank', 'score'))
+        watermark = RollupWatermark.objects.get(name=recommendations.WATERMARK_NAME).last_item_id
+        new = [
+            make_item(self.seller, title='Black leather boots', description='Leather boots'),
+            make_item(self.seller, title='Denim jacket, cropped', description='Denim'),
+            make_item(self.seller, title='Cast iron pan', description='Skillet'),
+        ]
+
+        similarity = recommendations.similarity
+        with mock.patch.object(recommendations, 'similarity', side_effect=similarity) as scored:
+            self.assertEqual(recommendations.refresh(batch_size=2), 3)
+        self.assertEqual([len(call.args[3]) for call in scored.call_args_list], [2, 1])
+        batched = self.neighbours()
+        self.assertIn(new[0].id, [n for n, _ in batched[self.items[0].id]])
+        self.assertEqual(batched[new[1].id][0][0], self.items[1].id)
+
+        # Same result as scoring every new listing at once
+        SimilarItem.objects.all().delete()
+        SimilarItem.objects.bulk_create([
+            SimilarItem(item_id=item_id, neighbour_id=neighbour_id, rank=rank, score=score)
+            for item_id, neighbour_id, rank, score in saved
+        ])
+        RollupWatermark.objects.filter(name=recommendations.WATERMARK_NAME).update(last_item_id=watermark)
+        recommendations.refresh(batch_size=500)
+        self.assertEqual(self.neighbours(), batched)
+
+    def test_refresh_without_a_watermark_builds_everything(self):
+        self.assertEqual(recommendations.refresh(), len(TITLES))
+        self.assertEqual(recommendations.refresh(), 0)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.urls import reverse
+from django.utils import timezone
+
+from store import reservations
+from store.models import Cart, CartItem, Item, Order, UserProfile
+
+from .utils import StoreTestCase, make_item, make_user
+
+
+class ReservationTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.rival = make_user('rival')
+        self.item = make_item(self.seller)
+
+    def test_only_one_buyer_gets_the_hold(self):
+        self.assertEqual(reservations.reserve([self.item.id], self.buyer), 1)
+        self.assertEqual(reservations.reserve([self.item.id], self.rival), 0)
+        Item.objects.filter(id=self.item.id).update(reserved_until=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(reservations.reserve([self.item.id], self.rival), 1)
+
+    def test_adding_to_the_cart_holds_the_item(self):
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('add_to_cart', args=[self.item.id]))
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.status, self.item.reserved_by), ('reserved', self.buyer))
+
+    def test_opening_the_purchase_page_does_not_hold_the_item(self):
+        self.client.force_login(self.buyer)
+        response = self.client.get(reverse('buy_item', args=[self.item.id]))
+        self.assertEqual(response.status_code, 200)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'available')
+
+    def test_buying_an_item(self):
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('buy_item', args=[self.item.id]))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'sold')
+        self.assertEqual(Order.objects.get().buyer, self.buyer)
+
+    def test_cannot_buy_an_item_someone_else_holds(self):
+        reservations.reserve([self.item.id], self.rival)
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('buy_item', args=[self.item.id]))
+        self.assertFalse(Order.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.reserved_by, self.rival)
+
+
+class CheckoutTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.items = [make_item(seller, title=f'Item {n}') for n in range(2)]
+        cart = Cart.objects.create(user=self.buyer)
+        for item in self.items:
+            CartItem.objects.create(cart=cart, item=item)
+        self.client.force_login(self.buyer)
+
+    def test_checkout_sells_everything_held(self):
+        self.client.post(reverse('checkout'))
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Item.objects.filter(status='sold').count(), 2)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(UserProfile.objects.get(user=self.buyer).purchases, 2)
+
+    def test_viewing_checkout_does_not_place_holds(self):
+        self.client.get(reverse('checkout'))
+        self.assertEqual(Item.objects.filter(status='available').count(), 2)
+
+    def test_a_hold_lost_during_checkout_rolls_everything_back(self):
+        taken = self.items[1]
+
+        def held_by(item_ids, user):
+            # Another buyer's checkout sells the item right after this one checked its holds
+            held = {item.id for item in self.items}
+            Item.objects.filter(id=taken.id).update(status='sold', reserved_by=None, reserved_until=None)
+            return held
+
+        with mock.patch.object(reservations, 'held_by', side_effect=held_by):
+            response = self.client.post(reverse('checkout'))
+
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+        self.assertEqual(Item.objects.get(id=self.items[0].id).status, 'reserved')
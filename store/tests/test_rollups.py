@@ -0,0 +1,48 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from store import rollups
+from store.models import CategoryDailyRollup, Item, Order, SellerDailyRollup
+
+from .utils import StoreTestCase, make_category, make_item, make_user
+
+
+class RollupTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.buyer = make_user('buyer')
+        self.category = make_category()
+        self.day = timezone.localdate()
+
+    def sell(self, price):
+        item = make_item(self.seller, price=price, status='sold', category=self.category)
+        Item.objects.filter(id=item.id).update(created_at=timezone.now() - timedelta(days=2))
+        return Order.objects.create(item=item, buyer=self.buyer, total_price=item.price)
+
+    def test_orders_and_listings_are_rolled_up_per_day(self):
+        self.sell('10.00')
+        self.sell('30.00')
+        make_item(self.seller, category=self.category)
+
+        self.assertIn(self.day, rollups.run())
+
+        seller_row = SellerDailyRollup.objects.get(seller=self.seller, day=self.day)
+        self.assertEqual(seller_row.orders, 2)
+        self.assertEqual(seller_row.revenue, Decimal('40.00'))
+        self.assertEqual(seller_row.items_sold, 2)
+        self.assertEqual(seller_row.listings_created, 1)
+        self.assertAlmostEqual(seller_row.median_days_to_sell, 2, places=2)
+        self.assertEqual(CategoryDailyRollup.objects.get(category=self.category, day=self.day).orders, 2)
+
+    def test_runs_only_rebuild_days_with_new_rows(self):
+        self.sell('10.00')
+        rollups.run()
+        self.assertEqual(rollups.run(), [])
+
+        self.sell('5.00')
+        # The day of the order and the day the listing was created
+        self.assertEqual(rollups.run(), [self.day - timedelta(days=2), self.day])
+        self.assertEqual(SellerDailyRollup.objects.get(seller=self.seller, day=self.day).revenue, Decimal('15.00'))
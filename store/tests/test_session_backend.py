@@ -0,0 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from store.session_backend import SessionStore
+
+from .utils import StoreTestCase, make_user
+
+
+class SessionBackendTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('shopper')
+
+    def test_login_is_written_to_the_database(self):
+        self.assertTrue(self.client.login(username='shopper', password='secret-pass-123'))
+        key = self.client.session.session_key
+        self.assertEqual(SessionStore(key).load()['_auth_user_id'], str(self.user.pk))
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+
+    def test_other_changes_only_touch_the_cache(self):
+        session = SessionStore()
+        session['_auth_user_id'] = str(self.user.pk)
+        session.save()
+        stored = Session.objects.get(session_key=session.session_key).session_data
+
+        session = SessionStore(session.session_key)
+        session['recently_viewed'] = [1, 2]
+        with self.assertNumQueries(0):
+            session.save()
+        self.assertEqual(Session.objects.get(session_key=session.session_key).session_data, stored)
+        self.assertEqual(SessionStore(session.session_key).load()['recently_viewed'], [1, 2])
+
+    def test_unchanged_session_is_not_saved(self):
+        session = SessionStore()
+        session['cart'] = 1
+        session.save()
+        session = SessionStore(session.session_key)
+        session['cart'] = 1
+        session.modified = True
+        with mock.patch.object(session._cache, 'set') as cache_set, self.assertNumQueries(0):
+            session.save()
+        cache_set.assert_not_called()
+
+    def test_login_survives_cache_eviction(self):
+        self.client.login(username='shopper', password='secret-pass-123')
+        caches['default'].clear()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_deletes_the_session_everywhere(self):
+        self.client.login(username='shopper', password='secret-pass-123')
+        key = self.client.session.session_key
+        self.client.get(reverse('logout'))
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertFalse(SessionStore().exists(key))
+
+    def test_purge_sessions_removes_expired_rows(self):
+        session = SessionStore()
+        session['_auth_user_id'] = str(self.user.pk)
+        session.save()
+        Session.objects.filter(session_key=session.session_key).update(
+            expire_date=timezone.now() - timedelta(days=1),
+        )
+        out = StringIO()
+        call_command('purge_sessions', '--sleep', '0', stdout=out)
+        self.assertIn('purged 1 expired', out.getvalue())
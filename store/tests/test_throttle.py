@@ -0,0 +1,56 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from store import throttle
+
+from .utils import StoreTestCase, make_user
+
+
+class ClientKeyTests(StoreTestCase):
+    def key(self, forwarded=None, remote_addr='10.0.0.1'):
+        request = RequestFactory().get('/', REMOTE_ADDR=remote_addr)
+        if forwarded is not None:
+            request.META['HTTP_X_FORWARDED_FOR'] = forwarded
+        request.user = AnonymousUser()
+        return throttle.client(request)
+
+    def test_remote_addr_without_trusted_proxies(self):
+        self.assertEqual(self.key('203.0.113.9'), 'ip:10.0.0.1')
+
+    @override_settings(THROTTLE_TRUSTED_PROXY_HOPS=1)
+    def test_address_appended_by_the_proxy(self):
+        self.assertEqual(self.key('203.0.113.9'), 'ip:203.0.113.9')
+        # The client can put anything on the left; only our proxy's entry counts
+        self.assertEqual(self.key('1.2.3.4, 203.0.113.9'), 'ip:203.0.113.9')
+        self.assertEqual(self.key(), 'ip:10.0.0.1')
+
+    @override_settings(THROTTLE_TRUSTED_PROXY_HOPS=2)
+    def test_address_behind_two_proxies(self):
+        self.assertEqual(self.key('1.2.3.4, 203.0.113.9, 198.51.100.7'), 'ip:203.0.113.9')
+        self.assertEqual(self.key('198.51.100.7'), 'ip:10.0.0.1')
+
+    def test_logged_in_users_are_keyed_by_user(self):
+        user = make_user('shopper')
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        request.user = user
+        self.assertEqual(throttle.client(request), f'user:{user.pk}')
+
+
+@override_settings(THROTTLE_TRUSTED_PROXY_HOPS=1, THROTTLE_RATES={'login': (1, 2)})
+class RateLimitTests(StoreTestCase):
+    def login_page(self, forwarded):
+        return self.client.get(reverse('login'), HTTP_X_FORWARDED_FOR=forwarded)
+
+    def test_burst_then_429(self):
+        self.assertEqual(self.login_page('203.0.113.9').status_code, 200)
+        self.assertEqual(self.login_page('203.0.113.9').status_code, 200)
+        response = self.login_page('203.0.113.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_bucket(self):
+        for n in range(2):
+            self.login_page(f'192.0.2.{n}, 203.0.113.9')
+        self.assertEqual(self.login_page('192.0.2.99, 203.0.113.9').status_code, 429)
+        self.assertEqual(self.login_page('198.51.100.7').status_code, 200)
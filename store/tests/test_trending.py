@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils import timezone
+
+from store import trending
+from store.models import Item, ItemTrend
+
+from .utils import StoreTestCase, make_category, make_item, make_user
+
+
+class TrendingTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        self.shoes = make_category('Shoes')
+        self.quiet = make_item(self.seller, title='Quiet')
+        self.warm = make_item(self.seller, title='Warm', category=self.shoes)
+        self.hot = make_item(self.seller, title='Hot', category=self.shoes)
+        trending.apply({self.warm.id: {'views': 3}, self.hot.id: {'cart_adds': 2}})
+
+    def test_scores_decay_by_half_each_half_life(self):
+        now = timezone.now()
+        trending.apply({self.quiet.id: {'views': 8}}, now)
+        log_score = ItemTrend.objects.get(item=self.quiet).log_score
+        self.assertAlmostEqual(trending.current_score(log_score, now), 8)
+        self.assertAlmostEqual(trending.current_score(log_score, now + timedelta(hours=24)), 4)
+
+    def test_sort_orders_in_sql_and_stays_lazy(self):
+        items = trending.sort(Item.objects.available().order_by('title'))
+        self.assertIsInstance(items, QuerySet)
+        self.assertEqual(list(items), [self.hot, self.warm, self.quiet])
+        self.assertEqual(list(items[1:]), [self.warm, self.quiet])
+        self.assertEqual(trending.top_ids(self.shoes.id), [self.hot.id, self.warm.id])
+
+    def test_items_without_a_trend_keep_their_own_order(self):
+        other = make_item(self.seller, title='Another quiet one')
+        items = trending.sort(Item.objects.available().order_by('title'))
+        self.assertEqual(list(items), [self.hot, self.warm, other, self.quiet])
+        # Default model ordering (newest first) when the queryset has none of its own
+        self.assertEqual(list(trending.sort(Item.objects.available()))[2:], [other, self.quiet])
+
+    def test_prune_drops_listings_no_longer_for_sale(self):
+        Item.objects.filter(id=self.hot.id).update(status='sold')
+        self.assertEqual(trending.prune(), 1)
+        self.assertEqual(trending.top_ids(), [self.warm.id])
+
+    def test_browse_pages_sort_by_trending(self):
+        response = self.client.get(reverse('item_list'), {'sort': 'trending'})
+        self.assertEqual(list(response.context['items'])[:2], [self.hot, self.warm])
+        response = self.client.get(reverse('category_items', args=[self.shoes.id]), {'sort': 'trending'})
+        self.assertEqual(list(response.context['items']), [self.hot, self.warm])
@@ -0,0 +1,101 @@
+import io
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from store import uploads
+from store.models import Item, UserProfile
+
+from .utils import StoreTestCase, image_bytes, image_upload, make_category, make_user
+
+
+def normalized(data, name='photo.jpg'):
+    request = RequestFactory().post('/', {'image': SimpleUploadedFile(name, data)})
+    return uploads.clean_image(request, 'image')
+
+
+class NormalizeTests(StoreTestCase):
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_photos_are_rotated_shrunk_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x010F] = 'Camera maker'
+        result = normalized(image_bytes(size=(400, 200), exif=exif.tobytes()))
+        self.assertEqual(result.name, 'photo.jpg')
+        with Image.open(io.BytesIO(result.read())) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (50, 100)))
+            self.assertFalse(image.getexif())
+
+    def test_transparency_is_kept_as_png(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (20, 20), (0, 0, 0, 0)).save(buffer, 'PNG')
+        result = normalized(buffer.getvalue(), 'logo.png')
+        self.assertEqual(result.name, 'photo.png')
+
+    def test_same_photo_normalizes_to_the_same_bytes(self):
+        data = image_bytes(size=(300, 200))
+        self.assertEqual(normalized(data).read(), normalized(data).read())
+
+    def test_slow_decode_is_rejected(self):
+        future = mock.Mock()
+        future.result.side_effect = FutureTimeoutError
+        with mock.patch.object(uploads, '_get_pool') as pool:
+            pool.return_value.submit.return_value = future
+            with self.assertRaisesMessage(uploads.ImageRejected, 'took too long'):
+                normalized(image_bytes())
+        self.assertEqual(future.result.call_args.kwargs['timeout'], settings.IMAGE_PROCESS_TIMEOUT)
+
+
+class RejectedUploadTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = make_user('seller')
+        UserProfile.objects.filter(user=self.seller).update(credits=100)
+        self.category = make_category()
+        self.client.force_login(self.seller)
+
+    def sell(self, upload):
+        response = self.client.post(reverse('sell_item'), {
+            'title': 'Boots', 'description': 'Worn twice', 'price': '30.00',
+            'category': self.category.id, 'condition': 'good', 'image': upload,
+        })
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def assertNothingWritten(self):
+        self.assertFalse(Item.objects.exists())
+        self.assertEqual(UserProfile.objects.get(user=self.seller).credits, 100)
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'items')))
+
+    def test_not_an_image(self):
+        messages = self.sell(SimpleUploadedFile('photo.jpg', b'not really a jpeg'))
+        self.assertIn('The file is not an image we can read. Please upload a JPEG, PNG or WebP photo.', messages)
+        self.assertNothingWritten()
+
+    def test_unsupported_format(self):
+        messages = self.sell(image_upload('photo.bmp', image_format='BMP'))
+        self.assertIn('BMP images are not supported. Please upload a JPEG, PNG or WebP photo.', messages)
+        self.assertNothingWritten()
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_too_many_pixels(self):
+        self.assertIn('The image resolution is too high. Please upload a smaller photo.',
+                      self.sell(image_upload(size=(100, 100))))
+        self.assertNothingWritten()
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_too_large_while_streaming(self):
+        self.assertIn('The image is larger than 1 KB.', self.sell(image_upload(size=(400, 400), quality=100)))
+        self.assertNothingWritten()
+
+    def test_accepted_upload_is_stored_normalized(self):
+        self.sell(image_upload(size=(2400, 1200)))
+        item = Item.objects.get()
+        with Image.open(item.image.path) as image:
+            self.assertEqual(image.size, (1600, 800))
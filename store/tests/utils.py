@@ -0,0 +1,86 @@
+"""Shared fixtures for the store tests"""
+
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from store import engagement, throttle
+from store.models import Category, Item, UserProfile
+
+
+class StoreTestCase(TestCase):
+    """
+    TestCase whose cache, throttle buckets, media, metrics, profiles and
+    slow-query log live in a throwaway directory instead of the project's.
+    Engagement counters are only written when a test flushes them.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp(prefix='latagan-tests-')
+        cls._isolation = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'store.cache_backend.SQLiteCache',
+                    'LOCATION': f'{cls.temp_dir}/cache/cache.sqlite3',
+                },
+            },
+            THROTTLE_DB=f'{cls.temp_dir}/cache/throttle.sqlite3',
+            MEDIA_ROOT=f'{cls.temp_dir}/media',
+            METRICS_DIR=f'{cls.temp_dir}/metrics',
+            PROFILING_DIR=f'{cls.temp_dir}/profiles',
+            SLOW_QUERY_LOG=f'{cls.temp_dir}/logs/slow_queries.jsonl',
+            ENGAGEMENT_FLUSH_INTERVAL=None,
+        )
+        cls._isolation.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._isolation.disable()
+        throttle._buckets = None
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        throttle._buckets = None
+        engagement._pending.clear()
+        for name in ('media', 'metrics', 'profiles', 'logs'):
+            shutil.rmtree(f'{self.temp_dir}/{name}', ignore_errors=True)
+
+
+def make_user(username, password='secret-pass-123', **fields):
+    user = User.objects.create_user(username=username, password=password, **fields)
+    UserProfile.objects.create(user=user)
+    return user
+
+
+def make_category(name='Clothing'):
+    return Category.objects.get_or_create(name=name)[0]
+
+
+def make_item(seller, title='Denim jacket', price='10.00', **fields):
+    fields.setdefault('description', 'Lightly worn')
+    fields.setdefault('image', 'items/test.jpg')
+    if 'category' not in fields:
+        fields['category'] = make_category()
+    return Item.objects.create(seller=seller, title=title, price=Decimal(price), **fields)
+
+
+def image_bytes(size=(64, 48), color=(200, 30, 30), image_format='JPEG', **save_options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format, **save_options)
+    return buffer.getvalue()
+
+
+def image_upload(name='photo.jpg', **options):
+    return SimpleUploadedFile(name, image_bytes(**options), content_type='image/jpeg')
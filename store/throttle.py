@@ -0,0 +1,250 @@
+"""
+Rate limiting and load shedding for the expensive endpoints.
+
+Rate limiting: every (route, client) pair has a token bucket that holds up to
+`burst` tokens and refills at `per_minute` tokens a minute (THROTTLE_RATES).
+A request takes a token or is answered 429 with Retry-After set to when the
+next one arrives. The client is the logged-in user, or the client IP for
+anonymous requests, read from X-Forwarded-For behind THROTTLE_TRUSTED_PROXY_HOPS
+reverse proxies. The route is the URL name, except that a browse request
+with ?q= is 'search'. Buckets live in one SQLite file shared by every worker
+on the host (THROTTLE_DB). Taking a token is a single upsert that only
+succeeds when the tokens are there, so concurrent workers can't overspend a
+bucket.
+
+Load shedding: each worker process keeps its number of in-flight requests in
+its own slot of a shared-memory array, allocated in the gunicorn master
+before it forks (preload_app). Requests for anything but
+THROTTLE_CRITICAL_ROUTES get an immediate 503 with Retry-After when either:
+    - the host total reaches THROTTLE_SHED_IN_FLIGHT, or
+    - the request waited longer than THROTTLE_SHED_QUEUE_MS in front of
+      the application, per the proxy's X-Request-Start header.
+Checkout and the cart keep the remaining capacity. Once the host is past half
+of THROTTLE_SHED_IN_FLIGHT, rate-limited routes already cost two tokens a
+request.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from .cache_backend import connect
+
+# A bucket untouched for this long has refilled and can be forgotten
+IDLE_SECONDS = 3600
+PRUNE_INTERVAL = 1000
+# Worker processes that can report their in-flight requests
+MAX_WORKERS = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated);
+"""
+
+# Unqualified columns in DO UPDATE are the existing row's
+TAKE_SQL = """
+INSERT INTO buckets (key, tokens, updated) VALUES (:key, :burst - :cost, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:burst, tokens + (:now - updated) * :rate) - :cost,
+    updated = :now
+WHERE min(:burst, tokens + (:now - updated) * :rate) >= :cost
+"""
+
+
+class TokenBuckets:
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path, SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, per_minute, burst, cost=1):
+        """Take `cost` tokens from bucket `key`: 0 if taken, else seconds until they will be there"""
+        conn = self._connection()
+        now = time.time()
+        params = {'key': key, 'burst': burst, 'rate': per_minute / 60, 'cost': min(cost, burst), 'now': now}
+        if conn.execute(TAKE_SQL, params).rowcount == 1:
+            self._takes += 1
+            if self._takes % PRUNE_INTERVAL == 0:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - IDLE_SECONDS,))
+            return 0
+        tokens, updated = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+        available = min(burst, tokens + (now - updated) * params['rate'])
+        return (params['cost'] - available) / params['rate']
+
+
+_buckets = None
+
+
+def get_buckets():
+    global _buckets
+    if _buckets is None:
+        _buckets = TokenBuckets(getattr(settings, 'THROTTLE_DB', os.path.join(settings.BASE_DIR, 'throttle.sqlite3')))
+    return _buckets
+
+
+# In-flight requests across worker processes
+
+_pids = multiprocessing.RawArray('i', MAX_WORKERS)
+_counts = multiprocessing.RawArray('i', MAX_WORKERS)
+_claim_lock = multiprocessing.Lock()
+_slot = None
+_slot_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _slot, _slot_lock
+    _slot = None
+    _slot_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _claim_slot():
+    """This process's index in the shared arrays, or None if they are full"""
+    pid = os.getpid()
+    with _claim_lock:
+        for index in range(MAX_WORKERS):
+            if _pids[index] in (0, pid):
+                _pids[index] = pid
+                _counts[index] = 0
+                return index
+    return None
+
+
+def release_worker(pid):
+    """Free an exited worker's slot (gunicorn child_exit), dropping requests it never finished"""
+    with _claim_lock:
+        for index in range(MAX_WORKERS):
+            if _pids[index] == pid:
+                _pids[index] = 0
+                _counts[index] = 0
+
+
+@contextmanager
+def in_flight():
+    """Count the enclosed request as in flight on this host"""
+    global _slot
+    with _slot_lock:
+        if _slot is None:
+            _slot = _claim_slot()
+        slot = _slot
+        if slot is not None:
+            _counts[slot] += 1
+    try:
+        yield
+    finally:
+        if slot is not None:
+            with _slot_lock:
+                _counts[slot] -= 1
+
+
+def in_flight_total():
+    return sum(_counts)
+
+
+def queue_seconds(request):
+    """How long the request waited before reaching the application, from X-Request-Start"""
+    value = request.META.get('HTTP_X_REQUEST_START', '')
+    try:
+        started = float(value[2:] if value.startswith('t=') else value)
+    except ValueError:
+        return 0.0
+    # nginx sends seconds (t=1700000000.123); other proxies send milli- or microseconds
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, time.time() - started)
+
+
+def overload(request):
+    """Why the host should shed `request` ('in_flight' or 'queue'), or None"""
+    limit = getattr(settings, 'THROTTLE_SHED_IN_FLIGHT', 0)
+    if limit and in_flight_total() >= limit:
+        return 'in_flight'
+    queue_ms = getattr(settings, 'THROTTLE_SHED_QUEUE_MS', 0)
+    if queue_ms and queue_seconds(request) * 1000 > queue_ms:
+        return 'queue'
+    return None
+
+
+def busy():
+    """Whether the other requests in flight (not counting the caller's) pass half the shedding threshold"""
+    limit = getattr(settings, 'THROTTLE_SHED_IN_FLIGHT', 0)
+    return bool(limit) and (in_flight_total() - 1) * 2 >= limit
+
+
+# Request helpers
+
+def url_name(request):
+    try:
+        return resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+
+
+def route(request, name):
+    """The THROTTLE_RATES key of a request for URL name `name`"""
+    if name == 'item_list' and request.GET.get('q', '').strip():
+        return 'search'
+    return name
+
+
+def client_ip(request):
+    """The address of the client, as seen by the outermost of THROTTLE_TRUSTED_PROXY_HOPS proxies
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so only the last `hops` entries were written by our own
+    proxies; anything to their left came from the client and can be forged.
+    """
+    hops = getattr(settings, 'THROTTLE_TRUSTED_PROXY_HOPS', 0)
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    if hops <= 0:
+        return remote_addr
+    forwarded = [entry.strip() for entry in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+    if len(forwarded) < hops or not forwarded[-hops]:
+        # Not (fully) forwarded by our proxies, e.g. a direct request to the app server
+        return remote_addr
+    return forwarded[-hops]
+
+
+def client(request):
+    """The logged-in user, or the client IP for anonymous requests"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return 'ip:' + client_ip(request)
+
+
+def refused(status, retry_after, message):
+    response = HttpResponse(message, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def shed_retry_after():
+    """THROTTLE_SHED_RETRY_AFTER with jitter, so refused clients don't all come back at once"""
+    base = getattr(settings, 'THROTTLE_SHED_RETRY_AFTER', 5)
+    return base + random.uniform(0, base)
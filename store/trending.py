@@ -0,0 +1,138 @@
+"""
+Trending listings: exponentially time-decayed engagement scores.
+
+An event of weight w at time t is worth w * 2 ** (-(now - t) / half-life).
+Since every score decays by the same factor, each listing stores its score
+decayed *forward* to a fixed EPOCH instead, as a base-2 logarithm so it never
+overflows: log_score = log2(sum of w * 2 ** ((t - EPOCH) / half-life)).
+Adding an event never touches the other rows, ordering by log_score is the
+trending order at any moment, and the current value is only computed when
+someone reads it (current_score).
+
+Scores are updated from each engagement flush, in the same transaction; the
+top TOP_N ids overall and per category are then re-read from the
+(category, -log_score) index into TrendingList, so browse pages sort by
+loading a single row and ordering on its ids in SQL. refresh_trending drops listings that are no longer
+for sale or whose score has decayed away and rebuilds every list.
+"""
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from . import page_cache
+from .models import Category, Item, ItemTrend, TrendingList
+from .ranking import category_key
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+ALL = 'all'
+TOP_N = 100
+# Relative strength of each engagement counter (store.engagement.FIELDS)
+WEIGHTS = {
+    'views': 1.0,
+    'cart_adds': 4.0,
+    'chat_starts': 3.0,
+}
+# Listings whose current score has decayed below this are dropped by prune()
+MIN_SCORE = 0.05
+
+
+def _half_lives_since_epoch(moment):
+    hours = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24)
+    return (moment - EPOCH).total_seconds() / (hours * 3600)
+
+
+def _log2_add(a, b):
+    """log2(2**a + 2**b) without leaving log space"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_score(log_score, now=None):
+    """The decayed score as of `now`"""
+    return 2 ** (log_score - _half_lives_since_epoch(now or timezone.now()))
+
+
+def apply(deltas, now=None):
+    """Fold {item_id: {counter: amount}} engagement into the scores and refresh the affected lists"""
+    now = now or timezone.now()
+    offset = _half_lives_since_epoch(now)
+    gains = {}
+    for item_id, amounts in deltas.items():
+        weight = sum(WEIGHTS.get(field, 0) * amount for field, amount in amounts.items())
+        if weight > 0:
+            gains[item_id] = math.log2(weight) + offset
+    if not gains:
+        return
+
+    # Only listings still for sale start trending; existing rows are pruned separately
+    categories = dict(Item.objects.available().filter(id__in=gains).values_list('id', 'category_id'))
+    current = dict(ItemTrend.objects.filter(item_id__in=categories).values_list('item_id', 'log_score'))
+    trends = [
+        ItemTrend(
+            item_id=item_id,
+            category_id=category_id,
+            log_score=_log2_add(current[item_id], gains[item_id]) if item_id in current else gains[item_id],
+            updated_at=now,
+        )
+        for item_id, category_id in categories.items()
+    ]
+    with transaction.atomic():
+        ItemTrend.objects.bulk_create(
+            trends, batch_size=500, update_conflicts=True, unique_fields=['item'],
+            update_fields=['category', 'log_score', 'updated_at'],
+        )
+        refresh_lists(set(categories.values()) | {ALL})
+
+
+def refresh_lists(keys):
+    """Re-materialize the top TOP_N lists for category ids (None = uncategorized) and/or ALL"""
+    lists = []
+    for key in keys:
+        trends = ItemTrend.objects.all() if key == ALL else ItemTrend.objects.filter(category_id=key)
+        lists.append(TrendingList(
+            key=ALL if key == ALL else category_key(key),
+            item_ids=list(trends.order_by('-log_score').values_list('item_id', flat=True)[:TOP_N]),
+        ))
+    TrendingList.objects.bulk_create(
+        lists, update_conflicts=True, unique_fields=['key'], update_fields=['item_ids', 'updated_at'],
+    )
+    page_cache.purge('trending')
+
+
+def prune(now=None):
+    """Drop listings no longer for sale or decayed below MIN_SCORE, then rebuild every list"""
+    floor = math.log2(MIN_SCORE) + _half_lives_since_epoch(now or timezone.now())
+    with transaction.atomic():
+        removed, _ = ItemTrend.objects.filter(log_score__lt=floor).delete()
+        stale, _ = ItemTrend.objects.exclude(item__in=Item.objects.available()).delete()
+        TrendingList.objects.all().delete()
+        refresh_lists(set(Category.objects.values_list('id', flat=True)) | {None, ALL})
+    return removed + stale
+
+
+def top_ids(category_id=None):
+    """The materialized trending ids, overall or for one category"""
+    key = ALL if category_id is None else category_key(category_id)
+    return TrendingList.objects.filter(key=key).values_list('item_ids', flat=True).first() or []
+
+
+def sort(items, category_id=None):
+    """The `items` queryset with the trending ones first in trending order, the rest in their own order
+
+    Ordered in SQL by a CASE over the materialized ids, so the result is still
+    a lazy queryset that can be sliced or paginated.
+    """
+    ids = top_ids(category_id)
+    if not ids:
+        return items
+    rank = Case(
+        *(When(id=item_id, then=Value(position)) for position, item_id in enumerate(ids)),
+        default=Value(len(ids)), output_field=IntegerField(),
+    )
+    ordering = items.query.order_by or (items.model._meta.ordering if items.query.default_ordering else ())
+    return items.annotate(trending_rank=rank).order_by('trending_rank', *ordering)
@@ -0,0 +1,183 @@
+"""
+Image upload pipeline: size caps while streaming, cheap verification, and
+normalization in a bounded process pool.
+
+1. ImageUploadHandler (FILE_UPLOAD_HANDLERS) streams every uploaded file to
+   a temporary file on disk, never into memory. A file that grows past
+   IMAGE_UPLOAD_MAX_BYTES is dropped as soon as it does, and the rest of it
+   is read and discarded. A request whose declared size is far over the cap
+   is cut off at its first file, without reading the rest. Either way the field is marked as
+   rejected, and clean_image() reports why.
+2. clean_image() opens the file with Pillow, which only parses the header.
+   It checks the format against IMAGE_UPLOAD_FORMATS and the pixel count
+   against IMAGE_UPLOAD_MAX_PIXELS before anything is decoded.
+3. The full decode happens in a small process pool of
+   IMAGE_PROCESS_WORKERS processes per server process, each recycled after
+   IMAGE_PROCESS_MAX_TASKS images. JPEGs are decoded in draft mode at
+   close to the target size. The worker:
+       - applies the EXIF orientation,
+       - caps the longer side at IMAGE_MAX_SIDE,
+       - drops all metadata,
+       - re-encodes the image as JPEG, or as PNG if it has transparency.
+   The result is a ContentFile ready to assign to an ImageField.
+
+The pool keeps decoding out of the web worker's memory and takes a crashing
+decoder down with it, but it does not free the worker: the request waits for
+the result, for at most IMAGE_PROCESS_TIMEOUT seconds. That keeps a listing
+from ever pointing at an unprocessed photo (with its EXIF location still in
+it), at the cost of a worker per upload in progress; the header checks above
+reject anything that would take long before it reaches the pool.
+
+Views call clean_image() before they write anything, so a rejected upload
+leaves no row and no file behind. Re-encoding is deterministic, so the same
+photo uploaded twice still deduplicates in store.media_storage.
+"""
+
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import SkipFile, StopUpload, TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+# Room for the other form fields when checking a request's declared size
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+class ImageRejected(ValueError):
+    """The uploaded file is not an acceptable image; the message is shown to the user"""
+
+
+def _max_bytes():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def _size_label(size):
+    return f'{size / 1024 / 1024:.0f} MB' if size >= 1024 * 1024 else f'{size / 1024:.0f} KB'
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to disk and drop any file larger than IMAGE_UPLOAD_MAX_BYTES"""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.oversized = content_length > _max_bytes() + FORM_OVERHEAD_BYTES
+        self.received = 0
+
+    def _reject(self, field_name, reason):
+        if not hasattr(self.request, '_rejected_uploads'):
+            self.request._rejected_uploads = {}
+        self.request._rejected_uploads[field_name] = reason
+
+    def new_file(self, field_name, *args, **kwargs):
+        if self.oversized:
+            # The fields before the file (CSRF token included) are parsed; the rest is never read
+            self._reject(None, f'Uploads are limited to {_size_label(_max_bytes())}.')
+            raise StopUpload(connection_reset=True)
+        self.received = 0
+        super().new_file(field_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > _max_bytes():
+            self._reject(self.field_name, f'The image is larger than {_size_label(_max_bytes())}.')
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+
+# Process pool
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # forkserver: workers don't inherit this process's threads, sockets or database connections
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_PROCESS_WORKERS', 2),
+                mp_context=multiprocessing.get_context('forkserver'),
+                max_tasks_per_child=getattr(settings, 'IMAGE_PROCESS_MAX_TASKS', 100),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _normalize(path, max_side, quality):
+    """Decode, orient, shrink and re-encode the image at `path`; returns (bytes, extension)"""
+    with Image.open(path) as image:
+        if image.format == 'JPEG':
+            image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        output = io.BytesIO()
+        # Saving without exif/icc/info arguments leaves all metadata behind
+        if has_alpha:
+            image.convert('RGBA').save(output, 'PNG', optimize=True)
+            return output.getvalue(), '.png'
+        image.convert('RGB').save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+        return output.getvalue(), '.jpg'
+
+
+def clean_image(request, field_name):
+    """The normalized image uploaded as `field_name` as a ContentFile, or None if there is none"""
+    rejected = getattr(request, '_rejected_uploads', {})
+    reason = rejected.get(field_name) or rejected.get(None)
+    if reason:
+        raise ImageRejected(reason)
+    upload = request.FILES.get(field_name)
+    if upload is None:
+        return None
+
+    formats = getattr(settings, 'IMAGE_UPLOAD_FORMATS', ('JPEG', 'PNG', 'WEBP', 'GIF'))
+    try:
+        # Only reads the header
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ImageRejected('The file is not an image we can read. Please upload a JPEG, PNG or WebP photo.')
+    if image_format not in formats:
+        raise ImageRejected(f'{image_format} images are not supported. Please upload a JPEG, PNG or WebP photo.')
+    if width * height > getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 50_000_000):
+        raise ImageRejected('The image resolution is too high. Please upload a smaller photo.')
+
+    if hasattr(upload, 'temporary_file_path'):
+        return _normalize_file(upload.temporary_file_path())
+    # Only uploads that bypassed ImageUploadHandler are still in memory
+    with tempfile.NamedTemporaryFile(suffix='.upload') as temp:
+        for chunk in upload.chunks():
+            temp.write(chunk)
+        temp.flush()
+        return _normalize_file(temp.name)
+
+
+def _normalize_file(path):
+    """Normalize the image at `path` in the pool, waiting for the result on this thread"""
+    global _pool
+    future = _get_pool().submit(
+        _normalize, path,
+        getattr(settings, 'IMAGE_MAX_SIDE', 1600), getattr(settings, 'IMAGE_JPEG_QUALITY', 85),
+    )
+    try:
+        data, extension = future.result(timeout=getattr(settings, 'IMAGE_PROCESS_TIMEOUT', 5))
+    except FutureTimeoutError:
+        future.cancel()
+        raise ImageRejected('The image took too long to process. Please upload a smaller photo.')
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool for the next upload
+        with _pool_lock:
+            _pool = None
+        raise ImageRejected('The image could not be processed. Please upload a smaller photo.')
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ImageRejected('The image is damaged and could not be read.')
+    return ContentFile(data, name='photo' + extension)
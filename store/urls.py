@@ -3,8 +3,12 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('discover/feed/', views.discover_feed, name='discover_feed'),
+    path('discover/swipes/', views.record_swipes, name='record_swipes'),
     path('browse/', views.item_list, name='item_list'),
+    path('browse/autocomplete/', views.autocomplete, name='autocomplete'),
     path('item/<int:item_id>/', views.item_detail, name='item_detail'),
+    path('items/state/', views.item_state, name='item_state'),
     path('category/<int:category_id>/', views.category_items, name='category_items'),
     path('seller/<int:seller_id>/', views.seller_profile, name='seller_profile'),
     
@@ -24,6 +28,7 @@ urlpatterns = [
     path('item/<int:item_id>/edit/', views.edit_item, name='edit_item'),
     path('item/<int:item_id>/mark-sold/', views.mark_item_sold, name='mark_item_sold'),
     path('item/<int:item_id>/delete/', views.delete_item, name='delete_item'),
+    path('dashboard/bulk/', views.bulk_items, name='bulk_items'),
     
     # Buying & Reviews
     path('item/<int:item_id>/buy/', views.buy_item, name='buy_item'),
@@ -40,6 +45,14 @@ urlpatterns = [
     path('item/<int:item_id>/chat/', views.item_chat, name='item_chat'),
     path('messages/', views.messages_inbox, name='messages_inbox'),
     
+    # Saved searches & notifications
+    path('notifications/', views.notifications, name='notifications'),
+    path('saved-searches/add/', views.save_search, name='save_search'),
+    path('saved-searches/<int:search_id>/delete/', views.delete_saved_search, name='delete_saved_search'),
+    
     # Credits
     path('credits/add/', views.add_credits, name='add_credits'),
+    
+    # Monitoring
+    path('metrics', views.metrics_view, name='metrics'),
 ]
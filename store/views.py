@@ -1,42 +1,99 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import Http404, JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
-from .models import Item, Category, UserProfile, Order, Review, Cart, CartItem, Message
-from django.db.models import Q, Avg as models_Avg
-from django.db import models
+from django.views.decorators.cache import never_cache
+from django.template.loader import render_to_string
+from .models import (
+    Item, Category, UserProfile, Order, Review, Cart, CartItem, Message, ArchivedItem, SellerDailyRollup,
+    SavedSearch, Notification,
+)
+from django.db.models import Q, Sum, Avg as models_Avg
+from django.utils import timezone
+from django.core.paginator import Paginator
+from datetime import timedelta
+from django.db import models, transaction
 from django.contrib import messages
+from . import metrics
+from .purge import soft_delete_item
+from . import reservations
+from . import profile_counters
+from . import autocomplete as search_index
+from . import bulk
+from . import discovery
+from . import engagement
+from . import trending
+from . import page_cache
+from . import media_storage
+from . import image_hash
+from . import uploads
+from django.urls import reverse
+import json
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+ANALYTICS_WINDOW_DAYS = 30
+SELLER_ITEMS_PER_PAGE = 24
+SAVED_SEARCH_LIMIT = 20
+NOTIFICATIONS_SHOWN = 50
+SIMILAR_ITEMS_SHOWN = 4
+# Freshness cap for the cached public part of item pages; changes purge it sooner
+ITEM_PAGE_CACHE_SECONDS = 300
+ITEM_STATE_LIMIT = 100
 
 
 def home(request):
-    """Home page - featured items"""
-    featured_items = Item.objects.filter(status='available').order_by('-created_at')
-    
-    # Exclude items already in user's cart if authenticated
-    if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart_item_ids = cart.items.values_list('item_id', flat=True)
-            featured_items = featured_items.exclude(id__in=cart_item_ids)
-        except Cart.DoesNotExist:
-            pass
-    
-    # Apply slice after filtering
-    featured_items = featured_items[:6]
+    """Home page - swipe discovery deck (further cards come from discover_feed)"""
+    featured_items, next_before = discovery.next_batch(request.user)
+    # A long run of already-swiped items can leave the first batch empty
+    for _ in range(3):
+        if featured_items or next_before is None:
+            break
+        featured_items, next_before = discovery.next_batch(request.user, next_before)
     
     categories = Category.objects.all()
+    page_cache.tag(request, 'items', 'categories')
     context = {
         'featured_items': featured_items,
+        'next_before': next_before,
         'categories': categories,
     }
     return render(request, 'store/home.html', context)
 
 
+def discover_feed(request):
+    """Next batch of unseen discovery cards (JSON), keyset-paginated by item id"""
+    try:
+        items, next_before = discovery.next_batch(request.user, request.GET.get('before'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'cards': [discovery.card_data(item) for item in items],
+        'next_before': next_before,
+    })
+
+
+@login_required(login_url='login')
+@require_POST
+def record_swipes(request):
+    """Store a batch of swipe decisions: {"swipes": [{"item_id": 1, "direction": "nope"}, ...]}"""
+    try:
+        payload = json.loads(request.body)
+        swipes = [(int(swipe['item_id']), swipe['direction']) for swipe in payload['swipes'][:100]]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid swipes payload'}, status=400)
+    
+    recorded = discovery.record_swipes(request.user, swipes)
+    return JsonResponse({'success': True, 'recorded': recorded})
+
+
 def item_list(request):
     """Browse all items with search and filter"""
-    items = Item.objects.filter(status='available')
+    items = Item.objects.available(request.user)
     categories = Category.objects.all()
     
     # Search
@@ -65,70 +122,166 @@ def item_list(request):
     if condition:
         items = items.filter(condition=condition)
     
+    sort = request.GET.get('sort', '')
+    if sort == 'trending':
+        items = trending.sort(items, int(category_id) if category_id.isdigit() else None)
+        page_cache.tag(request, 'trending')
+    page_cache.tag(request, 'categories', f'category:{category_id}' if category_id else 'items')
+    
     context = {
         'items': items,
         'categories': categories,
         'query': query,
+        'sort': sort,
     }
     return render(request, 'store/item_list.html', context)
 
 
+def autocomplete(request):
+    """Search-as-you-type suggestions for titles, categories and sellers (JSON)"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    
+    results = []
+    for kind, label, ref_id, weight in search_index.complete(query, limit):
+        if kind == search_index.KIND_CATEGORY:
+            url = reverse('category_items', args=[ref_id])
+        elif kind == search_index.KIND_SELLER:
+            url = reverse('seller_profile', args=[ref_id])
+        else:
+            url = reverse('item_detail', args=[ref_id])
+        results.append({'label': label, 'kind': kind, 'url': url})
+    return JsonResponse({'query': query, 'results': results})
+
+
 def item_detail(request, item_id):
-    """Single item detail page"""
-    item = get_object_or_404(Item, id=item_id)
-    reviews = item.reviews.all()
-    seller_profile = item.seller.userprofile
-    
-    # Check if user has purchased this item
-    has_purchased = False
-    has_in_cart = False
-    if request.user.is_authenticated:
-        has_purchased = Order.objects.filter(
-            item=item,
-            buyer=request.user
-        ).exists()
-        # Check if item is in user's cart
-        user_cart = Cart.objects.filter(user=request.user).first()
-        if user_cart:
-            has_in_cart = CartItem.objects.filter(
-                cart=user_cart,
-                item=item
-            ).exists()
-    
+    """Single item detail page (the viewer's own buttons come from item_state)"""
+    page = page_cache.get_fragment(f'item-page:{item_id}')
+    if page is None:
+        page = _render_item_page(item_id)
+    page_cache.tag(request, *page['tags'])
+    if not page['archived'] and page['seller_id'] != request.user.id:
+        engagement.record(item_id, 'views')
+    return render(request, 'store/item_detail.html', {'page': page})
+
+
+def _render_item_page(item_id):
+    """Render and cache the viewer-independent part of an item page; 404 if it never existed"""
+    started_ns = time.time_ns()
+    item = Item.objects.select_related('seller', 'category').filter(id=item_id).first()
+    archived = item is None
+    if archived:
+        item = get_object_or_404(ArchivedItem.objects.select_related('seller', 'category'), id=item_id)
+    tags = [f'item:{item.id}', f'seller:{item.seller_id}', 'categories']
+    fresh = ITEM_PAGE_CACHE_SECONDS
+
+    if archived:
+        can_buy = False
+        similar_items = []
+    else:
+        # Shown as to a logged-out visitor; item_state fills in what differs for the viewer
+        can_buy = item.is_available_to(AnonymousUser())
+        # Neighbours precomputed by build_similar_items, skipping any sold since
+        similar_items = list(
+            Item.objects.available()
+            .filter(similar_to__item=item)
+            .select_related('category')
+            .order_by('similar_to__rank')[:SIMILAR_ITEMS_SHOWN]
+        )
+        tags.extend(f'item:{similar.id}' for similar in similar_items)
+        # A hold lapsing changes the page without any write to purge it
+        if item.status == 'reserved' and item.reserved_until and item.reserved_until > timezone.now():
+            fresh = min(fresh, (item.reserved_until - timezone.now()).total_seconds())
+
     context = {
         'item': item,
-        'reviews': reviews,
-        'seller_profile': seller_profile,
-        'has_purchased': has_purchased,
-        'has_in_cart': has_in_cart,
+        'reviews': item.reviews.select_related('author'),
+        'seller_profile': item.seller.userprofile,
+        'can_buy': can_buy,
+        'similar_items': similar_items,
+    }
+    page = {
+        'html': render_to_string('store/item_public.html', context),
+        'title': item.title,
+        'item_id': item.id,
+        'seller_id': item.seller_id,
+        'archived': archived,
+        'tags': tags,
     }
-    return render(request, 'store/item_detail.html', context)
+    page_cache.set_fragment(f'item-page:{item.id}', page, tags, started_ns, fresh)
+    return page
+
+
+@never_cache
+def item_state(request):
+    """The viewer's own state for a batch of items (?ids=1,2,3), for the buttons on cached pages"""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in request.GET.get('ids', '').split(',') if i.strip()))
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma-separated list of item ids'}, status=400)
+    if len(ids) > ITEM_STATE_LIMIT:
+        return JsonResponse({'error': f'At most {ITEM_STATE_LIMIT} ids per request'}, status=400)
+    if not request.user.is_authenticated or not ids:
+        return JsonResponse({'authenticated': request.user.is_authenticated, 'items': {}})
+
+    items = Item.objects.filter(id__in=ids).only('id', 'seller_id', 'status', 'reserved_by_id', 'reserved_until')
+    in_cart = set(
+        CartItem.objects.filter(cart__user=request.user, item_id__in=ids).values_list('item_id', flat=True)
+    )
+    purchased = set(
+        Order.objects.filter(buyer=request.user, item_id__in=ids).values_list('item_id', flat=True)
+    )
+    return JsonResponse({
+        'authenticated': True,
+        'items': {
+            item.id: {
+                'is_seller': item.seller_id == request.user.id,
+                'can_buy': item.is_available_to(request.user),
+                'in_cart': item.id in in_cart,
+                'purchased': item.id in purchased,
+            }
+            for item in items
+        },
+    })
 
 
 def category_items(request, category_id):
     """Items by category"""
     category = get_object_or_404(Category, id=category_id)
-    items = Item.objects.filter(status='available', category=category)
+    items = Item.objects.available(request.user).filter(category=category)
     categories = Category.objects.all()
     
+    sort = request.GET.get('sort', '')
+    if sort == 'trending':
+        items = trending.sort(items, category.id)
+        page_cache.tag(request, 'trending')
+    page_cache.tag(request, 'categories', f'category:{category.id}')
+    
     context = {
         'category': category,
         'items': items,
         'categories': categories,
+        'sort': sort,
     }
     return render(request, 'store/category_items.html', context)
 
 
 def seller_profile(request, seller_id):
     """Seller profile page"""
-    seller = get_object_or_404(User, id=seller_id)
-    seller_profile = get_object_or_404(UserProfile, user=seller)
-    items = Item.objects.filter(seller=seller, status='available')
+    seller_profile = get_object_or_404(UserProfile.objects.select_related('user'), user_id=seller_id)
+    seller = seller_profile.user
+    items = Item.objects.available(request.user).filter(seller=seller).select_related('category')
+    page = Paginator(items, SELLER_ITEMS_PER_PAGE).get_page(request.GET.get('page'))
+    page_cache.tag(request, f'seller:{seller.id}', f'seller-items:{seller.id}', 'categories')
     
     context = {
         'seller': seller,
         'seller_profile': seller_profile,
-        'items': items,
+        'items': page,
+        'page_obj': page,
     }
     return render(request, 'store/seller_profile.html', context)
 
@@ -186,13 +339,42 @@ def logout_view(request):
 def dashboard(request):
     """User dashboard - selling and purchase history"""
     user_profile = get_object_or_404(UserProfile, user=request.user)
-    my_items = Item.objects.filter(seller=request.user)
-    my_orders = Order.objects.filter(buyer=request.user)
+    my_items = list(Item.objects.filter(seller=request.user).select_related('category'))
+    item_counts = engagement.counts(item.id for item in my_items)
+    for item in my_items:
+        item.engagement_counts = item_counts[item.id]
+    my_orders = Order.objects.filter(buyer=request.user).select_related('item', 'archived_item')
+    
+    # Sales analytics come only from the precomputed daily rollups
+    since = timezone.localdate() - timedelta(days=ANALYTICS_WINDOW_DAYS)
+    analytics = list(
+        SellerDailyRollup.objects.filter(seller=request.user, day__gte=since)
+        .values('category__name')
+        .annotate(
+            orders=Sum('orders'),
+            revenue=Sum('revenue'),
+            listings_created=Sum('listings_created'),
+            items_sold=Sum('items_sold'),
+            days_to_sell_total=Sum('days_to_sell_total'),
+        )
+        .order_by('-revenue')
+    )
+    for row in analytics:
+        row['sell_through'] = (
+            row['items_sold'] * 100 / row['listings_created'] if row['listings_created'] else None
+        )
+        row['avg_days_to_sell'] = (
+            row['days_to_sell_total'] / row['items_sold'] if row['items_sold'] else None
+        )
     
     context = {
         'user_profile': user_profile,
         'my_items': my_items,
         'my_orders': my_orders,
+        'categories': Category.objects.all(),
+        'analytics': analytics,
+        'analytics_window_days': ANALYTICS_WINDOW_DAYS,
+        'analytics_revenue': sum(row['revenue'] for row in analytics),
     }
     return render(request, 'store/dashboard.html', context)
 
@@ -210,30 +392,51 @@ def sell_item(request):
         price = request.POST.get('price')
         category_id = request.POST.get('category')
         condition = request.POST.get('condition')
-        image = request.FILES.get('image')
         
         # Check if user has enough credits
         if user_profile.credits < 10:
             messages.error(request, f'You need at least 10 credits to post an item. You have {user_profile.credits} credits.')
             return redirect('sell_item')
         
-        category = get_object_or_404(Category, id=category_id)
+        # Validated and normalized before anything is written
+        try:
+            image = uploads.clean_image(request, 'image')
+        except uploads.ImageRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('sell_item')
         
-        item = Item.objects.create(
-            seller=request.user,
-            title=title,
-            description=description,
-            price=price,
-            category=category,
-            condition=condition,
-            image=image,
-        )
+        category = get_object_or_404(Category, id=category_id)
         
-        # Deduct 10 credits for posting
-        user_profile.credits -= 10
-        user_profile.save()
+        with transaction.atomic():
+            item = Item.objects.create(
+                seller=request.user,
+                title=title,
+                description=description,
+                price=price,
+                category=category,
+                condition=condition,
+                image=image,
+            )
+            
+            # Deduct 10 credits for posting
+            user_profile.credits -= 10
+            user_profile.save(update_fields=['credits'])
+            profile_counters.adjust(request.user.id, active_listings=1)
+        metrics.LISTINGS_CREATED.inc()
         
         messages.success(request, f'Item listed successfully! {user_profile.credits} credits remaining.')
+        photo_hash = image_hash.update_item(item)
+        duplicates = image_hash.near_duplicates(photo_hash, exclude=[item.id]) if photo_hash is not None else []
+        if duplicates:
+            original = Item.objects.filter(id__in=[item_id for item_id, _ in duplicates]).order_by(
+                models.Case(models.When(seller=request.user, then=0), default=1), 'created_at',
+            ).first()
+            if original is not None and original.seller_id == request.user.id:
+                messages.warning(request, f'This photo looks like your listing "{original.title}". '
+                                          'If it is the same item, please remove the repost.')
+            elif original is not None:
+                messages.warning(request, f'This photo looks like an existing listing, "{original.title}". '
+                                          'Please use photos of your own item.')
         return redirect('item_detail', item_id=item.id)
     
     context = {'categories': categories, 'user_credits': user_profile.credits}
@@ -250,18 +453,28 @@ def buy_item(request, item_id):
         return redirect('item_detail', item_id=item.id)
     
     if request.method == 'POST':
-        order = Order.objects.create(
-            item=item,
-            buyer=request.user,
-            total_price=item.price,
-        )
-        
-        item.status = 'sold'
-        item.save()
+        with transaction.atomic():
+            # Hold and sell in one go; either fails if someone else holds or bought it
+            if not reservations.reserve([item.id], request.user) or not reservations.mark_sold([item.id], request.user):
+                messages.error(request, 'This item is no longer available')
+                return redirect('item_detail', item_id=item.id)
+            order = Order.objects.create(
+                item=item,
+                buyer=request.user,
+                total_price=item.price,
+            )
+            profile_counters.adjust(item.seller_id, active_listings=-1, items_sold=1)
+            profile_counters.adjust(request.user.id, purchases=1)
+        metrics.ORDERS_CREATED.inc(source='buy_item')
         
         messages.success(request, 'Purchase successful! Check your dashboard for details.')
         return redirect('dashboard')
     
+    # Only look: a GET (link prefetch, crawler) must not hold the item
+    if not item.is_available_to(request.user):
+        messages.error(request, 'This item is no longer available')
+        return redirect('item_detail', item_id=item.id)
+    
     context = {'item': item}
     return render(request, 'store/buy_item.html', context)
 
@@ -279,12 +492,14 @@ def add_review(request, item_id):
     rating = request.POST.get('rating')
     comment = request.POST.get('comment')
     
-    review = Review.objects.create(
-        item=item,
-        author=request.user,
-        rating=rating,
-        comment=comment,
-    )
+    with transaction.atomic():
+        review = Review.objects.create(
+            item=item,
+            author=request.user,
+            rating=rating,
+            comment=comment,
+        )
+        profile_counters.adjust(request.user.id, reviews_written=1, review_rating_total=review.rating)
     
     return JsonResponse({'success': True, 'message': 'Review added successfully'})
 
@@ -300,14 +515,20 @@ def edit_item(request, item_id):
         return redirect('item_detail', item_id=item.id)
     
     if request.method == 'POST':
+        try:
+            image = uploads.clean_image(request, 'image')
+        except uploads.ImageRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('edit_item', item_id=item.id)
         item.title = request.POST.get('title')
         item.description = request.POST.get('description')
         item.price = request.POST.get('price')
         item.category_id = request.POST.get('category')
         item.condition = request.POST.get('condition')
-        if request.FILES.get('image'):
-            item.image = request.FILES.get('image')
+        if image:
+            item.image = image
         item.save()
+        image_hash.update_item(item)
         
         messages.success(request, 'Item updated successfully!')
         return redirect('item_detail', item_id=item.id)
@@ -328,8 +549,15 @@ def mark_item_sold(request, item_id):
         messages.error(request, 'You do not have permission to modify this item')
         return redirect('item_detail', item_id=item.id)
     
-    item.status = 'sold'
-    item.save()
+    with transaction.atomic():
+        # Conditional update so marking twice never double-counts the sale
+        marked = Item.objects.filter(id=item.id).exclude(status='sold').update(
+            status='sold', reserved_by=None, reserved_until=None, updated_at=timezone.now(),
+        )
+        if marked:
+            profile_counters.adjust(item.seller_id, active_listings=-1, items_sold=1)
+            page_cache.purge_items([item.id])
+            search_index.items_changed([item.id])
     messages.success(request, 'Item marked as sold!')
     return redirect('dashboard')
 
@@ -343,11 +571,52 @@ def delete_item(request, item_id):
         messages.error(request, 'You do not have permission to delete this item')
         return redirect('item_detail', item_id=item.id)
     
-    item.delete()
+    # Hide it now; purge_deleted removes the row and its dependents later
+    soft_delete_item(item)
     messages.success(request, 'Item deleted successfully. Credits spent on listing are not refunded.')
     return redirect('dashboard')
 
 
+@login_required(login_url='login')
+@require_POST
+def bulk_items(request):
+    """Apply one operation to many of the seller's listings (form post or JSON)"""
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+        item_ids = payload.get('item_ids') or []
+        operation = payload.get('operation', '')
+        params = payload
+    else:
+        item_ids = request.POST.getlist('item_ids')
+        operation = request.POST.get('operation', '')
+        params = request.POST
+    
+    try:
+        results = bulk.apply(request.user, item_ids, operation, params)
+    except bulk.BulkActionError as exc:
+        if request.content_type == 'application/json':
+            return JsonResponse({'error': str(exc)}, status=400)
+        messages.error(request, str(exc))
+        return redirect('dashboard')
+    
+    succeeded = sum(1 for result in results if result['ok'])
+    if request.content_type == 'application/json':
+        return JsonResponse({'operation': operation, 'succeeded': succeeded, 'results': results})
+    
+    if succeeded:
+        messages.success(request, f'Updated {succeeded} of {len(results)} items.')
+    skipped = [result for result in results if not result['ok']]
+    if skipped:
+        reasons = Counter(result['error'] for result in skipped)
+        messages.warning(request, 'Skipped ' + ', '.join(f'{count} ({reason})' for reason, count in reasons.items()))
+    return redirect('dashboard')
+
+
 @login_required(login_url='login')
 def view_cart(request):
     """View shopping cart"""
@@ -370,7 +639,8 @@ def add_to_cart(request, item_id):
     if item.seller == request.user:
         return JsonResponse({'error': 'You cannot add your own items to cart'}, status=400)
     
-    if item.status != 'available':
+    # Place (or extend) this buyer's hold; fails if someone else holds it
+    if not reservations.reserve([item.id], request.user):
         return JsonResponse({'error': 'This item is not available'}, status=400)
     
     cart, created = Cart.objects.get_or_create(user=request.user)
@@ -379,6 +649,7 @@ def add_to_cart(request, item_id):
     if not created:
         cart_item.quantity += 1
         cart_item.save()
+    engagement.record(item.id, 'cart_adds')
     
     return JsonResponse({
         'success': True,
@@ -395,6 +666,7 @@ def remove_from_cart(request, item_id):
     cart = get_object_or_404(Cart, user=request.user)
     
     CartItem.objects.filter(cart=cart, item=item).delete()
+    reservations.release([item.id], request.user)
     
     return redirect('view_cart')
 
@@ -411,6 +683,7 @@ def update_cart_quantity(request, item_id):
     
     if quantity <= 0:
         cart_item.delete()
+        reservations.release([item.id], request.user)
     else:
         cart_item.quantity = quantity
         cart_item.save()
@@ -426,28 +699,63 @@ def update_cart_quantity(request, item_id):
 def checkout(request):
     """Checkout and convert cart to orders"""
     cart = get_object_or_404(Cart, user=request.user)
-    cart_items = cart.items.all()
+    cart_items = cart.items.select_related('item')
     
     if not cart_items.exists():
         messages.error(request, 'Your cart is empty')
         return redirect('view_cart')
     
+    item_ids = [cart_item.item_id for cart_item in cart_items]
     if request.method == 'POST':
-        # Create orders for each item in cart
-        for cart_item in cart_items:
-            order = Order.objects.create(
-                item=cart_item.item,
-                buyer=request.user,
-                total_price=cart_item.get_subtotal(),
-            )
-            
-            # Mark item as sold
-            cart_item.item.status = 'sold'
-            cart_item.item.save()
-            
-            # Remove from cart
-            cart_item.delete()
+        # Submitting checkout (re)places holds on everything in the cart in one UPDATE
+        reservations.reserve(item_ids, request.user)
+        held_ids = reservations.held_by(item_ids, request.user)
+    else:
+        # Only look: a GET must not place holds
+        held_ids = set(
+            Item.objects.available(request.user).filter(id__in=item_ids).exclude(seller=request.user)
+            .values_list('id', flat=True)
+        )
+    unavailable = [cart_item for cart_item in cart_items if cart_item.item_id not in held_ids]
+    if unavailable:
+        messages.error(
+            request,
+            'No longer available: ' + ', '.join(cart_item.item.title for cart_item in unavailable),
+        )
+    
+    if request.method == 'POST':
+        try:
+            with transaction.atomic():
+                # Sell first: if a hold lapsed to someone else or another checkout
+                # took an item since held_by(), roll everything back
+                if reservations.mark_sold(held_ids, request.user) != len(held_ids):
+                    raise reservations.HoldLost()
+                sold_per_seller = Counter()
+                # Create orders for each item still held by this buyer
+                for cart_item in cart_items:
+                    if cart_item.item_id not in held_ids:
+                        continue
+                    order = Order.objects.create(
+                        item=cart_item.item,
+                        buyer=request.user,
+                        total_price=cart_item.get_subtotal(),
+                    )
+                    sold_per_seller[cart_item.item.seller_id] += 1
+                    
+                    # Remove from cart
+                    cart_item.delete()
+                
+                for seller_id, sold in sold_per_seller.items():
+                    profile_counters.adjust(seller_id, active_listings=-sold, items_sold=sold)
+                profile_counters.adjust(request.user.id, purchases=len(held_ids))
+        except reservations.HoldLost:
+            messages.error(request, 'Some items were taken by another buyer while you checked out. '
+                                    'Nothing was purchased; please review your cart.')
+            return redirect('view_cart')
+        metrics.ORDERS_CREATED.inc(len(held_ids), source='checkout')
         
+        if not held_ids:
+            return redirect('view_cart')
         messages.success(request, 'Purchase completed successfully!')
         return redirect('dashboard')
     
@@ -462,24 +770,15 @@ def checkout(request):
 @login_required(login_url='login')
 def user_profile(request):
     """User profile page"""
-    user_profile = UserProfile.objects.get(user=request.user)
-    items_count = Item.objects.filter(seller=request.user, status='available').count()
-    purchases_count = Order.objects.filter(buyer=request.user).count()
-    reviews_count = Review.objects.filter(author=request.user).count()
-    
-    # Calculate average rating from reviews authored by user
-    reviews = Review.objects.filter(author=request.user)
-    if reviews.exists():
-        avg_rating = reviews.aggregate(models.Avg('rating'))['rating__avg']
-    else:
-        avg_rating = None
+    # Every number comes from the profile's counter caches
+    user_profile = get_object_or_404(UserProfile.objects.select_related('user'), user=request.user)
     
     context = {
         'user_profile': user_profile,
-        'items_count': items_count,
-        'purchases_count': purchases_count,
-        'reviews_count': reviews_count,
-        'avg_rating': avg_rating,
+        'items_count': user_profile.active_listings,
+        'purchases_count': user_profile.purchases,
+        'reviews_count': user_profile.reviews_written,
+        'avg_rating': user_profile.average_review_rating,
     }
     return render(request, 'store/profile.html', context)
 
@@ -506,6 +805,12 @@ def edit_profile(request):
     user_profile = UserProfile.objects.get(user=request.user)
     
     if request.method == 'POST':
+        try:
+            profile_image = uploads.clean_image(request, 'profile_image')
+        except uploads.ImageRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('edit_profile')
+        
         # Update User model
         request.user.first_name = request.POST.get('first_name', request.user.first_name)
         request.user.last_name = request.POST.get('last_name', request.user.last_name)
@@ -518,8 +823,8 @@ def edit_profile(request):
         user_profile.address = request.POST.get('address', user_profile.address)
         
         # Handle profile image if uploaded
-        if 'profile_image' in request.FILES:
-            user_profile.profile_image = request.FILES['profile_image']
+        if profile_image:
+            user_profile.profile_image = profile_image
         
         user_profile.save()
         
@@ -583,8 +888,10 @@ def preferences(request):
 
 @login_required(login_url='login')
 def item_chat(request, item_id):
-    """Chat about a specific item"""
-    item = get_object_or_404(Item, id=item_id)
+    """Chat about a specific item (read-only once the item has been archived)"""
+    item = Item.objects.filter(id=item_id).first()
+    if item is None:
+        return _archived_item_chat(request, item_id)
     
     # Allow seller to access chat for their own item, or buyer who has it in cart
     if request.user != item.seller:
@@ -611,7 +918,8 @@ def item_chat(request, item_id):
     
     # Get the other user - find from messages or use seller if requesting user is buyer
     other_user = None
-    if all_messages.exists():
+    has_history = all_messages.exists()
+    if has_history:
         # Get the other user from the last message
         last_message = all_messages.last()
         other_user = last_message.sender if last_message.recipient == request.user else last_message.recipient
@@ -628,6 +936,9 @@ def item_chat(request, item_id):
                 recipient=other_user,
                 content=content,
             )
+            metrics.MESSAGES_SENT.inc()
+            if not has_history:
+                engagement.record(item.id, 'chat_starts')
             return redirect('item_chat', item_id=item.id)
     
     context = {
@@ -639,50 +950,57 @@ def item_chat(request, item_id):
     return render(request, 'store/item_chat.html', context)
 
 
+def _archived_item_chat(request, item_id):
+    """The history of a conversation about an archived item; it can be read, not continued"""
+    item = get_object_or_404(ArchivedItem.objects.select_related('seller'), id=item_id)
+    all_messages = Message.objects.filter(archived_item=item).filter(
+        Q(sender=request.user) | Q(recipient=request.user)
+    ).select_related('sender', 'recipient').order_by('created_at')
+    last_message = all_messages.last()
+    if last_message is None:
+        raise Http404('No conversation about this item')
+    
+    Message.objects.filter(archived_item=item, recipient=request.user, is_read=False).update(is_read=True)
+    context = {
+        'item': item,
+        'messages': all_messages,
+        'other_user': last_message.sender if last_message.recipient == request.user else last_message.recipient,
+        'has_item_in_cart': False,
+    }
+    return render(request, 'store/item_chat.html', context)
+
+
 @login_required(login_url='login')
 @login_required
 def messages_inbox(request):
-    """View all message conversations"""
-    # Get all unique items the user is chatting about
-    items_with_messages = Item.objects.filter(
-        Q(messages__sender=request.user) | Q(messages__recipient=request.user)
-    ).distinct().prefetch_related('messages')
+    """View all message conversations, including those about archived items"""
+    user_messages = Message.objects.filter(
+        Q(sender=request.user) | Q(recipient=request.user)
+    ).select_related('item__seller', 'archived_item__seller', 'sender', 'recipient').order_by('created_at')
+    
+    # One conversation per listing, live or archived; both share the item's original id
+    threads = {}
+    for message in user_messages:
+        listing = message.listing
+        if listing is None:
+            continue
+        thread = threads.setdefault(listing.id, {'item': listing, 'messages': [], 'unread_count': 0})
+        thread['messages'].append(message)
+        if message.recipient_id == request.user.id and not message.is_read:
+            thread['unread_count'] += 1
     
-    # Build conversation data
     conversations = []
-    for item in items_with_messages:
-        # Get messages for this item with this user
-        messages = Message.objects.filter(item=item).filter(
-            Q(sender=request.user) | Q(recipient=request.user)
-        ).order_by('created_at')
-        
-        if messages.exists():
-            # Get the other user in conversation
-            last_message = messages.last()
-            other_user = last_message.sender if last_message.recipient == request.user else last_message.recipient
-            
-            # Count unread messages for this item
-            unread_count = messages.filter(
-                recipient=request.user,
-                is_read=False
-            ).count()
-            
-            conversations.append({
-                'item': item,
-                'other_user': other_user,
-                'last_message': last_message,
-                'unread_count': unread_count,
-                'messages': messages,
-            })
+    for thread in threads.values():
+        # Get the other user in conversation
+        last_message = thread['messages'][-1]
+        other_user = last_message.sender if last_message.recipient == request.user else last_message.recipient
+        conversations.append({**thread, 'other_user': other_user, 'last_message': last_message})
     
     # Sort by last message date (newest first)
     conversations.sort(key=lambda x: x['last_message'].created_at, reverse=True)
     
-    # Count total unread messages
-    unread_count = Message.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).count()
+    # Only unread messages the user can open and read count
+    unread_count = sum(conversation['unread_count'] for conversation in conversations)
     
     context = {
         'items_with_messages': conversations,
@@ -691,6 +1009,66 @@ def messages_inbox(request):
     return render(request, 'store/messages_inbox.html', context)
 
 
+def _parse_price(value):
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+@login_required(login_url='login')
+@require_POST
+def save_search(request):
+    """Save the current browse filters as an alert"""
+    if request.user.saved_searches.count() >= SAVED_SEARCH_LIMIT:
+        messages.error(request, f'You can keep up to {SAVED_SEARCH_LIMIT} saved searches. Remove one first.')
+        return redirect('notifications')
+    
+    condition = request.POST.get('condition', '')
+    if condition not in dict(Item.CONDITION_CHOICES):
+        condition = ''
+    category_id = request.POST.get('category', '')
+    category = Category.objects.filter(id=category_id).first() if category_id.isdigit() else None
+    
+    SavedSearch.objects.create(
+        user=request.user,
+        query=request.POST.get('q', '').strip()[:200],
+        category=category,
+        min_price=_parse_price(request.POST.get('min_price')),
+        max_price=_parse_price(request.POST.get('max_price')),
+        condition=condition,
+    )
+    messages.success(request, "Search saved. We'll notify you when a matching item is listed.")
+    return redirect('notifications')
+
+
+@login_required(login_url='login')
+@require_POST
+def delete_saved_search(request, search_id):
+    """Remove one of the user's saved searches"""
+    SavedSearch.objects.filter(id=search_id, user=request.user).delete()
+    messages.success(request, 'Saved search removed.')
+    return redirect('notifications')
+
+
+@login_required(login_url='login')
+def notifications(request):
+    """Saved-search alerts and the searches that produce them"""
+    notification_list = list(
+        request.user.notifications.select_related('item')[:NOTIFICATIONS_SHOWN]
+    )
+    # Showing them counts as reading them
+    request.user.notifications.filter(is_read=False).update(is_read=True)
+    
+    context = {
+        'notifications': notification_list,
+        'saved_searches': request.user.saved_searches.select_related('category'),
+        'saved_search_limit': SAVED_SEARCH_LIMIT,
+    }
+    return render(request, 'store/notifications.html', context)
+
+
 @login_required(login_url='login')
 def add_credits(request):
     """Add credits to user account"""
@@ -728,3 +1106,18 @@ def add_credits(request):
         'credit_packages': credit_packages,
     }
     return render(request, 'store/add_credits.html', context)
+
+
+def serve_media(request, path):
+    """Uploaded images, offloaded to the web server where configured (see store/media_storage.py)"""
+    return media_storage.serve(request, path)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, aggregated across all worker processes"""
+    if not metrics.can_scrape(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(
+        metrics.render_text(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )